@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright (C) 2018 Jonathan Taquet
+
+This file is part of Oe2sSLE (Open e2sSample.all Library Editor).
+
+Oe2sSLE is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Oe2sSLE is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Oe2sSLE.  If not, see <http://www.gnu.org/licenses/>
+"""
+
+import tkinter as tk
+import tkinter.ttk
+
+import e2s_sample_all as e2s
+
+from GUI.widgets import ROCombobox
+from GUI.widgets import ROSpinbox
+
+class BatchEditDialog(tk.Toplevel):
+    """
+    choose the esli fields to set on several samples
+
+    result is None if cancelled, otherwise a dict of the esli fields to set,
+    as accepted by e2s_sample_all.edit_esli.
+    """
+    def __init__(self, parent, num_samples, *args, **kwargs):
+        super().__init__(parent, *args, **kwargs)
+        self.transient(parent)
+        self.title('Edit selected samples')
+
+        self.parent = parent
+        self.result = None
+
+        self.set_category = tk.BooleanVar()
+        self.set_oneShot = tk.BooleanVar()
+        self.set_plus12dB = tk.BooleanVar()
+        self.set_tuneVal = tk.BooleanVar()
+        self.oneShot = tk.BooleanVar()
+        self.plus12dB = tk.BooleanVar()
+        self.tuneVal = tk.IntVar()
+
+        tk.Label(self, text="Set for the {} selected samples:".format(num_samples)).pack(fill=tk.X)
+        body = tk.Frame(self)
+
+        categories = [e2s.esli_OSC_cat_to_str[k] for k in sorted(e2s.esli_OSC_cat_to_str)]
+        tk.Checkbutton(body, text="Category", variable=self.set_category).grid(row=0, column=0, sticky=tk.W)
+        self.entryCategory = ROCombobox(body, values=categories, width=8, command=lambda event: self.set_category.set(True))
+        self.entryCategory.set(categories[0])
+        self.entryCategory.grid(row=0, column=1, sticky=tk.W)
+
+        tk.Checkbutton(body, text="1-shot", variable=self.set_oneShot).grid(row=1, column=0, sticky=tk.W)
+        tk.Checkbutton(body, variable=self.oneShot, command=lambda: self.set_oneShot.set(True)).grid(row=1, column=1, sticky=tk.W)
+
+        tk.Checkbutton(body, text="+12dB", variable=self.set_plus12dB).grid(row=2, column=0, sticky=tk.W)
+        tk.Checkbutton(body, variable=self.plus12dB, command=lambda: self.set_plus12dB.set(True)).grid(row=2, column=1, sticky=tk.W)
+
+        tk.Checkbutton(body, text="Tune", variable=self.set_tuneVal).grid(row=3, column=0, sticky=tk.W)
+        ROSpinbox(body, from_=-63, to=63, width=3, format='%2.0f', textvariable=self.tuneVal, command=lambda: self.set_tuneVal.set(True)).grid(row=3, column=1, sticky=tk.W)
+
+        body.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        box = tk.Frame(self)
+
+        w = tk.Button(box, text="OK", width=10, command=self.ok, default=tk.ACTIVE)
+        w.pack(side=tk.LEFT, padx=5, pady=5)
+        w = tk.Button(box, text="Cancel", width=10, command=self.cancel)
+        w.pack(side=tk.LEFT, padx=5, pady=5)
+
+        self.bind("<Return>", self.ok)
+        self.bind("<Escape>", self.cancel)
+
+        box.pack()
+
+        # temporarily hide the window
+        self.withdraw()
+        self.update()
+        width, height = (self.winfo_width(), self.winfo_height())
+        self.minsize(width, height)
+        px, py = (parent.winfo_rootx(), parent.winfo_rooty())
+        pwidth, pheight = (parent.winfo_width(), parent.winfo_height())
+        x, y = (px+pwidth/2-width/2, py+pheight/2-height/2)
+        self.geometry("+{}+{}".format(int(x), int(y)))
+        self.deiconify()
+
+        self.focus_set()
+        self.grab_set()
+
+    #
+    # standard button semantics
+
+    def ok(self, event=None):
+        self.withdraw()
+        self.update_idletasks()
+
+        self.apply()
+
+        self.cancel()
+
+    def cancel(self, event=None):
+        # put focus back to the parent window
+        self.parent.focus_set()
+        self.destroy()
+
+    def apply(self):
+        fields = dict()
+        if self.set_category.get():
+            fields['OSC_category'] = e2s.esli_str_to_OSC_cat[self.entryCategory.get()]
+        if self.set_oneShot.get():
+            fields['OSC_OneShot'] = self.oneShot.get()
+        if self.set_plus12dB.get():
+            fields['playLevel12dB'] = self.plus12dB.get()
+        if self.set_tuneVal.get():
+            fields['sampleTune'] = self.tuneVal.get()
+        self.result = fields
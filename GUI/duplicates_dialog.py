@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright (C) 2018 Jonathan Taquet
+
+This file is part of Oe2sSLE (Open e2sSample.all Library Editor).
+
+Oe2sSLE is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Oe2sSLE is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Oe2sSLE.  If not, see <http://www.gnu.org/licenses/>
+"""
+
+import tkinter as tk
+
+import e2s_sample_dedup
+
+class DuplicatesDialog(tk.Toplevel):
+    """
+    report of the duplicated samples of a library
+
+    analyse(parent, near) returns the groups of duplicates (see
+    e2s_sample_dedup.find_duplicates), None if cancelled; groups are those
+    of the first analysis. result is None if closed, otherwise
+    ('select' or 'remove', groups).
+    """
+    def __init__(self, parent, analyse, groups, *args, **kwargs):
+        super().__init__(parent, *args, **kwargs)
+        self.transient(parent)
+        self.title('Duplicated samples')
+
+        self.parent = parent
+        self.analyse = analyse
+        self.groups = groups
+        self.result = None
+
+        self.near = tk.BooleanVar()
+
+        body = tk.Frame(self)
+        tk.Checkbutton(body, text="Include similar samples", variable=self.near, command=self._near_command).pack(anchor=tk.W)
+        self.text = tk.Text(body, width=60, height=15, wrap=tk.WORD)
+        scrollbar = tk.Scrollbar(body, command=self.text.yview)
+        self.text.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.text.pack(fill=tk.BOTH, expand=True)
+        body.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        box = tk.Frame(self)
+
+        self.buttonSelect = tk.Button(box, text="Select duplicates", width=15, command=lambda: self.ok('select'))
+        self.buttonSelect.pack(side=tk.LEFT, padx=5, pady=5)
+        self.buttonRemove = tk.Button(box, text="Remove duplicates", width=15, command=lambda: self.ok('remove'))
+        self.buttonRemove.pack(side=tk.LEFT, padx=5, pady=5)
+        w = tk.Button(box, text="Close", width=10, command=self.cancel)
+        w.pack(side=tk.LEFT, padx=5, pady=5)
+
+        self.bind("<Escape>", self.cancel)
+
+        box.pack()
+
+        self.update_report()
+
+        # temporarily hide the window
+        self.withdraw()
+        self.update()
+        width, height = (self.winfo_width(), self.winfo_height())
+        self.minsize(width, height)
+        px, py = (parent.winfo_rootx(), parent.winfo_rooty())
+        pwidth, pheight = (parent.winfo_width(), parent.winfo_height())
+        x, y = (px+pwidth/2-width/2, py+pheight/2-height/2)
+        self.geometry("+{}+{}".format(int(x), int(y)))
+        self.deiconify()
+
+        self.focus_set()
+        self.grab_set()
+
+    def _near_command(self):
+        groups = self.analyse(self, self.near.get())
+        # the wait dialog took the grab
+        self.grab_set()
+        if groups is None:
+            self.near.set(not self.near.get())
+            return
+        self.groups = groups
+        self.update_report()
+
+    def update_report(self):
+        self.text.configure(state=tk.NORMAL)
+        self.text.delete('1.0', tk.END)
+        if self.groups:
+            self.text.insert(tk.END, e2s_sample_dedup.report(self.groups))
+        else:
+            self.text.insert(tk.END, "No duplicated samples.")
+        self.text.configure(state=tk.DISABLED)
+        state = tk.NORMAL if self.groups else tk.DISABLED
+        self.buttonSelect.configure(state=state)
+        self.buttonRemove.configure(state=state)
+
+    #
+    # standard button semantics
+
+    def ok(self, action):
+        self.result = (action, self.groups)
+        self.cancel()
+
+    def cancel(self, event=None):
+        # put focus back to the parent window
+        self.parent.focus_set()
+        self.destroy()
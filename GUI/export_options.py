@@ -31,6 +31,10 @@ class ExportOptions:
         # default values
         self.export_smpl = 1 # export loop info in smpl chunk
         self.export_cue = 1 # export slices info in cue chunk
+        self.render = 0 # export only the played part, from start to end
+        self.render_slices = 0 # also export each slice when rendering all samples
+        self.archive_deflate = 0 # compress the zip archives
+        self.archive_manifest = 1 # add the metadata of the samples in archives
 
 class ExportOptionsDialog(tk.Toplevel):
 
@@ -44,8 +48,16 @@ class ExportOptionsDialog(tk.Toplevel):
 
         self.export_smpl = tk.IntVar()
         self.export_cue = tk.IntVar()
+        self.render = tk.IntVar()
+        self.render_slices = tk.IntVar()
+        self.archive_deflate = tk.IntVar()
+        self.archive_manifest = tk.IntVar()
         self.export_smpl.set(options.export_smpl)
         self.export_cue.set(options.export_cue)
+        self.render.set(options.render)
+        self.render_slices.set(options.render_slices)
+        self.archive_deflate.set(options.archive_deflate)
+        self.archive_manifest.set(options.archive_manifest)
 
         fr = tk.Frame(self)
 
@@ -59,6 +71,26 @@ class ExportOptionsDialog(tk.Toplevel):
                 text="Export slices info in 'cue ' chunk",
                 variable=self.export_cue
             ).grid(row=1, column=0)
+        tk.Checkbutton(
+                fr,
+                text="Export only the played part (start to end)",
+                variable=self.render
+            ).grid(row=2, column=0)
+        tk.Checkbutton(
+                fr,
+                text="Also export each slice of the played part (export all)",
+                variable=self.render_slices
+            ).grid(row=3, column=0)
+        tk.Checkbutton(
+                fr,
+                text="Compress zip archives",
+                variable=self.archive_deflate
+            ).grid(row=4, column=0)
+        tk.Checkbutton(
+                fr,
+                text="Add samples metadata to archives",
+                variable=self.archive_manifest
+            ).grid(row=5, column=0)
 
         fr.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
@@ -102,6 +134,10 @@ class ExportOptionsDialog(tk.Toplevel):
     def update_data(self):
         self.options.export_smpl = self.export_smpl.get()
         self.options.export_cue = self.export_cue.get()
+        self.options.render = self.render.get()
+        self.options.render_slices = self.render_slices.get()
+        self.options.archive_deflate = self.archive_deflate.get()
+        self.options.archive_manifest = self.archive_manifest.get()
 
     #
     # standard button semantics
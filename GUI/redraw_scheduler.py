@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright (C) 2018 Jonathan Taquet
+
+This file is part of Oe2sSLE (Open e2sSample.all Library Editor).
+
+Oe2sSLE is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Oe2sSLE is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Oe2sSLE.  If not, see <http://www.gnu.org/licenses/>
+"""
+
+import math
+import time
+
+
+class RedrawScheduler:
+    """
+    call a redraw function at most once per frame
+
+    Requests made while a frame is pending, or while it is being drawn, are
+    coalesced into it: the redraw function must first apply the events it
+    was requested for. Frames are spaced by at least 1/max_fps second, so
+    that bursts of events (motion, resize, variable traces) do not starve
+    the Tk event loop.
+
+    frames counts the frames drawn, coalesced the requests merged into a
+    pending frame and dropped the frames missed because a redraw took
+    longer than a frame.
+    """
+    def __init__(self, widget, redraw, max_fps=60):
+        self.widget = widget
+        self.redraw = redraw
+        self.max_fps = max_fps
+        self.pending = None
+        self.running = False
+        self.last = None
+        self.frames = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+    def request(self):
+        if self.pending is not None or self.running:
+            self.coalesced += 1
+            return
+        delay = 0
+        if self.last is not None:
+            delay = self.last + 1/self.max_fps - time.perf_counter()
+        if delay > 0:
+            self.pending = self.widget.after(int(math.ceil(delay*1000)), self._frame)
+        else:
+            self.pending = self.widget.after_idle(self._frame)
+
+    def cancel(self):
+        if self.pending is not None:
+            self.widget.after_cancel(self.pending)
+            self.pending = None
+
+    def _frame(self):
+        self.pending = None
+        self.last = time.perf_counter()
+        self.running = True
+        try:
+            self.redraw()
+        finally:
+            self.running = False
+        self.frames += 1
+        elapsed = time.perf_counter() - self.last
+        self.dropped += int(elapsed*self.max_fps)
+
+    def stats(self):
+        return "{} frames, {} coalesced requests, {} dropped frames".format(self.frames, self.coalesced, self.dropped)
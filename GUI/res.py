@@ -51,6 +51,25 @@ def resource_path(relative_path):
 
     return os.path.join(base_path, relative_path)
 
+class LazyPhotoImage:
+    """
+    image file only loaded the first time it is displayed
+
+    tkinter converts widget options to strings, so the image is loaded when
+    its name is requested.
+    """
+    def __init__(self, file):
+        self.file = file
+        self.image = None
+
+    def load(self):
+        if self.image is None:
+            self.image = tk.PhotoImage(file=resource_path(self.file))
+        return self.image
+
+    def __str__(self):
+        return str(self.load())
+
 def init():
     global exchangeIcon
     global swap_nextIcon
@@ -73,23 +92,23 @@ def init():
     global donateEurIcon
     global donateUsdIcon
 
-    exchangeIcon=tk.PhotoImage(file=resource_path("images/exchange.gif"))
-    swap_nextIcon=tk.PhotoImage(file=resource_path("images/swap-next.gif"))
-    swap_next10Icon=tk.PhotoImage(file=resource_path("images/swap-next-10.gif"))
-    swap_next100Icon=tk.PhotoImage(file=resource_path("images/swap-next-100.gif"))
-    swap_prevIcon=tk.PhotoImage(file=resource_path("images/swap-prev.gif"))
-    swap_prev10Icon=tk.PhotoImage(file=resource_path("images/swap-prev-10.gif"))
-    swap_prev100Icon=tk.PhotoImage(file=resource_path("images/swap-prev-100.gif"))
-    next_freeIcon=tk.PhotoImage(file=resource_path("images/next-free.gif"))
-    prev_freeIcon=tk.PhotoImage(file=resource_path("images/prev-free.gif"))
-
-    replaceIcon=tk.PhotoImage(file=resource_path("images/replace.gif"))
-    exportIcon=tk.PhotoImage(file=resource_path("images/export.gif"))
-    editIcon=tk.PhotoImage(file=resource_path("images/edit.gif"))
-    trashIcon=tk.PhotoImage(file=resource_path("images/trash.gif"))
-    playIcon=tk.PhotoImage(file=resource_path("images/play.gif"))
-    stopIcon=tk.PhotoImage(file=resource_path("images/stop.gif"))
-    stop_smallIcon=tk.PhotoImage(file=resource_path("images/stop-small.gif"))
-    trimIcon=tk.PhotoImage(file=resource_path("images/trim.gif"))
-    donateEurIcon=tk.PhotoImage(file=resource_path("images/donate-eur.gif"))
-    donateUsdIcon=tk.PhotoImage(file=resource_path("images/donate-usd.gif"))
\ No newline at end of file
+    exchangeIcon=LazyPhotoImage("images/exchange.gif")
+    swap_nextIcon=LazyPhotoImage("images/swap-next.gif")
+    swap_next10Icon=LazyPhotoImage("images/swap-next-10.gif")
+    swap_next100Icon=LazyPhotoImage("images/swap-next-100.gif")
+    swap_prevIcon=LazyPhotoImage("images/swap-prev.gif")
+    swap_prev10Icon=LazyPhotoImage("images/swap-prev-10.gif")
+    swap_prev100Icon=LazyPhotoImage("images/swap-prev-100.gif")
+    next_freeIcon=LazyPhotoImage("images/next-free.gif")
+    prev_freeIcon=LazyPhotoImage("images/prev-free.gif")
+
+    replaceIcon=LazyPhotoImage("images/replace.gif")
+    exportIcon=LazyPhotoImage("images/export.gif")
+    editIcon=LazyPhotoImage("images/edit.gif")
+    trashIcon=LazyPhotoImage("images/trash.gif")
+    playIcon=LazyPhotoImage("images/play.gif")
+    stopIcon=LazyPhotoImage("images/stop.gif")
+    stop_smallIcon=LazyPhotoImage("images/stop-small.gif")
+    trimIcon=LazyPhotoImage("images/trim.gif")
+    donateEurIcon=LazyPhotoImage("images/donate-eur.gif")
+    donateUsdIcon=LazyPhotoImage("images/donate-usd.gif")
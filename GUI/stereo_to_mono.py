@@ -111,20 +111,24 @@ class StereoToMonoDialog(tk.Toplevel):
             mix = self.mix_var.get()
             w = ((1 - mix)/2, 1 - (1 - mix)/2) + (0,)*(num_chans-2)
             if self.w != (w):
-                self.w=w
                 wav = wav_tools.wav_from_raw16b(self.e2s_sample.get_data().rawdata, num_chans)
                 n_smpl = len(wav[0])
-                def action():
+                def action(task):
                     def cb(step):
-                        wd.waitBar.step(step)
+                        task.check()
+                        task.step(step)
                     step = 4096
-                    self.data=wav_tools.raw16b_from_wav(wav_tools.wav_mchan_to_mono(wav, self.w, cb, step))
+                    self.data=wav_tools.raw16b_from_wav(wav_tools.wav_mchan_to_mono(wav, w, cb, step))
+                    self.w=w
                 wd = WaitDialog(self.parent)
-                wd.run_max(action, n_smpl)
+                wd.run_max(action, n_smpl, label='stereo to mono')
 
     def play(self):
         self.stop()
         self.update_data()
+        if self.data is None:
+            # cancelled
+            return
         audio.player.play_start(audio.LoopWaveSource(self.data,self.fmt,self.esli))
 
     def stop(self):
@@ -149,6 +153,9 @@ class StereoToMonoDialog(tk.Toplevel):
 
     def apply(self):
         self.update_data()
+        if self.data is None:
+            # cancelled
+            return
         esli_chunk = self.e2s_sample.get_esli().rawdata = self.esli.rawdata
         fmt__chunk = self.e2s_sample.get_fmt().__dict__ = self.fmt.__dict__
         data_chunk = self.e2s_sample.get_data().rawdata = self.data
@@ -19,56 +19,92 @@ along with Oe2sSLE.  If not, see <http://www.gnu.org/licenses/>
 """
 
 import tkinter as tk
+import tkinter.messagebox
 import tkinter.ttk
 
-import threading
+import traceback
 
+import task_runner
 import version
 
+# bounded pool shared by all the dialogs
+runner = task_runner.TaskRunner(workers=4, synchronous=version.debug)
+
 
 class WaitDialog(tk.Toplevel):
+    """
+    modal dialog running a task of the runner
+
+    The progress bar is determinate once the task gives its maximum, the
+    task is cancelled by the Cancel button (or closing the dialog).
+    """
     def __init__(self, parent, *args, **kwargs):
         super().__init__(parent, *args, **kwargs)
         self.transient(parent)
         self.title('Please wait...')
 
+        self.task = None
+        self._done = False
+
         body = tk.Frame(self)
         self.waitBar = tk.ttk.Progressbar(body, orient='horizontal', mode='indeterminate', length=320)
         self.waitBar.pack(expand=True, fill=tk.BOTH, side=tk.TOP)
         self.waitBar.start()
+        self.buttonCancel = tk.Button(body, text="Cancel", width=10, command=self.close)
+        self.buttonCancel.pack(side=tk.TOP, pady=5)
         body.pack(padx=5, pady=5)
 
 
         self.grab_set()
 
         self.protocol("WM_DELETE_WINDOW", self.close)
+        self.bind("<Escape>", lambda event: self.close())
 
         self.waitBar.focus_set()
 
-    def run(self, task, *args, **kwargs):
-        if not version.debug:
-            thr=threading.Thread(target=self._run_thread,args=(task,)+args,kwargs=kwargs)
-            thr.start()
+    def run(self, task, *args, label=None, maximum=None, **kwargs):
+        """
+        run task(handle, *args, **kwargs) until it is done or cancelled
+
+        handle is its task_runner.Task; returns it.
+        """
+        self.task = runner.submit(task, *args, label=label, maximum=maximum, **kwargs)
+        self._poll()
+        if not self._done:
             self.wait_window(self)
-        else:
-            self._run_thread(task,*args, **kwargs)
+        exception = self.task.future.exception()
+        if exception is not None and not isinstance(exception, task_runner.Cancelled):
+            # report it in log file
+            traceback.print_exception(type(exception), exception, exception.__traceback__)
+            tk.messagebox.showwarning(
+                "Error",
+                "An unexpected error occurred.\n"
+                "See log file for details.\n"
+                "Error message:\n{}".format(exception),
+                parent=self.master
+            )
+        return self.task
 
     def run_max(self, task, max, *args, **kwargs):
-        self.waitBar.configure(mode='determinate', maximum=max)
-        if not version.debug:
-            thr=threading.Thread(target=self._run_thread_max,args=(task,)+args,kwargs=kwargs)
-            thr.start()
-            self.wait_window(self)
+        return self.run(task, *args, maximum=max, **kwargs)
+
+    def _poll(self):
+        runner.process()
+        task = self.task
+        if task.maximum:
+            if str(self.waitBar['mode']) != 'determinate':
+                self.waitBar.stop()
+            self.waitBar.configure(mode='determinate', maximum=task.maximum, value=min(task.value, task.maximum))
+        if task.done():
+            # calls marshaled just before the end of the task
+            runner.process()
+            self._done = True
+            self.destroy()
         else:
-            self._run_thread_max(task, *args, **kwargs)
-
-    def _run_thread(self, task, *args, **kwargs):
-        task(*args,**kwargs)
-        self.destroy()
-
-    def _run_thread_max(self, task, *args, **kwargs):
-        task(*args,**kwargs)
-        self.destroy()
+            self.after(20, self._poll)
 
     def close(self):
-        pass
+        if self.task is not None and not self.task.cancelled():
+            self.task.cancel()
+            self.title('Cancelling...')
+            self.buttonCancel.configure(state=tk.DISABLED)
@@ -18,6 +18,10 @@ You should have received a copy of the GNU General Public License
 along with Oe2sSLE.  If not, see <http://www.gnu.org/licenses/>
 """
 
+# must be done first to time the imports
+import startup_profile
+startup_profile.install()
+
 import tkinter as tk
 import tkinter.filedialog
 import tkinter.messagebox
@@ -37,6 +41,10 @@ import os
 import os.path
 
 import audio
+from wav_peaks import PeakPyramid, PeakPreview, PeakBuilder, PREVIEW_LENGTH
+from wav_raster import WaveRaster
+import wav_thumbnail
+import wav_spectrogram
 
 import struct
 import webbrowser
@@ -50,9 +58,18 @@ from GUI.about_dialog import AboutDialog
 from GUI.import_options import ImportOptionsDialog, ImportOptions
 from GUI.export_options import ExportOptionsDialog, ExportOptions
 from GUI.exchange_sample_dialog import ExchangeSampleDialog
+from GUI.batch_edit_dialog import BatchEditDialog
+from GUI.duplicates_dialog import DuplicatesDialog
 from GUI.tooltip import ToolTip
+from GUI.redraw_scheduler import RedrawScheduler
 
 import e2s_sample_import
+import e2s_sample_index
+import e2s_sample_selection
+import e2s_sample_journal
+import e2s_sample_export
+import e2s_sample_dedup
+import task_runner
 
 import utils
 
@@ -122,18 +139,31 @@ class WaveDisplay(tk.Canvas):
             self.attack_last=attack_last
             self.amplitude=amplitude
     
+    # redraws per second cap
+    max_fps = 60
+
     def __init__(self, *arg, **kwarg):
         kwarg['highlightthickness']=0
         super().__init__(*arg, **kwarg)
         self.bind("<Configure>", self.on_resize)
+        self.bind("<Destroy>", self.on_destroy)
         self.height = self.winfo_reqheight()
         self.width = self.winfo_reqwidth()
         
         self.toRefresh = False
         self.refreshLineSetOnly = False
+        self.redraw = RedrawScheduler(self, self.draw_wav, self.max_fps)
+        # last B1 motion event, applied on the next frame
+        self.dragEvent = None
         self.scrollBar = None
 
-        self.wav = [[int(20000*math.sin(x*2.*math.pi/self.width)) for x in range(self.width)]]*2
+        self.peaksBuilder = None
+        # 'wave' or 'spectrogram'
+        self.viewMode = 'wave'
+        self.wavRawdata = None
+        self.spectrogram = None
+        self.spectrogramPolling = False
+        self.peaks = PeakPyramid.from_wav([[int(20000*math.sin(x*2.*math.pi/self.width)) for x in range(self.width)]]*2)
         self.bitmap = bytearray()
         self.dispFrom = 0
         self.dispTo = self.width-1
@@ -142,7 +172,12 @@ class WaveDisplay(tk.Canvas):
         self.ampTot = 65536
         self.bgColor = (0,0,127)
         self.wavColor= (0,0,255)
+        self.raster = WaveRaster(self.bgColor, self.wavColor, amp_max=self.ampMax, amp_tot=self.ampTot)
         self.photo = tk.PhotoImage(width=self.width, height=self.height)
+        # (peaks, from, to, width, height, colors) of the cached wav image
+        self.wav_ppm_view = None
+        # line set markers: key -> (canvas item, coords, color)
+        self.markers = {}
         self.photo_handle = self.create_image((0,0), anchor=tk.NW, image=self.photo, state="normal")
 
         self.refresh()
@@ -173,23 +208,65 @@ class WaveDisplay(tk.Canvas):
             raise Exception('format tag')
         if wave_fmt.bitPerSample != 16:
             raise Exception('bit per sample')
+        if self.peaksBuilder is not None:
+            self.peaksBuilder.cancel()
+            self.peaksBuilder = None
+        rawdata = wave_data.rawdata
         num_chans = wave_fmt.channels
-        num_samples = len(wave_data.rawdata)//2//num_chans
-        tot_num_samples = num_samples*num_chans
-        samples = struct.unpack('<'+str(tot_num_samples)+'h', wave_data.rawdata)
-        self.wav = []
-        for chan in range(num_chans):
-            self.wav.append(samples[chan:tot_num_samples:num_chans])
+        length = len(rawdata)//2//num_chans
+        if self.spectrogram is not None and self.spectrogram.rawdata is not rawdata:
+            # the tiles are only valid for the data they were computed from
+            self.spectrogram.close()
+            self.spectrogram = None
+        self.wavRawdata = rawdata
+        if length > PREVIEW_LENGTH:
+            # show rough peaks until the full ones are computed
+            self.peaks = PeakPreview(rawdata, num_chans, -(-length//PREVIEW_LENGTH))
+            self.peaksBuilder = PeakBuilder(rawdata, num_chans)
+            self.after(50, self._poll_peaks, self.peaksBuilder)
+        else:
+            self.peaks = PeakPyramid(rawdata, num_chans)
         self.dispFrom = 0
-        self.dispTo = num_samples
+        self.dispTo = self.peaks.length
         self.activeLineSet = None
         self.refresh()
         
+    def _poll_peaks(self, builder):
+        if builder is not self.peaksBuilder:
+            # another wav was set
+            return
+        if not self.winfo_exists():
+            builder.cancel()
+            return
+        if not builder.done():
+            self.after(50, self._poll_peaks, builder)
+            return
+        self.peaksBuilder = None
+        if builder.result is not None:
+            self.peaks = builder.result
+            self.refresh()
+
+    def set_viewMode(self, viewMode):
+        if viewMode == 'spectrogram' and not wav_spectrogram.available:
+            viewMode = 'wave'
+        if self.viewMode != viewMode:
+            self.viewMode = viewMode
+            self.refresh()
+
+    def _poll_spectrogram(self):
+        if self.spectrogram is None or not self.winfo_exists():
+            self.spectrogramPolling = False
+        elif self.spectrogram.pending():
+            self.after(50, self._poll_spectrogram)
+        else:
+            self.spectrogramPolling = False
+            self.refresh()
+
     def wav_length(self):
-        return len(self.wav[0])
+        return self.peaks.length
     
     def num_channels(self):
-        return len(self.wav)
+        return self.peaks.num_chans
 
     def set_disp(self, dispFrom, dispTo):
         assert dispFrom < dispTo
@@ -208,6 +285,10 @@ class WaveDisplay(tk.Canvas):
     scroll by a step in samples
     """
     def scroll(self, step):
+        # whole samples, so that the displayed image can be reused
+        # (see scroll_shift), but at least one
+        if step:
+            step = int(round(step)) or (1 if step > 0 else -1)
         self.set_disp(self.dispFrom+step, self.dispTo+step)
     
     def scroll_to(self, offset):
@@ -237,8 +318,10 @@ class WaveDisplay(tk.Canvas):
 
     def set_zoom_x(self, zoom):
         x_mid = self.dispFrom + (self.dispTo-self.dispFrom)/2
-        dispFrom = int(round(x_mid-self.width/zoom/2))
-        dispTo = int(round(x_mid+self.width/zoom/2))
+        # same number of samples wherever the view is
+        length = max(1, int(round(self.width/zoom)))
+        dispFrom = int(round(x_mid-length/2))
+        dispTo = dispFrom+length
         if dispFrom < -1:
             diff = -1-dispFrom
             dispFrom += diff
@@ -298,6 +381,12 @@ class WaveDisplay(tk.Canvas):
         self.drag=0
 
     def on_b1_motion(self,event):
+        if self.drag:
+            # only the last motion of a frame is applied
+            self.dragEvent = event
+            self.redraw.request()
+
+    def apply_drag(self, event):
         if self.drag:
             lineset = self.activeLineSet
 
@@ -339,78 +428,84 @@ class WaveDisplay(tk.Canvas):
     def refresh(self, line_set_only=False):
         if self.refreshLineSetOnly and not line_set_only:
             self.refreshLineSetOnly = False
-        if not self.toRefresh:
-            self.toRefresh=True
-            self.after_idle(self.draw_wav)
-        self.update_scrollBar()
+        self.toRefresh=True
+        self.redraw.request()
+
+    def on_destroy(self, event):
+        if event.widget is self:
+            self.redraw.cancel()
+            if self.peaksBuilder is not None:
+                self.peaksBuilder.cancel()
+            if self.spectrogram is not None:
+                self.spectrogram.close()
+            if debug:
+                print("WaveDisplay: " + self.redraw.stats())
+
+    def scroll_shift(self):
+        """
+        columns the cached wav image can be scrolled by to get the current
+        view, 0 if it must be fully redrawn
+        """
+        if self.wav_ppm_view is None:
+            return 0
+        peaks, fr, to, w, h, bgColor, wavColor = self.wav_ppm_view
+        # the columns bounds only move with the view by whole samples
+        # (a PeakPreview works on fractions of samples)
+        if not isinstance(peaks, PeakPyramid) or any(x != int(x) for x in (fr, to, self.dispFrom, self.dispTo)):
+            return 0
+        if (peaks is not self.peaks or w != self.width or h != self.height
+                or bgColor != self.bgColor or wavColor != self.wavColor
+                or abs((to-fr)-(self.dispTo-self.dispFrom)) > 1e-9*(to-fr)):
+            return 0
+        shift = (self.dispFrom-fr)*w/(to-fr)
+        if abs(shift-round(shift)) > 1e-6 or abs(round(shift)) >= w:
+            return 0
+        return int(round(shift))
 
     def update_scrollBar(self):
         if self.scrollBar:
             self.scrollBar.set(self.dispFrom/self.wav_length(), self.dispTo/self.wav_length())
 
     def draw_wav(self):
-        # TODO:
-        #  - put image into object
-        #  - allow to update only parts : slice bar drawn, ...
-        #while True:
+        if self.dragEvent is not None:
+            event = self.dragEvent
+            self.dragEvent = None
+            self.apply_drag(event)
         if self.toRefresh:
             self.toRefresh=False
             w = self.width
             h = self.height
             fr = self.dispFrom
             to = self.dispTo
-    
-            wstep = w*3
-            
-            # from python 3.5:
-            #header = b"P6 %d %d 255 " % (w, h)
-            header = bytes("P6 %d %d 255 " % (w, h), "utf8")
-            head_l = len(header)
 
-            if self.wav:
-                num_chans = self.num_channels()
+            num_chans = self.num_channels()
 
             if not self.refreshLineSetOnly:
                 self.refreshLineSetOnly = True
-                self.wav_ppm = bytearray(head_l+w*h*3)
-                ppm = self.wav_ppm
-                ppm[0:head_l] = header
-                # init with bg color
-                ppm[head_l:] = self.bgColor*(w*h)
-                # draw zero line(s)
-                if self.wav:
-                    for chan in range(num_chans):
-                        line=int((self.ampMax/self.ampTot+chan)*(h/num_chans))
-                        ppm[head_l+line*wstep:head_l+(line+1)*wstep] = (127,127,127)*w
-            
-                # draw wav
-                if self.wav:
-                    for chan in range(num_chans):
-                        _smin=0
-                        _smax=0
-                        for x in range(w):
-                            start=max(0,int(fr+math.floor((to-fr)*(x)/w)))
-                            stop=min(self.wav_length(),max(start+1,int(fr+math.floor((to-fr)*(x+1.)/w))))
-                            if stop>start:
-                                __smin=min(self.wav[chan][start:stop])
-                                __smax=max(self.wav[chan][start:stop])
-                                smin=min(_smax,__smin)
-                                smax=max(_smin,__smax)
-                                _smin=__smin
-                                _smax=__smax
-                            
-                                pStart=int(((self.ampMax-smax)/self.ampTot+chan)*(h/num_chans))
-                                pStop =int(((self.ampMax-smin)/self.ampTot+chan)*(h/num_chans))+1
-
-                                #for i in range(pStop-pStart):
-                                #    ppm[head_l+x*3+wstep*(i+pStart)+0:head_l+x*3+wstep*(i+pStart)+3] = self.wavColor
-                                ppm[head_l+x*3+wstep*pStart+0:head_l+x*3+wstep*pStop+0:wstep] = (self.wavColor[0],)*(pStop-pStart)
-                                ppm[head_l+x*3+wstep*pStart+1:head_l+x*3+wstep*pStop+1:wstep] = (self.wavColor[1],)*(pStop-pStart)
-                                ppm[head_l+x*3+wstep*pStart+2:head_l+x*3+wstep*pStop+2:wstep] = (self.wavColor[2],)*(pStop-pStart)                    
-
-            # draw line sets
-            ppm = bytearray(head_l+w*h*3)
-            ppm[:] = self.wav_ppm
+                self.update_scrollBar()
+                self.raster.bg_color = self.bgColor
+                self.raster.wav_color = self.wavColor
+                shift = self.scroll_shift()
+                if self.viewMode == 'spectrogram' and self.wavRawdata is not None:
+                    if self.spectrogram is None:
+                        self.spectrogram = wav_spectrogram.Spectrogram(self.wavRawdata, self.num_channels())
+                    self.wav_ppm, missing = self.spectrogram.render(fr, to, w, h)
+                    if missing and not self.spectrogramPolling:
+                        # redraw when the missing tiles are computed
+                        self.spectrogramPolling = True
+                        self.after(50, self._poll_spectrogram)
+                elif shift:
+                    self.wav_ppm = self.raster.render_scrolled(self.wav_ppm, self.peaks, fr, to, w, h, shift)
+                else:
+                    self.wav_ppm = self.raster.render(self.peaks, fr, to, w, h)
+                if self.viewMode == 'wave':
+                    self.wav_ppm_view = (self.peaks, fr, to, w, h, self.bgColor, self.wavColor)
+                else:
+                    self.wav_ppm_view = None
+                self.photo.configure(data=bytes(self.wav_ppm), width=w, height=h)
+
+            # draw line sets, as canvas lines over the wav image
+            self.markers_used = set()
             for active in (False, True):
                 for lineSet in self.lineSets:
                     if active == (lineSet is self.activeLineSet):
@@ -430,63 +525,71 @@ class WaveDisplay(tk.Canvas):
                                 lineSet._amp_end_x = end_x
                                 lineSet._amp_y0 = max(0,int((math.floor((self.ampTot-amp)/2)/self.ampTot)*(h/num_chans)))
                                 lineSet._amp_y1 = min(h-1,int((math.floor((self.ampTot+amp)/2)/self.ampTot)*(h/num_chans)))
-                            
-                            
+
                             if end_x > start_x:
                                 for chan in range(num_chans):
                                     y0 = max(0,int((math.floor((self.ampTot-amp)/2)/self.ampTot+chan)*(h/num_chans)))
                                     y1 = min(h-1,int((math.floor((self.ampTot+amp)/2)/self.ampTot+chan)*(h/num_chans)))
-                                    if active:
-                                        ppm[head_l+start_x*3+wstep*y0+0:head_l+(end_x+1)*3+wstep*y0+0:3] = (255,)*(end_x-start_x+1)
-                                        ppm[head_l+start_x*3+wstep*y1+0:head_l+(end_x+1)*3+wstep*y1+0:3] = (255,)*(end_x-start_x+1)
-                                    else:
-                                        ppm[head_l+start_x*3+wstep*y0+0:head_l+(end_x+1)*3+wstep*y0+0:3] = (127,)*(end_x-start_x+1)
-                                        ppm[head_l+start_x*3+wstep*y0+1:head_l+(end_x+1)*3+wstep*y0+1:3] = (127,)*(end_x-start_x+1)
-                                        ppm[head_l+start_x*3+wstep*y1+0:head_l+(end_x+1)*3+wstep*y1+0:3] = (127,)*(end_x-start_x+1)
-                                        ppm[head_l+start_x*3+wstep*y1+1:head_l+(end_x+1)*3+wstep*y1+1:3] = (127,)*(end_x-start_x+1)
+                                    # some red
+                                    color = '#ff007f' if active else '#7f7f7f'
+                                    self.draw_marker((lineSet, 'amp0', chan), (start_x, y0, end_x+1, y0), color, active)
+                                    self.draw_marker((lineSet, 'amp1', chan), (start_x, y1, end_x+1, y1), color, active)
 
                         if fr <= mid <= to:
                             x = round((mid+0.5 - fr)*w/(to - fr))
                             if x >= w:
                                 x = w-1
                             # some green
+                            self.draw_marker((lineSet, 'mid'), (x, 0, x, h), '#00ff7f' if active else '#007f7f', active)
                             if active:
-                                ppm[head_l+x*3+1:head_l+x*3+wstep*h+1:wstep] = (255,)*h
                                 lineSet._mid_x=x
-                            else:
-                                ppm[head_l+x*3+1:head_l+x*3+wstep*h+1:wstep] = (127,)*h
                         elif active:
                             lineSet._mid_x=round((mid+0.5 - fr)*w/(to - fr))
-                                
+
                         if fr <= first <= to:
                             x = math.floor((first+0.25 - fr)*w/(to - fr))
                             if x >= w:
                                 x = w-1
                             # some green and red
+                            self.draw_marker((lineSet, 'first'), (x, 0, x, h), '#ffff7f' if active else '#7f7f7f', active)
                             if active:
-                                ppm[head_l+x*3+0:head_l+x*3+wstep*h+0:wstep] = (255,)*h
-                                ppm[head_l+x*3+1:head_l+x*3+wstep*h+1:wstep] = (255,)*h
                                 lineSet._first_x=x
-                            else:
-                                ppm[head_l+x*3+0:head_l+x*3+wstep*h+0:wstep] = (127,)*h
-                                ppm[head_l+x*3+1:head_l+x*3+wstep*h+1:wstep] = (127,)*h
                         elif active:
                             lineSet._first_x=math.floor((first+0.25 - fr)*w/(to - fr))
-                        
+
                         if fr <= last <= to:
                             x = math.ceil((last+0.75 - fr)*w/(to - fr))
                             if x >= w:
                                 x = w-1
                             # some red
+                            self.draw_marker((lineSet, 'last'), (x, 0, x, h), '#ff007f' if active else '#7f007f', active)
                             if active:
-                                ppm[head_l+x*3+0:head_l+x*3+wstep*h+0:wstep] = (255,)*h
                                 lineSet._last_x=x
-                            else:
-                                ppm[head_l+x*3+0:head_l+x*3+wstep*h+0:wstep] = (127,)*h
                         elif active:
                             lineSet._last_x=math.ceil((last+0.75 - fr)*w/(to - fr))
-                
-            self.photo.configure(data=bytes(ppm), width=w, height=h)
+
+            # remove the markers out of view or of removed line sets
+            for key in list(self.markers):
+                if key not in self.markers_used:
+                    item, coords, color = self.markers.pop(key)
+                    self.delete(item)
+
+    def draw_marker(self, key, coords, color, active):
+        """create or move the canvas line of a marker, only if it changed"""
+        self.markers_used.add(key)
+        marker = self.markers.get(key)
+        if marker is None:
+            item = self.create_line(*coords, fill=color, width=1)
+            self.markers[key] = (item, coords, color)
+        else:
+            item, old_coords, old_color = marker
+            if old_coords != coords:
+                self.coords(item, *coords)
+            if old_color != color:
+                self.itemconfigure(item, fill=color)
+            self.markers[key] = (item, coords, color)
+        if active:
+            self.tag_raise(item)
 
 class MaxValueEntry(tk.Entry):
     def __init__(self, parent, max, *arg, **kwarg):
@@ -526,6 +629,7 @@ class SampleNumSpinbox(ROSpinbox):
         super().__init__(parent, *arg, **kwarg)
         self.config(state=tk.NORMAL)
         self.defaultbg =  self.cget('background')
+        self._quiet=False
         
         self.bind("<Shift-Up>",lambda event: self.big_increase(98))
         self.bind("<Shift-Down>",lambda event: self.big_increase(-98))
@@ -563,6 +667,16 @@ class SampleNumSpinbox(ROSpinbox):
         if not self._safeSet:
             self.SNSvarString.set(self.SNSvar.get())
 
+    def set_quietly(self, value, **kwarg):
+        """set the value, and options as the range, without executing the command"""
+        self._quiet=True
+        try:
+            if kwarg:
+                super().config(**kwarg)
+            self.SNSvar.set(value)
+        finally:
+            self._quiet=False
+
     def _varString_set(self, *args):
         v=self.SNSvarString.get()
         _max=int(self.cget('to'))
@@ -573,7 +687,7 @@ class SampleNumSpinbox(ROSpinbox):
             self.SNSvar.set(v)
             self._safeSet=False
             # execute the command
-            if self.SNScommand:
+            if self.SNScommand and not self._quiet:
                 self.SNScommand()
         else:
             self.config(background="#C80000")
@@ -629,8 +743,9 @@ class Slice:
         self.entryAttack = SampleNumSpinbox(self.master, width=10, from_=-1, textvariable=self.attack, state='readonly')
         self.entryAmplitude = SampleNumSpinbox(self.master, width=10, from_=0, textvariable=self.amplitude, state='readonly')
         self.buttonPlay = tk.Button(self.master, image=GUI.res.playIcon, command=self._play)
+        self.buttonPlay.bind("<Shift-Button-1>", self._play_layer)
 
-        ToolTip(self.buttonPlay, follow_mouse=1, text="play slice")
+        ToolTip(self.buttonPlay, follow_mouse=1, text="play slice\nshift+click: play over the other slices")
         
         self._selected=False
         self.entryStart.bind("<FocusIn>",self._focus_in,add="+")
@@ -774,6 +889,15 @@ class Slice:
         if stop > 0:
             audio.player.play_start(audio.Sound(self.data[start:stop],self.fmt))
 
+    def _play_layer(self, *args):
+        start=self.start.get()
+        stop=self.stop.get()
+        if stop >= start:
+            amp=self.esli.slices[self.sliceNum].amplitude/65536
+            voice=audio.Voice(self.data, self.fmt, start, stop+1, gain=audio.esli_gain(self.esli)*amp, rate=audio.esli_rate(self.esli))
+            audio.player.play_layer(voice)
+        return "break"
+
 class FrameSlices(tk.Frame):
     def __init__(self, master, editor, *arg, **kwarg):
         super().__init__(master, *arg, **kwarg)
@@ -866,7 +990,8 @@ class NormalSampleOptions(tk.LabelFrame):
     def trim(self):
         if tkinter.messagebox.askokcancel(
                 'Trim Sample',
-                'This operation is not reversible',
+                'Trim the sample to its start and end points?\n'
+                'This can be undone from the main window.',
                 icon='warning'
         ):
             audio.player.play_stop()
@@ -1059,6 +1184,13 @@ class SliceEditor(tk.PanedWindow):
         self.zoomVar.trace("w",self._zoom_edit)
         self.zoomEdit = ROSpinbox(framezoom, values=('all',), textvariable=self.zoomVar)
         self.zoomEdit.pack(side=tk.LEFT)
+        tk.Label(framezoom,text="View:").pack(side=tk.LEFT, padx=(10,0))
+        self.viewModeEdit = ROCombobox(framezoom, values=('wave', 'spectrogram'), width=12, command=self._viewMode_set)
+        self.viewModeEdit.set('wave')
+        self.viewModeEdit.pack(side=tk.LEFT)
+        if not wav_spectrogram.available:
+            self.viewModeEdit.config(state=tk.DISABLED)
+            ToolTip(self.viewModeEdit, follow_mouse=1, text="spectrogram requires numpy")
         frameWave.update_idletasks()
         self.add(frameWave, minsize=frameWave.winfo_reqheight())
         
@@ -1122,10 +1254,33 @@ class SliceEditor(tk.PanedWindow):
         
         tk.Button(frame, text="Off them all", command=self.allActiveStepsOff).grid(row=8, column=0, columnspan=17, padx=5, pady=5)
 
+        frame = tk.Frame(self.frame.interior)
+        frame.pack()
+
+        tk.Label(frame, text="Tempo").pack(side=tk.LEFT)
+        self.tempo = tk.IntVar()
+        self.tempo.set(120)
+        self.tempoEdit = SampleNumSpinbox(frame, width=4, from_=20, to=300, textvariable=self.tempo)
+        self.tempoEdit.pack(side=tk.LEFT)
+        self.buttonPlaySteps = tk.Button(frame, image=GUI.res.playIcon, command=self.play_steps)
+        self.buttonPlaySteps.pack(side=tk.LEFT, padx=5, pady=5)
+        self.buttonStopSteps = tk.Button(frame, image=GUI.res.stopIcon, command=audio.player.play_stop)
+        self.buttonStopSteps.pack(side=tk.LEFT, padx=5, pady=5)
+
+        ToolTip(self.buttonPlaySteps, follow_mouse=1, text="play the slices steps pattern at this tempo")
+        ToolTip(self.buttonStopSteps, follow_mouse=1, text="stop playback")
+
     def allActiveStepsOff(self):
         for j in range(64):
             self.activeSteps[j].set("Off")
 
+    def play_steps(self):
+        smpl = self.smpl
+        audio.player.play_start(audio.SliceSequencer(smpl.get_data().rawdata, smpl.get_fmt(), self.esli, self.tempo.get()))
+
+    def _viewMode_set(self, *args):
+        self.wavDisplay.set_viewMode(self.viewModeEdit.get())
+
     def _zoom_edit(self, *args):
         zoomStr = self.zoomVar.get()
         
@@ -1140,7 +1295,9 @@ class SliceEditor(tk.PanedWindow):
         if command == tk.MOVETO:
             offset = float(args[0])
             scroll_tot = self.wavDisplay.wav_length()
-            self.wavDisplay.scroll_to(scroll_tot * offset)
+            # whole pixels steps, so that the displayed image can be reused
+            zoom = self.wavDisplay.get_zoom_x()
+            self.wavDisplay.scroll_pix(round((scroll_tot*offset - self.wavDisplay.dispFrom)*zoom))
         elif command == tk.SCROLL:
             step = float(args[0])
             what = args[1]
@@ -1246,6 +1403,8 @@ class SliceEditorDialog(tk.Toplevel):
         self.withdraw()
         self.transient(parent)
         self.protocol("WM_DELETE_WINDOW", self.on_delete)
+        # called when the editor is closed
+        self.on_close = None
         
         self.sliceEditor = SliceEditor(self)
         self.sliceEditor.pack(fill=tk.BOTH, expand=tk.YES)
@@ -1270,7 +1429,8 @@ class SliceEditorDialog(tk.Toplevel):
             self.bind('<Button-4>', _on_up)
             self.bind('<Button-5>', _on_down)
 
-    def run(self):
+    def run(self, on_close=None):
+        self.on_close = on_close
         self.deiconify()
         
         self.grab_set()        
@@ -1280,6 +1440,9 @@ class SliceEditorDialog(tk.Toplevel):
     def on_delete(self):
         audio.player.play_stop()
         self.withdraw()
+        if self.on_close is not None:
+            self.on_close()
+            self.on_close = None
 
         parent=self.master
         parent.grab_set()
@@ -1290,7 +1453,7 @@ class Sample(object):
         e2s.esli_OSC_cat_to_str[k]
         for k in sorted(e2s.esli_OSC_cat_to_str))
 
-    def __init__(self, master, line_num, sample_num):
+    def __init__(self, master, line_num, pos):
         self.master = master
         self.frame = master.frame
 
@@ -1303,13 +1466,15 @@ class Sample(object):
         self.stereo=tk.BooleanVar()
         self.smpSize=tk.IntVar()
 
-        self.name_trace = None
-        self.oscNum_trace = None
-        self.oneShot_trace = None
-        self.plus12dB_trace = None
-        self.tuneVal_trace = None
+        # while the row is bound to a sample, the traces must not write back
+        self.updating = False
+        # last values pushed to the widgets
+        self.shown = {}
 
-        self.radioButton = tk.Radiobutton(self.frame, variable=self.master.selectV)
+        self.radioButton = tk.Radiobutton(self.frame, variable=self.master.selectV, command=self._on_select)
+        self.radioButton.bind("<Control-Button-1>", lambda event: self._on_select('toggle'))
+        self.radioButton.bind("<Shift-Button-1>", lambda event: self._on_select('range'))
+        self.radioBg = self.radioButton.cget('bg')
         self.replaceButton = tk.Button(self.frame, image=GUI.res.replaceIcon, command=self._on_replace)
         self.exportButton = tk.Button(self.frame, image=GUI.res.exportIcon, command=self._on_export)
         self.durationEntry = tk.Label(self.frame, width=8, state=tk.DISABLED, relief=tk.SUNKEN, anchor=tk.E)
@@ -1322,6 +1487,8 @@ class Sample(object):
         self.check12dB = tk.Checkbutton(self.frame, variable=self.plus12dB)
         self.entryTune = ROSpinbox(self.frame, from_=-63, to=63, width=3, format='%2.0f', textvariable=self.tuneVal)
         self.buttonPlay = tk.Button(self.frame, image=GUI.res.playIcon, command=self.play)
+        self.buttonPlay.bind("<Shift-Button-1>", self.play_layer)
+        self.thumbnail = tk.Label(self.frame, bd=1, relief=tk.SUNKEN)
         self.checkStereo = tk.Checkbutton(self.frame, variable=self.stereo, command=self._stereo_command)
         self.sizeEntry = tk.Entry(self.frame, width=8, textvariable=self.smpSize, state=tk.DISABLED, justify=tk.RIGHT)
         self.buttonEdit = tk.Button(self.frame, image=GUI.res.editIcon, command=self._on_edit)
@@ -1329,14 +1496,20 @@ class Sample(object):
 
         ToolTip(self.replaceButton, follow_mouse=1, text="import replacement sample")
         ToolTip(self.exportButton, follow_mouse=1, text="export sample")
-        ToolTip(self.buttonPlay, follow_mouse=1, text="play full WAV content\n(start/loop/end are ignored)")
+        ToolTip(self.buttonPlay, follow_mouse=1, text="play full WAV content\n(start/loop/end are ignored)\nshift+click: play over the other samples\nas the electribe does")
         ToolTip(self.buttonEdit, follow_mouse=1, text="edit loop/slices points")
         ToolTip(self.buttonDelete, follow_mouse=1, text="delete")
 
-        self.restore(line_num, sample_num)
+        self.name_trace = self.name.trace('w', self._name_set)
+        self.oscNum_trace = self.oscNum.trace('w', self._oscNum_set)
+        self.oneShot_trace = self.oneShot.trace('w', self._oneShot_set)
+        self.plus12dB_trace = self.plus12dB.trace('w', self._plus12dB_set)
+        self.tuneVal_trace = self.tuneVal.trace('w', self._tuneVal_set)
 
-    def restore(self, line_num, sample_num):
-        self.set_sample_num(sample_num)
+        self.restore(line_num, pos)
+
+    def restore(self, line_num, pos):
+        self.set_pos(pos)
         self.grid(line_num+1)
 
     def grid(self, row):
@@ -1349,13 +1522,14 @@ class Sample(object):
         self.check12dB.grid(row=row,column=7)
         self.entryTune.grid(row=row,column=8)
         self.buttonPlay.grid(row=row, column=9)
-        self.samplingFreqEntry.grid(row=row, column=10)
-        self.durationEntry.grid(row=row, column=11)
-        self.checkStereo.grid(row=row, column=12)
-        self.sizeEntry.grid(row=row, column=13)
-        self.buttonEdit.grid(row=row, column=14, padx=10)
-        self.exportButton.grid(row=row, column=15, padx=10)
-        self.buttonDelete.grid(row=row, column=16, padx=10)
+        self.thumbnail.grid(row=row, column=10, padx=2)
+        self.samplingFreqEntry.grid(row=row, column=11)
+        self.durationEntry.grid(row=row, column=12)
+        self.checkStereo.grid(row=row, column=13)
+        self.sizeEntry.grid(row=row, column=14)
+        self.buttonEdit.grid(row=row, column=15, padx=10)
+        self.exportButton.grid(row=row, column=16, padx=10)
+        self.buttonDelete.grid(row=row, column=17, padx=10)
 
     def forget(self):
         self.radioButton.grid_forget()
@@ -1368,6 +1542,7 @@ class Sample(object):
         self.check12dB.grid_forget()
         self.entryTune.grid_forget()
         self.buttonPlay.grid_forget()
+        self.thumbnail.grid_forget()
         self.samplingFreqEntry.grid_forget()
         self.durationEntry.grid_forget()
         self.checkStereo.grid_forget()
@@ -1386,6 +1561,7 @@ class Sample(object):
         self.check12dB.destroy()
         self.entryTune.destroy()
         self.buttonPlay.destroy()
+        self.thumbnail.destroy()
         self.samplingFreqEntry.destroy()
         self.durationEntry.destroy()
         self.checkStereo.destroy()
@@ -1393,59 +1569,83 @@ class Sample(object):
         self.buttonEdit.destroy()
         self.buttonDelete.destroy()
 
+    def set_pos(self, pos):
+        """show the sample at position pos of the list view"""
+        self.pos = pos
+        self.set_sample_num(self.master.view_sample_num(pos))
+
     def set_sample_num(self, sample_num):
         self.sample_num = sample_num
         self.e2s_sample = self.master.e2s_samples[sample_num]
         self.reset_vars()
 
     def reset_vars(self):
-        if self.name_trace:
-            self.name.trace_vdelete('w', self.name_trace)
-        if self.oscNum_trace:
-            self.oscNum.trace_vdelete('w', self.oscNum_trace)
-        self.entryOscNum.config(textvariable=None)
-        if self.oneShot_trace:
-            self.oneShot.trace_vdelete('w', self.oneShot_trace)
-        if self.plus12dB_trace:
-            self.plus12dB.trace_vdelete('w', self.plus12dB_trace)
-        if self.tuneVal_trace:
-            self.tuneVal.trace_vdelete('w', self.tuneVal_trace)
-
         esli = self.e2s_sample.get_esli()
         fmt = self.e2s_sample.get_fmt()
-        data = self.e2s_sample.get_data()
+        info = self.e2s_sample.get_info()
 
-        self.entryOscNum.config(from_=self.sample_num+19 if self.sample_num+19<422 else self.sample_num+19+79, to=999)
-
-        self.radioButton.config(value=self.sample_num)
-        self.name.set(esli.OSC_name.decode('ascii', 'ignore').split('\x00')[0])
-        self.oscNum.set(esli.OSC_0index+1)
-        self.entryOscNum._prev = self.oscNum.get()
-        self.entryOscCat.set(Sample.OSC_caths[esli.OSC_category])
-        self.oneShot.set(esli.OSC_OneShot)
-        self.plus12dB.set(esli.playLevel12dB)
-        self.tuneVal.set(esli.sampleTune)
-        self.samplingFreq.set(esli.samplingFreq)
         if fmt.samplesPerSec != esli.samplingFreq:
             print("Warning: sampling frequency differs between esli and fmt")
-        self.durationEntry.config(text="{:.4f}".format(len(data)/fmt.avgBytesPerSec if fmt.avgBytesPerSec else 0))
-        self.stereo.set(fmt.channels > 1)
-        self.smpSize.set(len(data))
 
-        self.name_trace = self.name.trace('w', self._name_set)
-        self.oscNum_trace = self.oscNum.trace('w', self._oscNum_set)
-        self.oneShot_trace = self.oneShot.trace('w', self._oneShot_set)
-        self.plus12dB_trace = self.plus12dB.trace('w', self._plus12dB_set)
-        self.tuneVal_trace = self.tuneVal.trace('w', self._tuneVal_set)
-        self.entryOscNum.config(textvariable=self.oscNum)
-    
+        # only the fields that changed since the last time are pushed to Tk
+        self.updating = True
+        try:
+            self._show('sample_num', self.sample_num, lambda v: self.radioButton.config(value=v))
+            oscNum = info.oscNum
+            oscNum_from = self.sample_num+19 if self.sample_num+19<422 else self.sample_num+19+79
+            self._show('oscNum', (oscNum, oscNum_from), lambda v: self.entryOscNum.set_quietly(v[0], from_=v[1], to=999))
+            self.entryOscNum._prev = oscNum
+            self._show('name', info.name, self.name.set)
+            self._show('oscCat', info.category, self.entryOscCat.set)
+            self._show('oneShot', bool(esli.OSC_OneShot), self.oneShot.set)
+            self._show('plus12dB', bool(esli.playLevel12dB), self.plus12dB.set)
+            self._show('tuneVal', esli.sampleTune, self.tuneVal.set)
+            self._show('samplingFreq', esli.samplingFreq, self.samplingFreqEntry.set_quietly)
+            self._show('duration', "{:.4f}".format(info.duration), lambda v: self.durationEntry.config(text=v))
+            self._show('stereo', info.stereo, self.stereo.set)
+            self._show('smpSize', info.size, self.smpSize.set)
+            self.update_thumbnail()
+            self.update_selected()
+        finally:
+            self.updating = False
+
+    def _show(self, field, value, set_value):
+        if field not in self.shown or self.shown[field] != value:
+            self.shown[field] = value
+            set_value(value)
+
+    def _edited(self):
+        """
+        called when the user edits a field: the widgets may no longer show
+        the cached values
+        """
+        self.shown.clear()
+
+    def update_thumbnail(self):
+        self._show('thumbnail', self.master.thumbnail_image(self.e2s_sample), lambda v: self.thumbnail.config(image=v))
+
+    def update_selected(self):
+        self._show('selected', self.e2s_sample in self.master.selection, lambda v: self.radioButton.config(bg='#a0c8f0' if v else self.radioBg))
+
+    def _on_select(self, mode=None):
+        self.master.select(self.sample_num, mode)
+        if mode is not None:
+            return "break"
+
     def _name_set(self, *args):
+        if self.updating:
+            return
+        self._edited()
         # electribe sampler uses a subset of the ascii encoding
         esli = self.e2s_sample.get_esli()
-        esli.OSC_name = bytes(self.name.get(),'ascii', 'ignore')
+        with self.master.journal.record("rename", samples=(self.e2s_sample,), merge=('name', id(self.e2s_sample))):
+            esli.OSC_name = bytes(self.name.get(),'ascii', 'ignore')
         self.name.set(esli.OSC_name.decode('ascii').rstrip('\x00'))
     
     def _oscNum_set(self, *args):
+        if self.updating:
+            return
+        self._edited()
         oscNum = self.oscNum.get()
         if 422 <= oscNum <= 500:
             if self.entryOscNum._prev < oscNum:
@@ -1453,14 +1653,22 @@ class Sample(object):
             else:
                 self.oscNum.set(421)
             oscNum = self.oscNum.get()
-        self.e2s_sample.get_esli().OSC_0index = oscNum-1
-        self.e2s_sample.get_esli().OSC_0index1 = oscNum-1
+        with self.master.journal.record("renumber", samples=(self.e2s_sample,), merge=('oscNum', id(self.e2s_sample))):
+            self.e2s_sample.get_esli().OSC_0index = oscNum-1
+            self.e2s_sample.get_esli().OSC_0index1 = oscNum-1
         self.entryOscNum._prev = oscNum
     
     def _oscNum_command(self):
+        # renumbered neighbours are part of the same undo step
+        with self.master.journal.record("renumber", merge=('oscNum', id(self.e2s_sample))):
+            self._renumber_neighbours()
+
+    def _renumber_neighbours(self):
+        self._edited()
         oscNum = self.oscNum.get()
         lN = self.sample_num
         e2s_samples = self.master.e2s_samples
+        journal = self.master.journal
 
         maxval = 1000-len(e2s_samples)+lN
         if maxval <= 500:
@@ -1476,6 +1684,7 @@ class Sample(object):
             # is setself.entryOscNum.config(from_=sample_num+19, to=999)
             while lN and e2s_samples[lN-1].get_esli().get_OSCNum() >= e2s_samples[lN].get_esli().get_OSCNum():
                 nextOSCNum = e2s_samples[lN].get_esli().get_OSCNum()
+                journal.track(e2s_samples[lN-1])
                 e2s_samples[lN-1].get_esli().set_OSCNum(nextOSCNum-1 if nextOSCNum != 501 else 421)
                 lN -= 1
                 self.master.update_sample(lN)
@@ -1484,6 +1693,7 @@ class Sample(object):
             #if len(samples)-1 - lN <= 999 - oscNum:
             while lN < len(e2s_samples)-1 and e2s_samples[lN+1].get_esli().get_OSCNum() <= e2s_samples[lN].get_esli().get_OSCNum():
                 prevOSCNum = e2s_samples[lN].get_esli().get_OSCNum()
+                journal.track(e2s_samples[lN+1])
                 e2s_samples[lN+1].get_esli().set_OSCNum(prevOSCNum+1 if prevOSCNum != 421 else 501)
                 lN += 1
                 self.master.update_sample(lN)
@@ -1491,47 +1701,66 @@ class Sample(object):
             #    self.oscNum.set(oscNum-1)
 
     def _oscCat_set(self, *args):
-        self.e2s_sample.get_esli().OSC_category = e2s.esli_str_to_OSC_cat[self.entryOscCat.get()]
+        self._edited()
+        with self.master.journal.record("category", samples=(self.e2s_sample,)):
+            self.e2s_sample.get_esli().OSC_category = e2s.esli_str_to_OSC_cat[self.entryOscCat.get()]
     
     def _oneShot_set(self, *args):
+        if self.updating:
+            return
+        self._edited()
         oneShot = self.oneShot.get()
         if oneShot and self.e2s_sample.get_esli().OSC_LoopStartPoint_offset != self.e2s_sample.get_esli().OSC_EndPoint_offset:
             if tk.messagebox.askyesno("Loop Start is set", "Loop start shall be reset to allow one shot.\nContinue?"):
-                self.e2s_sample.get_esli().OSC_LoopStartPoint_offset = self.e2s_sample.get_esli().OSC_EndPoint_offset
-                self.e2s_sample.get_esli().OSC_OneShot = oneShot
+                with self.master.journal.record("1-shot", samples=(self.e2s_sample,)):
+                    self.e2s_sample.get_esli().OSC_LoopStartPoint_offset = self.e2s_sample.get_esli().OSC_EndPoint_offset
+                    self.e2s_sample.get_esli().OSC_OneShot = oneShot
             else:
                 self.oneShot.set(False)
                 # update checkbutton
                 self.checkOneShot.config(state=tk.NORMAL)
         else:
-            self.e2s_sample.get_esli().OSC_OneShot = oneShot
+            with self.master.journal.record("1-shot", samples=(self.e2s_sample,)):
+                self.e2s_sample.get_esli().OSC_OneShot = oneShot
         
     def _plus12dB_set(self, *args):
-        self.e2s_sample.get_esli().playLevel12dB = self.plus12dB.get()
+        if self.updating:
+            return
+        self._edited()
+        with self.master.journal.record("+12dB", samples=(self.e2s_sample,)):
+            self.e2s_sample.get_esli().playLevel12dB = self.plus12dB.get()
     
     def _tuneVal_set(self, *args):
-        self.e2s_sample.get_esli().sampleTune = self.tuneVal.get()
+        if self.updating:
+            return
+        self._edited()
+        with self.master.journal.record("tune", samples=(self.e2s_sample,), merge=('tune', id(self.e2s_sample))):
+            self.e2s_sample.get_esli().sampleTune = self.tuneVal.get()
     
     def _samplingFreq_command(self, *ars):
+        self._edited()
         sFreq = self.samplingFreq.get()
         esli = self.e2s_sample.get_esli()
         fmt = self.e2s_sample.get_fmt()
         data = self.e2s_sample.get_data()
-        esli.samplingFreq = sFreq
-        # by default play speed is same as indicated by Frequency
-        esli.playLogPeriod = 65535 if sFreq == 0 else max(0, int(round(63132-math.log2(sFreq)*3072)))
-        fmt.samplesPerSec = sFreq
-        fmt.avgBytesPerSec = sFreq*fmt.blockAlign
+        with self.master.journal.record("frequency", samples=(self.e2s_sample,), merge=('samplingFreq', id(self.e2s_sample))):
+            esli.samplingFreq = sFreq
+            # by default play speed is same as indicated by Frequency
+            esli.playLogPeriod = 65535 if sFreq == 0 else max(0, int(round(63132-math.log2(sFreq)*3072)))
+            fmt.samplesPerSec = sFreq
+            fmt.avgBytesPerSec = sFreq*fmt.blockAlign
         self.durationEntry.config(text="{:.4f}".format(len(data)/fmt.avgBytesPerSec if fmt.avgBytesPerSec else 0))
 
     def _stereo_command(self,*args):
+        self._edited()
         # don't switch immediately
         self.stereo.set(not self.stereo.get())
         if not self.stereo.get():
             # mono can't be set to stereo
             return
-        dialog = StereoToMonoDialog(self.checkStereo, self.e2s_sample)
-        self.master.wait_window(dialog)
+        with self.master.journal.record("convert to mono", samples=(self.e2s_sample,)):
+            dialog = StereoToMonoDialog(self.checkStereo, self.e2s_sample)
+            self.master.wait_window(dialog)
         fmt = self.e2s_sample.get_fmt()
         self.stereo.set(fmt.channels > 1)
         data = self.e2s_sample.get_data()
@@ -1540,30 +1769,34 @@ class Sample(object):
 
     def _on_replace(self):
         filename = tk.filedialog.askopenfilename(parent=self.master.parent, title="Select replacement WAV file",filetypes=(('Wav Files','*.wav'), ('All Files','*.*')))
-        def fct():
-            num_converted = dict()
-            res = self.master.parent._import_sample_helper(filename)
+        def replace(sample):
+            esli = sample.get_esli()
+            esli.OSC_0index = esli.OSC_0index1 = self.e2s_sample.get_esli().OSC_0index
+            self.master.e2s_samples[self.sample_num] = sample
+            self.master.update_sample(self.sample_num)
+            self.master.update_WAVDataSize()
+        def fct(task):
+            res = self.master.parent._import_sample_helper(filename, task)
 
             if res:
                 sample, converted_from, converted_to_mono = res
-                esli = sample.get_esli()
-                esli.OSC_0index = esli.OSC_0index1 = self.e2s_sample.get_esli().OSC_0index
-                self.master.e2s_samples[self.sample_num] = sample
-                self.master.update_sample(self.sample_num)
-                self.master.update_WAVDataSize()
+                task.check()
+                task.call_sync(replace, sample)
 
                 if converted_from or converted_to_mono:
                     conversion = (
                         ["from {} bits to 16 bits".format(converted_from)] if converted_from else []
                         + ["to mono"] if converted_to_mono else []
                         )
-                    tk.messagebox.showinfo(
+                    task.call_sync(
+                        tk.messagebox.showinfo,
                         "Import WAV",
                         "'{}' file converted {}.\n".format(filename, " and ".join(conversion))
                         )
         if filename:
-            wd = WaitDialog(self.master.parent)
-            wd.run(fct)
+            with self.master.journal.record("replace", e2s_samples=self.master.e2s_samples):
+                wd = WaitDialog(self.master.parent)
+                wd.run(fct, label='replace')
 
     def _on_export(self):
         self.master.export(self.e2s_sample)
@@ -1577,6 +1810,10 @@ class Sample(object):
     def play(self):
         # TODO: have a single wav player for the whole application
         self.master.play(self.e2s_sample)
+
+    def play_layer(self, *args):
+        self.master.play_layer(self.e2s_sample)
+        return "break"
         
 class SampleList(tk.Frame):
     def __init__(self, parent, *arg, **kwarg):
@@ -1593,27 +1830,43 @@ class SampleList(tk.Frame):
         self.stopButton = tk.Button(self.frame, image=GUI.res.stop_smallIcon, command=self.play_stop)
         ToolTip(self.stopButton, follow_mouse=1, text="stop playback")
 
-        tk.Label(self.frame, text="#Num").grid(row=0, column=3)
-        tk.Label(self.frame, text="Name").grid(row=0, column=4)
-        tk.Label(self.frame, text="Cat.").grid(row=0, column=5)
+        # sort key -> (header label, text)
+        self.sortHeaders = {}
+        def sort_header(key, text, column):
+            label = tk.Label(self.frame, text=text, cursor='hand2')
+            label.grid(row=0, column=column)
+            label.bind('<Button-1>', lambda event: self.sort_by(key))
+            ToolTip(label, follow_mouse=1, text="sort by this column\nclick again to reverse")
+            self.sortHeaders[key] = (label, text)
+        sort_header('num', "#Num", 3)
+        sort_header('name', "Name", 4)
+        sort_header('category', "Cat.", 5)
         tk.Label(self.frame, text="1-shot").grid(row=0, column=6)
         tk.Label(self.frame, text="+12dB").grid(row=0, column=7)
         tk.Label(self.frame, text="Tune").grid(row=0, column=8)
         self.stopButton.grid(row=0, column=9, padx=5)
-        tk.Label(self.frame, text="Freq (Hz)").grid(row=0, column=10)
-        tk.Label(self.frame, text="Time (s)").grid(row=0, column=11)
-        tk.Label(self.frame, text="Stereo").grid(row=0,column=12)
-        tk.Label(self.frame, text="Data Size").grid(row=0, column=13)
-
+        tk.Label(self.frame, text="Wave").grid(row=0, column=10)
+        sort_header('rate', "Freq (Hz)", 11)
+        sort_header('duration', "Time (s)", 12)
+        tk.Label(self.frame, text="Stereo").grid(row=0,column=13)
+        sort_header('size', "Data Size", 14)
+
+        self.selectAllButton = tk.Button(self.frame, text="All", padx=0, pady=0, command=self.select_all)
+        ToolTip(self.selectAllButton, follow_mouse=1, text="select all the listed samples\nctrl+click: add/remove a sample\nshift+click: select a range")
+        self.selectAllButton.grid(row=0, column=0)
         tk.Frame(self.frame, width=2, bd=1, relief=tk.SUNKEN).grid(row=0, column=1, rowspan=999, sticky=tk.N+tk.S)
         self.fill = tk.Label(self.frame)
-        self.fill.grid(row=998, column=2, columnspan=12, sticky=tk.NSEW)
+        self.fill.grid(row=998, column=2, columnspan=13, sticky=tk.NSEW)
         tk.Grid.rowconfigure(self.frame, 998, weight=1)
         self.fill.config(height=self.canvas.winfo_reqheight())
 
         self.sliceEditDialog = None
 
         self.selectV = tk.IntVar()
+        # samples selected for the batch operations
+        self.selection = e2s_sample_selection.Selection()
+        # undo/redo of the edits of e2s_samples
+        self.journal = e2s_sample_journal.Journal()
 
         self.WAVDataSize = tk.IntVar()
 
@@ -1621,6 +1874,25 @@ class SampleList(tk.Frame):
         self.samples_garbage = []
         self.e2s_samples = []
 
+        # positions in e2s_samples of the listed samples, None to list all
+        # in library order
+        self.view = None
+        self.filter = None
+        # (SampleIndex.SORT_KEYS key, reverse), None for the library order
+        self.sort = None
+        self.index = e2s_sample_index.SampleIndex()
+        self.viewUpdatePending = False
+
+        # wave thumbnails, computed in background and cached on disk
+        self.thumbnails = wav_thumbnail.ThumbnailCache(Oe2sSLE_dir + os.sep + 'thumbnails')
+        self.thumbnailRaster = WaveRaster(bg_color=(0,0,127), wav_color=(0,0,255), zero_color=(0,0,127))
+        self.thumbnailHeight = 16
+        self.thumbnailBlank = tk.PhotoImage(width=wav_thumbnail.THUMB_WIDTH, height=self.thumbnailHeight)
+        # summary -> PhotoImage
+        self.thumbnailImages = {}
+        self.thumbnailPolling = False
+        self.bind('<Destroy>', self._on_destroy)
+
         self.update_scrollbar()
 
         # track changes to the canvas and frame width and sync them,
@@ -1636,35 +1908,201 @@ class SampleList(tk.Frame):
             self.fill.config(height=self.canvas.winfo_height())
         if not self.samples:
             return
+        self._fit_rows(event.height)
+        self.update_scrollbar()
+
+    def _fit_rows(self, height):
         # update the inner frame's height to fill the canvas
-        new_h = event.height
+        n = self.view_len()
         _, _, _, h = self.frame.grid_bbox(0,0,0,0)
-        h_max = event.height - h
+        h_max = height - h
         _, _, _, h_line = self.frame.grid_bbox(0,1,0,1)
-        while h_line*(len(self.samples)+1) <= h_max and len(self.samples)+1 <= len(self.e2s_samples):
-            sample_num=self.samples[-1].sample_num+1
-            if sample_num >= len(self.e2s_samples):
+        while h_line*(len(self.samples)+1) <= h_max and len(self.samples)+1 <= n:
+            pos=self.samples[-1].pos+1
+            if pos >= n:
                 self.scroll(-1)
-                sample_num = len(self.e2s_samples)-1
-            self.push_sample(sample_num)
+                pos = n-1
+            self.push_sample(pos)
         while len(self.samples)*h_line > h_max:
             self.pop_sample()
 
-        self.update_scrollbar()
+    def _on_destroy(self, event):
+        if event.widget is self:
+            self.thumbnails.shutdown()
+
+    def thumbnail_image(self, e2s_sample):
+        fmt = e2s_sample.get_fmt()
+        if fmt.formatTag != RIFF.WAVE_fmt_.WAVE_FORMAT_PCM or fmt.bitPerSample != 16:
+            return self.thumbnailBlank
+        summary = self.thumbnails.get(e2s_sample.get_data(), fmt.channels)
+        if summary is None:
+            if not self.thumbnailPolling:
+                self.thumbnailPolling = True
+                self.after(100, self._poll_thumbnails)
+            return self.thumbnailBlank
+        image = self.thumbnailImages.get(summary)
+        if image is None:
+            maxs, mins = wav_thumbnail.peaks(summary)
+            ppm = self.thumbnailRaster.render_columns([(mins, maxs)], wav_thumbnail.THUMB_WIDTH, self.thumbnailHeight)
+            image = tk.PhotoImage(width=wav_thumbnail.THUMB_WIDTH, height=self.thumbnailHeight, data=bytes(ppm))
+            self.thumbnailImages[summary] = image
+        return image
+
+    def _poll_thumbnails(self):
+        done = set(self.thumbnails.done())
+        if done:
+            for sample in self.samples:
+                if sample.e2s_sample.get_data() in done:
+                    sample.update_thumbnail()
+        if self.thumbnails.pending():
+            self.after(100, self._poll_thumbnails)
+        else:
+            self.thumbnailPolling = False
 
     # this is to handle an issue with tkinter:
     # if you destroy a Sample the canvas is resized to its req_height
     def pop_sample(self):
         self.samples_garbage.append(self.samples.pop())
         self.samples_garbage[-1].forget()
-    def push_sample(self, sample_num):
+    def push_sample(self, pos):
         if not self.samples_garbage:
-            smpl = Sample(self,len(self.samples),sample_num)
+            smpl = Sample(self,len(self.samples),pos)
         else:
             smpl = self.samples_garbage.pop()
-            smpl.restore(len(self.samples),sample_num)
+            smpl.restore(len(self.samples),pos)
         self.samples.append(smpl)
 
+    def view_len(self):
+        return len(self.e2s_samples) if self.view is None else len(self.view)
+
+    def view_sample_num(self, pos):
+        return pos if self.view is None else self.view[pos]
+
+    def view_pos(self, sample_num):
+        """position of a sample in the view, None if it is filtered out"""
+        if self.view is None:
+            return sample_num
+        try:
+            return self.view.index(sample_num)
+        except ValueError:
+            return None
+
+    def set_filter(self, query):
+        """
+        list only the samples matching a SampleIndex.search query (a dict of
+        its arguments), or all the samples if query is None
+        """
+        self.filter = query
+        self.update_view()
+
+    def set_sort(self, sort):
+        """
+        list the samples in the (key, reverse) order of SampleIndex.sort, or
+        in library order if sort is None; e2s_samples is left untouched
+        """
+        self.sort = sort
+        for key, (label, text) in self.sortHeaders.items():
+            if sort is not None and sort[0] == key:
+                text += " \u25bc" if sort[1] else " \u25b2"
+            label.config(text=text)
+        self.update_view()
+
+    def sort_by(self, key):
+        if self.sort is not None and self.sort[0] == key:
+            sort = (key, not self.sort[1])
+        else:
+            sort = (key, False)
+        self.set_sort(None if sort == ('num', False) else sort)
+
+    def listed_samples(self):
+        return [self.e2s_samples[self.view_sample_num(pos)] for pos in range(self.view_len())]
+
+    def select(self, sample_num, mode=None):
+        """
+        update the selection when a sample is clicked: mode None selects
+        only this sample, 'toggle' adds or removes it, 'range' selects the
+        listed samples from the anchor of the selection to this one
+        """
+        e2s_sample = self.e2s_samples[sample_num]
+        anchor = self.selection.anchor
+        if mode == 'toggle':
+            self.selection.toggle(e2s_sample)
+        elif mode == 'range' and anchor is not None and anchor in self.e2s_samples:
+            listed = self.listed_samples()
+            first = self.view_pos(self.e2s_samples.index(anchor))
+            last = self.view_pos(sample_num)
+            if first is None or last is None:
+                self.selection.set([e2s_sample])
+            else:
+                self.selection.select_range(listed, first, last)
+        else:
+            self.selection.set([e2s_sample])
+        self.update_selection()
+
+    def select_all(self):
+        self.selection.set(self.listed_samples())
+        self.update_selection()
+
+    def select_samples(self, samples):
+        self.selection.set(samples)
+        self.update_selection()
+
+    def remove_samples(self, samples, label="delete"):
+        """remove several samples in a single undo step"""
+        removed = {id(e2s_sample) for e2s_sample in samples}
+        with self.journal.record(label, e2s_samples=self.e2s_samples):
+            self.e2s_samples[:] = [e2s_sample for e2s_sample in self.e2s_samples if id(e2s_sample) not in removed]
+        self.refresh()
+
+    def update_selection(self):
+        for sample in self.samples:
+            sample.update_selected()
+
+    def update_samples(self):
+        """update the rows after the samples were modified"""
+        if self.view is not None:
+            self.update_view()
+        else:
+            for sample in self.samples:
+                sample.set_sample_num(sample.sample_num)
+
+    def refresh(self):
+        """update everything after samples were added, removed or modified (e.g. undo)"""
+        self.selection.intersect(self.e2s_samples)
+        if self.selectV.get() >= len(self.e2s_samples):
+            self.selectV.set(max(0, len(self.e2s_samples)-1))
+        self.update_WAVDataSize()
+        self.update_view()
+
+    def update_view_later(self):
+        if not self.viewUpdatePending:
+            self.viewUpdatePending = True
+            self.after_idle(self.update_view)
+
+    def update_view(self):
+        """recompute the view after a change of the filter or of the samples"""
+        self.viewUpdatePending = False
+        if self.filter is None and self.sort is None:
+            self.view = None
+        else:
+            self.index.sync(self.e2s_samples)
+            if self.filter is not None:
+                self.view = self.index.search(**self.filter)
+            else:
+                self.view = list(range(len(self.e2s_samples)))
+            if self.sort is not None:
+                self.view = self.index.sort(self.view, *self.sort)
+        n = self.view_len()
+        first = self.samples[0].pos if self.samples else 0
+        while len(self.samples) > n:
+            self.pop_sample()
+        if not self.samples and n:
+            self.push_sample(0)
+        if self.samples:
+            self.scroll_to(first)
+            self._fit_rows(self.canvas.winfo_height())
+        self.update_scrollbar()
+
     def find_max_sample_0index(self):
         # e2s_samples are currently ordered by OSC_0index
         if self.e2s_samples:
@@ -1745,15 +2183,16 @@ class SampleList(tk.Frame):
         self.WAVDataSize.set(sum(len(s.get_data()) for s in self.e2s_samples))
 
     def update_scrollbar(self):
-        if self.e2s_samples:
-            self.vscrollbar.set(self.samples[0].sample_num/len(self.e2s_samples), (self.samples[-1].sample_num+1)/len(self.e2s_samples))
+        n = self.view_len()
+        if n and self.samples:
+            self.vscrollbar.set(self.samples[0].pos/n, (self.samples[-1].pos+1)/n)
         else:
             self.vscrollbar.set(0, 1)
 
     def on_scroll(self, command, *args):
         if command == tk.MOVETO:
             offset = float(args[0])
-            scroll_tot = len(self.e2s_samples)
+            scroll_tot = self.view_len()
             self.scroll_to(scroll_tot * offset)
         elif command == tk.SCROLL:
             step = float(args[0])
@@ -1768,13 +2207,13 @@ class SampleList(tk.Frame):
 
     def scroll(self, offset):
         if len(self.samples):
-            self.scroll_to(self.samples[0].sample_num+offset)
+            self.scroll_to(self.samples[0].pos+offset)
 
     def scroll_to(self, offset):
-        sample_num = max(0,min(int(offset),len(self.e2s_samples)-len(self.samples)))
+        pos = max(0,min(int(offset),self.view_len()-len(self.samples)))
         for sample in self.samples:
-            sample.set_sample_num(sample_num)
-            sample_num += 1
+            sample.set_pos(pos)
+            pos += 1
         self.update_scrollbar()
 
     def add_new(self, e2s_sample):
@@ -1791,6 +2230,12 @@ class SampleList(tk.Frame):
             self.e2s_samples[smp_num], self.e2s_samples[smp_num-1] = self.e2s_samples[smp_num-1], self.e2s_samples[smp_num]
             smp_num -= 1
         insert_num=smp_num
+        if self.view is not None:
+            if len(self.e2s_samples) > 1 and self.selectV.get() >= smp_num:
+                self.selectV.set(smp_num+1)
+            # samples are usually added in bulk
+            self.update_view_later()
+            return
         # add new sample line if necessary
         n_lines = len(self.samples)
         _, _, _, h = self.frame.grid_bbox(0,0,0,0)
@@ -1809,22 +2254,29 @@ class SampleList(tk.Frame):
 
     def remove(self, sample_num):
         if 0 <= sample_num < len(self.e2s_samples):
-            e2s_sample = self.e2s_samples.pop(sample_num)
+            with self.journal.record("delete", e2s_samples=self.e2s_samples):
+                e2s_sample = self.e2s_samples.pop(sample_num)
+            self.selection.discard([e2s_sample])
             self.WAVDataSize.set(self.WAVDataSize.get()-len(e2s_sample.get_data()))
-            first = self.samples[0].sample_num
-            last = self.samples[-1].sample_num
+            if self.view is not None:
+                if self.selectV.get() >= len(self.e2s_samples):
+                    self.selectV.set(self.selectV.get()-1)
+                self.update_view()
+                return
+            first = self.samples[0].pos
+            last = self.samples[-1].pos
             if last >= sample_num >= first:
                 # move samples
                 if first > 0:
                     # down
                     for s in self.samples:
-                        s.set_sample_num(s.sample_num-1)
+                        s.set_pos(s.pos-1)
                 else:
                     #up
                     for i in range(sample_num-first,last-first):
-                        self.samples[i].set_sample_num(first+i)
-                    if self.samples[-1].sample_num < len(self.e2s_samples):
-                        self.samples[-1].set_sample_num(last)
+                        self.samples[i].set_pos(first+i)
+                    if self.samples[-1].pos < len(self.e2s_samples):
+                        self.samples[-1].set_pos(last)
                     else:
                         smpl = self.samples.pop()
                         smpl.destroy()
@@ -1838,28 +2290,37 @@ class SampleList(tk.Frame):
             sample.destroy()
         self.samples.clear()
         self.e2s_samples.clear()
+        self.selection.clear()
+        self.journal.clear()
+        if self.view is not None:
+            self.view = []
         self.WAVDataSize.set(0)
         self.selectV.set(0)
         self.update_scrollbar()
 
     def update_sample(self, sample_num):
-        if self.samples and self.samples[0].sample_num <= sample_num <= self.samples[-1].sample_num:
-            self.samples[sample_num-self.samples[0].sample_num].set_sample_num(sample_num)
+        for sample in self.samples:
+            if sample.sample_num == sample_num:
+                sample.set_sample_num(sample_num)
 
 
     def exchange(self, a, b, keep_index=False):
-        if not keep_index:
-            # swap osc indexes
-            a_esli = self.e2s_samples[a].get_esli()
-            b_esli = self.e2s_samples[b].get_esli()
-            a_index = a_esli.OSC_0index
-            a_esli.OSC_0index=a_esli.OSC_0index1=b_esli.OSC_0index
-            b_esli.OSC_0index=b_esli.OSC_0index1=a_index
-        # swap samples
-        self.e2s_samples[a], self.e2s_samples[b] = self.e2s_samples[b], self.e2s_samples[a]
+        with self.journal.record("exchange", samples=(self.e2s_samples[a], self.e2s_samples[b]), e2s_samples=self.e2s_samples):
+            if not keep_index:
+                # swap osc indexes
+                a_esli = self.e2s_samples[a].get_esli()
+                b_esli = self.e2s_samples[b].get_esli()
+                a_index = a_esli.OSC_0index
+                a_esli.OSC_0index=a_esli.OSC_0index1=b_esli.OSC_0index
+                b_esli.OSC_0index=b_esli.OSC_0index1=a_index
+            # swap samples
+            self.e2s_samples[a], self.e2s_samples[b] = self.e2s_samples[b], self.e2s_samples[a]
         # update sample objects
-        self.update_sample(a)
-        self.update_sample(b)
+        if self.view is not None:
+            self.update_view()
+        else:
+            self.update_sample(a)
+            self.update_sample(b)
 
     def move_up(self, line_num, keep_index=False):
         if 0 < line_num < len(self.e2s_samples):
@@ -1873,26 +2334,47 @@ class SampleList(tk.Frame):
             return True
         return False
 
+    def move(self, sample_num, to, count=1, keep_index=False):
+        """move count samples from sample_num to position to, see e2s.move_samples"""
+        moved = self.e2s_samples[min(sample_num, to):max(sample_num, to)+count]
+        with self.journal.record("move", samples=moved, e2s_samples=self.e2s_samples):
+            start, stop = e2s.move_samples(self.e2s_samples, sample_num, count, to, keep_index)
+        # update sample objects
+        if self.view is not None:
+            self.update_view()
+        else:
+            for sample in self.samples:
+                if start <= sample.sample_num < stop:
+                    sample.set_sample_num(sample.sample_num)
+
     def set_selected(self, num):
         self.selectV.set(num)
         self.show_selected()
 
 
     def show_selected(self):
+        pos = self.view_pos(self.selectV.get())
+        if pos is None or not self.samples:
+            return
+        if 0 <= pos and self.samples[0].pos > pos:
+            self.scroll_to(pos)
+        elif self.view_len() > pos and self.samples[-1].pos < pos:
+            self.scroll_to(1+pos-len(self.samples))
+
+    def move_up_selected(self, count=1):
         selected = self.selectV.get()
-        if 0 <= selected and self.samples[0].sample_num > selected:
-            self.scroll_to(selected)
-        elif len(self.e2s_samples) > selected and self.samples[-1].sample_num < selected:
-            self.scroll_to(1+selected-len(self.samples))
-
-    def move_up_selected(self):
-        if self.move_up(self.selectV.get()):
-            self.selectV.set(self.selectV.get()-1)
+        if 0 < selected < len(self.e2s_samples):
+            to = max(0, selected-count)
+            self.move(selected, to)
+            self.selectV.set(to)
             self.show_selected()
 
-    def move_down_selected(self):
-        if self.move_down(self.selectV.get()):
-            self.selectV.set(self.selectV.get()+1)
+    def move_down_selected(self, count=1):
+        selected = self.selectV.get()
+        if 0 <= selected < len(self.e2s_samples)-1:
+            to = min(len(self.e2s_samples)-1, selected+count)
+            self.move(selected, to)
+            self.selectV.set(to)
             self.show_selected()
 
     def move_up_selected_to_next_free(self):
@@ -1902,12 +2384,11 @@ class SampleList(tk.Frame):
             if res:
                 list_idx, osc_idx = res
                 esli = self.e2s_samples[selected].get_esli()
-                esli.OSC_0index = esli.OSC_0index1 = osc_idx
-                self.update_sample(selected)
-                while selected > list_idx+1:
-                    self.move_up(selected, keep_index=True)
-                    selected -= 1
-                self.selectV.set(selected)
+                to = min(selected, list_idx+1)
+                with self.journal.record("move", samples=(self.e2s_samples[selected],)):
+                    esli.OSC_0index = esli.OSC_0index1 = osc_idx
+                    self.move(selected, to, keep_index=True)
+                self.selectV.set(to)
                 self.show_selected()
 
     def move_down_selected_to_next_free(self):
@@ -1917,18 +2398,21 @@ class SampleList(tk.Frame):
             if res:
                 list_idx, osc_idx = res
                 esli = self.e2s_samples[selected].get_esli()
-                esli.OSC_0index = esli.OSC_0index1 = osc_idx
-                self.update_sample(selected)
-                while selected < list_idx-1:
-                    self.move_down(selected, keep_index=True)
-                    selected += 1
-                self.selectV.set(selected)
+                to = max(selected, list_idx-1)
+                with self.journal.record("move", samples=(self.e2s_samples[selected],)):
+                    esli.OSC_0index = esli.OSC_0index1 = osc_idx
+                    self.move(selected, to, keep_index=True)
+                self.selectV.set(to)
                 self.show_selected()
 
     def play(self, e2s_sample):
         riff_fmt = e2s_sample.get_fmt()
         audio.player.play_start(audio.Sound(e2s_sample.get_data().rawdata,riff_fmt))
 
+    def play_layer(self, e2s_sample):
+        voice = audio.Voice.from_esli(e2s_sample.get_data().rawdata, e2s_sample.get_fmt(), e2s_sample.get_esli())
+        audio.player.play_layer(voice)
+
     def play_stop(self):
         audio.player.play_stop()
 
@@ -1936,17 +2420,32 @@ class SampleList(tk.Frame):
         if not self.sliceEditDialog:
             self.sliceEditDialog = SliceEditorDialog(self.parent)
         self.sliceEditDialog.sliceEditor.set_sample(self, smpl_num)
-        self.sliceEditDialog.run()
+        # all the edits until the editor is closed are a single undo step,
+        # committed by _edit_done (or at once if the editor cannot be shown)
+        self.journal.begin("edit")
+        try:
+            self.journal.track(self.e2s_samples[smpl_num])
+            self.sliceEditDialog.run(on_close=self._edit_done)
+        except BaseException:
+            self.journal.commit()
+            raise
+
+    def _edit_done(self):
+        self.journal.commit()
+        self.refresh()
 
     def export(self, e2s_sample):
-        oscNum=e2s_sample.get_esli().OSC_0index+1
-        oscName=e2s_sample.get_esli().OSC_name.decode('ascii', 'ignore').split('\x00')[0]
         filename = tk.filedialog.asksaveasfilename(parent=self.parent,title="Export sample as",defaultextension='.wav',filetypes=(('Wav Files','*.wav'), ('All Files','*.*'))
-                                                    ,initialfile="{:0>3}_{}.wav".format(oscNum,oscName))
+                                                    ,initialfile=e2s_sample.get_info().filename())
         if filename:
+            opts = self.parent.export_opts
             try:
-                with open(filename, 'wb') as f:
-                    e2s_sample.write(f, export_smpl=self.parent.export_opts.export_smpl, export_cue=self.parent.export_opts.export_cue)
+                if opts.render:
+                    sample = e2s_sample_export.render_copy(e2s_sample)
+                    e2s_sample_export.write_wav(filename, e2s_sample_export.wav_parts(sample, export_smpl=opts.export_smpl, export_cue=opts.export_cue))
+                else:
+                    with open(filename, 'wb') as f:
+                        e2s_sample.write(f, export_smpl=opts.export_smpl, export_cue=opts.export_cue)
             except Exception as e:
                 tk.messagebox.showwarning(
                 "Export sample as",
@@ -1968,7 +2467,8 @@ class SampleAllEditor(tk.Tk):
 
     def __init__(self, *args, **kw):
         super().__init__(*args, **kw)
-        GUI.res.init()
+        with startup_profile.measure('GUI.res.init'):
+            GUI.res.init()
 
         self.import_opts = ImportOptions()
         self.export_opts = ExportOptions()
@@ -1980,6 +2480,19 @@ class SampleAllEditor(tk.Tk):
         #self.frame = VerticalScrolledFrame(self)
         #self.frame.pack(fill=tk.BOTH, expand=tk.YES)
         #self.sampleList = SampleList(self.frame.interior)
+        fr = tk.Frame(self, borderwidth=2)
+        tk.Label(fr, text="Filter:").pack(side=tk.LEFT)
+        self.filterText = tk.StringVar()
+        self.filterEntry = tk.Entry(fr, width=32, textvariable=self.filterText)
+        ToolTip(self.filterEntry, follow_mouse=1, text="words of the sample names, and:\nis:stereo, is:mono, rate:<Hz>,\ntime<1.5, time>0.2 (seconds)")
+        self.filterEntry.pack(side=tk.LEFT, padx=5)
+        tk.Label(fr, text="Cat.:").pack(side=tk.LEFT)
+        self.filterCat = ROCombobox(fr, values=("All",)+Sample.OSC_caths, width=8, command=self._filter_set)
+        self.filterCat.set("All")
+        self.filterCat.pack(side=tk.LEFT, padx=5)
+        fr.pack(side=tk.TOP, fill=tk.X)
+        self.filterText.trace('w', self._filter_set)
+
         fr = tk.Frame(self,borderwidth=2, relief='sunken')
         self.sampleList = SampleList(self, fr, borderwidth=2)
 
@@ -1993,11 +2506,11 @@ class SampleAllEditor(tk.Tk):
 
         tk.Frame(fr2, height=2, bd=1, relief=tk.SUNKEN).pack(fill=tk.X,padx=2, pady=5)
 
-        self.moveUp100Button = tk.Button(fr2, image=GUI.res.swap_prev100Icon, command=lambda: [self.sampleList.move_up_selected() for i in range(100) ])
+        self.moveUp100Button = tk.Button(fr2, image=GUI.res.swap_prev100Icon, command=lambda: self.sampleList.move_up_selected(100))
         ToolTip(self.moveUp100Button, follow_mouse=1, text="swap up by 100")
         self.moveUp100Button.pack(padx=2, pady=2)
 
-        self.moveUp10Button = tk.Button(fr2, image=GUI.res.swap_prev10Icon, command=lambda: [self.sampleList.move_up_selected() for i in range(10) ])
+        self.moveUp10Button = tk.Button(fr2, image=GUI.res.swap_prev10Icon, command=lambda: self.sampleList.move_up_selected(10))
         ToolTip(self.moveUp10Button, follow_mouse=1, text="swap up by 10")
         self.moveUp10Button.pack(padx=2, pady=2)
 
@@ -2009,11 +2522,11 @@ class SampleAllEditor(tk.Tk):
         ToolTip(self.moveDownButton, follow_mouse=1, text="swap down")
         self.moveDownButton.pack(padx=2, pady=2)
 
-        self.moveDown10Button = tk.Button(fr2, image=GUI.res.swap_next10Icon, command=lambda: [self.sampleList.move_down_selected() for i in range(10) ])
+        self.moveDown10Button = tk.Button(fr2, image=GUI.res.swap_next10Icon, command=lambda: self.sampleList.move_down_selected(10))
         ToolTip(self.moveDown10Button, follow_mouse=1, text="swap down by 10")
         self.moveDown10Button.pack(padx=2, pady=2)
 
-        self.moveDown100Button = tk.Button(fr2, image=GUI.res.swap_next100Icon, command=lambda: [self.sampleList.move_down_selected() for i in range(100) ])
+        self.moveDown100Button = tk.Button(fr2, image=GUI.res.swap_next100Icon, command=lambda: self.sampleList.move_down_selected(100))
         ToolTip(self.moveDown100Button, follow_mouse=1, text="swap down by 100")
         self.moveDown100Button.pack(padx=2, pady=2)
 
@@ -2026,6 +2539,12 @@ class SampleAllEditor(tk.Tk):
         ToolTip(self.moveDownFreeButton, follow_mouse=1, text="move down to next free")
         self.moveDownFreeButton.pack(padx=2, pady=2)
 
+        tk.Frame(fr2, height=2, bd=1, relief=tk.SUNKEN).pack(fill=tk.X,padx=2, pady=5)
+
+        self.batchEditButton = tk.Button(fr2, image=GUI.res.editIcon, command=self.batch_edit)
+        ToolTip(self.batchEditButton, follow_mouse=1, text="edit category, 1-shot, +12dB\nand tune of the selected samples")
+        self.batchEditButton.pack(padx=2, pady=2)
+
         tk.Frame(fr2).pack(fill=tk.Y, expand=True)
 
         fr2.pack(side=tk.LEFT, fill=tk.Y)
@@ -2071,6 +2590,8 @@ class SampleAllEditor(tk.Tk):
         fr2 = tk.Frame(fr, borderwidth=2)
         self.buttonExpAll = tk.Button(fr2, text="Export all as wav", command=self.export_all_sample)
         self.buttonExpAll.pack(side=tk.TOP, fill=tk.BOTH)
+        self.buttonExpArchive = tk.Button(fr2, text="Export all to archive", command=self.export_archive)
+        self.buttonExpArchive.pack(side=tk.TOP, fill=tk.BOTH)
         fr2.pack(side=tk.LEFT, expand=True, fill=tk.BOTH)
 
         fr2 = tk.Frame(fr, borderwidth=2)
@@ -2082,6 +2603,20 @@ class SampleAllEditor(tk.Tk):
         self.buttonLoad = tk.Button(self, text="Open", width=10, command=self.load)
         self.buttonLoad.pack(side=tk.LEFT,fill=tk.Y,padx=5,pady=5)
 
+        self.buttonUndo = tk.Button(self, text="Undo", width=10, command=self.undo, state=tk.DISABLED)
+        self.buttonUndo.pack(side=tk.LEFT,fill=tk.Y,padx=5,pady=5)
+        self.buttonRedo = tk.Button(self, text="Redo", width=10, command=self.redo, state=tk.DISABLED)
+        self.buttonRedo.pack(side=tk.LEFT,fill=tk.Y,padx=5,pady=5)
+        self.sampleList.journal.on_change = self.update_undo_buttons
+
+        self.buttonDuplicates = tk.Button(self, text="Duplicates", width=10, command=self.find_duplicates)
+        self.buttonDuplicates.pack(side=tk.LEFT,fill=tk.Y,padx=5,pady=5)
+        # hashes and fingerprints of the samples data
+        self.dedupCache = e2s_sample_dedup.DedupCache(self.sampleList.thumbnails)
+        self.bind('<Control-z>', lambda event: self.undo())
+        self.bind('<Control-y>', lambda event: self.redo())
+        self.bind('<Control-Shift-Z>', lambda event: self.redo())
+
         self.buttonClear = tk.Button(self, text="Clear all", width=10, command=self.clear)
         self.buttonClear.pack(side=tk.RIGHT,padx=5,pady=5)
 
@@ -2098,18 +2633,88 @@ class SampleAllEditor(tk.Tk):
         sl = self.sampleList
         selected = sl.get_selected()
         if selected is not None:
-            s_num = sl.e2s_samples[selected].get_esli().OSC_0index+1;
-            s_name = sl.e2s_samples[selected].get_esli().OSC_name.decode('ascii', 'ignore').split('\x00')[0];
+            info = sl.e2s_samples[selected].get_info()
             exchg_with = [
-                (sl.e2s_samples[i].get_esli().OSC_0index+1,
-                 sl.e2s_samples[i].get_esli().OSC_name.decode('ascii', 'ignore').split('\x00')[0]) for i in range(len(sl.e2s_samples))
+                (smpl_info.oscNum, smpl_info.name)
+                for smpl_info in (e2s_sample.get_info() for e2s_sample in sl.e2s_samples)
                 ]
-            dialog = ExchangeSampleDialog(self, (s_num, s_name), exchg_with)
+            dialog = ExchangeSampleDialog(self, (info.oscNum, info.name), exchg_with)
             self.wait_window(dialog)
             if dialog.result is not None and dialog.result >= 0 and dialog.result != selected:
                 sl.exchange(selected, dialog.result)
                 sl.set_selected(dialog.result)
 
+    def batch_edit(self):
+        sl = self.sampleList
+        samples = sl.selection.samples(sl.e2s_samples)
+        if not samples:
+            selected = sl.get_selected()
+            if selected is None:
+                return
+            samples = [sl.e2s_samples[selected]]
+        dialog = BatchEditDialog(self, len(samples))
+        self.wait_window(dialog)
+        if dialog.result:
+            if (dialog.result.get('OSC_OneShot')
+                and any(e2s_sample.get_esli().OSC_LoopStartPoint_offset != e2s_sample.get_esli().OSC_EndPoint_offset
+                        for e2s_sample in samples)
+                and not tk.messagebox.askyesno("Loop Start is set", "Loop start shall be reset to allow one shot.\nContinue?")):
+                return
+            with sl.journal.record("edit", samples=samples):
+                changed = e2s.edit_esli(samples, **dialog.result)
+            if changed:
+                sl.update_samples()
+
+    def find_duplicates(self):
+        sl = self.sampleList
+        def analyse(parent, near):
+            def fct(task):
+                return e2s_sample_dedup.find_duplicates(sl.e2s_samples, self.dedupCache, near, task)
+            wd = WaitDialog(parent)
+            task = wd.run(fct, label='find duplicates')
+            if task.future.exception() is not None:
+                return None
+            return task.future.result()
+        groups = analyse(self, False)
+        if groups is None:
+            return
+        dialog = DuplicatesDialog(self, analyse, groups)
+        self.wait_window(dialog)
+        if dialog.result:
+            action, groups = dialog.result
+            samples = e2s_sample_dedup.duplicates(groups)
+            if action == 'select':
+                sl.select_samples(samples)
+            elif tk.messagebox.askyesno("Remove duplicates", "Remove {} duplicated sample(s)?\nThe first sample of each group is kept.".format(len(samples))):
+                sl.remove_samples(samples, "remove duplicates")
+
+    def undo(self):
+        if self.sampleList.journal.undo() is not None:
+            self.sampleList.refresh()
+
+    def redo(self):
+        if self.sampleList.journal.redo() is not None:
+            self.sampleList.refresh()
+
+    def update_undo_buttons(self):
+        journal = self.sampleList.journal
+        label = journal.undo_label()
+        self.buttonUndo.configure(
+            text="Undo {}".format(label) if label else "Undo",
+            state=tk.NORMAL if journal.can_undo() else tk.DISABLED)
+        label = journal.redo_label()
+        self.buttonRedo.configure(
+            text="Redo {}".format(label) if label else "Redo",
+            state=tk.NORMAL if journal.can_redo() else tk.DISABLED)
+
+    def _filter_set(self, *args):
+        query = e2s_sample_index.parse_query(self.filterText.get())
+        if self.filterCat.get() != "All":
+            query['category'] = self.filterCat.get()
+        if len(query) == 1 and not query['text']:
+            query = None
+        self.sampleList.set_filter(query)
+
     def donate_eur(self):
         webbrowser.open('https://www.paypal.com/cgi-bin/webscr?cmd=_s-xclick&hosted_button_id=L6BSNDEHYQ2HE')
     
@@ -2121,7 +2726,7 @@ class SampleAllEditor(tk.Tk):
 
     def clear(self):    
         wd = WaitDialog(self)
-        wd.run(self.sampleList.clear)
+        wd.run(lambda task: task.call_sync(self.sampleList.clear), label='clear')
 
     def import_options(self):
         dialog = ImportOptionsDialog(self, self.import_opts)
@@ -2134,18 +2739,30 @@ class SampleAllEditor(tk.Tk):
     def load(self):
         filename = tk.filedialog.askopenfilename(parent=self,title="Select e2s Sample.all file to open",filetypes=(('.all Files','*.all'),('All Files','*.*')))
         if filename:
-            def fct():
+            def populate(samples):
+                self.sampleList.clear()
+                for sample in samples:
+                    self.sampleList.add_new(sample)
+                    if len(self.sampleList.samples) == 1:
+                        self.update_idletasks()
+                        width, height = (self.winfo_reqwidth(), self.winfo_reqheight())
+                        self.minsize(width, height)
+            def fct(task):
                 try:
-                    samplesAll = e2s.e2s_sample_all(filename=filename)
+                    samplesAll = e2s.e2s_sample_all(filename=filename, task=task)
+                except task_runner.Cancelled:
+                    raise
                 except Exception as e:
-                    tk.messagebox.showwarning(
+                    task.call_sync(
+                    tk.messagebox.showwarning,
                     "Open",
                     "Cannot use this file:\n{}\nError message:\n{}".format(filename, e)
                     )
                     return
 
                 if samplesAll._loadErrors:
-                    tk.messagebox.showwarning(
+                    task.call_sync(
+                    tk.messagebox.showwarning,
                     "Open",
                     ("Recovered from {} error(s) in this file:\n{}\n"
                      "The file is probably corrupted or you found a bug.\n"
@@ -2154,60 +2771,65 @@ class SampleAllEditor(tk.Tk):
                     .format(samplesAll._loadErrors, filename)
                     )
                 
-                self.sampleList.clear()
-                for sample in samplesAll.samples:
-                    self.sampleList.add_new(sample)
-                    if len(self.sampleList.samples) == 1:
-                        self.update_idletasks()
-                        width, height = (self.winfo_reqwidth(), self.winfo_reqheight())
-                        self.minsize(width, height)
+                task.call_sync(populate, samplesAll.samples)
             wd = WaitDialog(self)
-            wd.run(fct)
+            wd.run(fct, label='open')
                 
     def save_as(self):
         if not self.sampleList.WAVDataSize.get() > e2s.WAVDataMaxSize or tk.messagebox.askyesno("Memory overflow", "Are you sure to save with memory overflow?"):
             filename = tk.filedialog.asksaveasfilename(parent=self,title="Save as e2s Sample.all file",defaultextension='.all',filetypes=(('.all Files','*.all'),('All Files','*.*')),initialfile='e2sSample.all')
             if filename:
-                def fct():
+                def fct(task):
                     sampleAll = e2s.e2s_sample_all()
                     for e2s_sample in self.sampleList.e2s_samples:
                         sampleAll.samples.append(e2s_sample)
                     try:
-                        sampleAll.save(filename)
+                        sampleAll.save(filename, task)
+                    except task_runner.Cancelled:
+                        raise
                     except Exception as e:
-                        tk.messagebox.showwarning(
+                        task.call_sync(
+                        tk.messagebox.showwarning,
                         "Save as",
                         "Cannot save to this file:\n{}\nError message:\n{}".format(filename, e)
                         )
                 wd = WaitDialog(self)
-                wd.run(fct)
+                wd.run(fct, label='save')
 
-    def _import_sample_helper(self, filename):
+    def _import_sample_helper(self, filename, task):
+        """converted sample of a wav file, None if it cannot be used (from a task)"""
         try:
             return e2s_sample_import.from_wav(filename, self.import_opts)
 
         except e2s_sample_import.NotWaveFormatPcm:
-            tk.messagebox.showwarning(
+            task.call_sync(
+            tk.messagebox.showwarning,
             "Import WAV",
             "Cannot use this file:\n{}\nWAV format must be WAVE_FORMAT_PCM".format(filename)
             )
 
         except e2s_sample_import.EmptyWav:
-            tk.messagebox.showwarning(
+            task.call_sync(
+            tk.messagebox.showwarning,
             "Import WAV",
             "Cannot use this file:\n{}\nNo data: empty samples are not allowed".format(filename)
             )
 
         except e2s_sample_import.NotSupportedBitPerSample:
-            tk.messagebox.showwarning(
+            task.call_sync(
+            tk.messagebox.showwarning,
             "Import WAV",
             "Cannot use this file:\n{}\nWAV format must preferably use 16 bits per sample.\n" +
             "8 bits and old 24 bits per sample are also supported but will be converted to 16 bits.\n"
             "Convert your file before importing it.".format(filename)
             )
 
+        except task_runner.Cancelled:
+            raise
+
         except BaseException as e:
-            tk.messagebox.showwarning(
+            task.call_sync(
+            tk.messagebox.showwarning,
             "Import WAV",
             "Cannot use this file:\n{}\n"
             "The file is probably corrupted or you found a bug.\n"
@@ -2220,20 +2842,8 @@ class SampleAllEditor(tk.Tk):
 
     def import_sample(self):
         filenames = tk.filedialog.askopenfilenames(parent=self,title="Select WAV file(s) to import",filetypes=(('Wav Files','*.wav'), ('All Files','*.*')))
-        def fct():
-            num_converted = dict()
-            for filename in filenames:
-                res = self._import_sample_helper(filename)
-
-                if not res:
-                    continue
-
-                sample, converted_from, converted_to_mono = res
-
-                if converted_from:
-                    num_converted[converted_from] = num_converted.get(converted_from, 0) + 1
-                if converted_to_mono:
-                    num_converted['mono'] = num_converted.get('mono', 0) + 1
+        def register(samples):
+            for filename, sample in samples:
                 try:
                     self.register_new_sample(sample)
                 except ToManySamples:
@@ -2242,33 +2852,71 @@ class SampleAllEditor(tk.Tk):
                     "Cannot use this file:\n{}\nToo many samples.".format(filename)
                     )
                     break
+        def fct(task):
+            num_converted = dict()
+            samples = []
+            task.progress(0, len(filenames))
+            try:
+                for filename in filenames:
+                    task.check()
+                    res = self._import_sample_helper(filename, task)
+                    task.step()
+
+                    if not res:
+                        continue
 
+                    sample, converted_from, converted_to_mono = res
+
+                    if converted_from:
+                        num_converted[converted_from] = num_converted.get(converted_from, 0) + 1
+                    if converted_to_mono:
+                        num_converted['mono'] = num_converted.get('mono', 0) + 1
+                    samples.append((filename, sample))
+            finally:
+                # keep the files converted before a cancellation
+                task.call_sync(register, samples)
 
             if num_converted:
-                tk.messagebox.showinfo(
+                task.call_sync(
+                    tk.messagebox.showinfo,
                     "Import WAV",
                     ("{} file(s) converted to mono.\n".format(num_converted['mono']) if num_converted.get('mono') else "") +
                     ("{} file(s) converted from 8 bits to 16 bits.\n".format(num_converted[8]) if num_converted.get(8) else "") +
                     ("{} file(s) converted from 24 bits to 16 bits.\n".format(num_converted[24]) if num_converted.get(24) else "")
                     )
 
-        wd = WaitDialog(self)
-        wd.run(fct)
+        with self.sampleList.journal.record("import", e2s_samples=self.sampleList.e2s_samples):
+            wd = WaitDialog(self)
+            wd.run(fct, label='import wav')
                 
     def import_all_sample(self):
         filename = tk.filedialog.askopenfilename(parent=self,title="Select e2sSample.all file to import",filetypes=(('.all Files','*.all'),('All Files','*.*')))
         if filename:        
-            def fct():
+            def register(samples):
+                for sample in samples:
+                    try:
+                        self.register_new_sample(sample)
+                    except ToManySamples:
+                        tk.messagebox.showwarning(
+                        "Import e2sSample.all",
+                        "Too many samples."
+                        )
+                        break
+            def fct(task):
                 try:
-                    samplesAll = e2s.e2s_sample_all(filename=filename)
+                    samplesAll = e2s.e2s_sample_all(filename=filename, task=task)
+                except task_runner.Cancelled:
+                    raise
                 except Exception as e:
-                    tk.messagebox.showwarning(
+                    task.call_sync(
+                    tk.messagebox.showwarning,
                     "Import e2sSample.all",
                     "Cannot use this file:\n{}\nError message:\n{}".format(filename, e)
                     )
                     return
                 if samplesAll._loadErrors:
-                    tk.messagebox.showwarning(
+                    task.call_sync(
+                    tk.messagebox.showwarning,
                     "Import e2sSample.all",
                     ("Recovered from {} error(s) in this file:\n{}\n"
                      "The file is probably corrupted or you found a bug.\n"
@@ -2279,56 +2927,68 @@ class SampleAllEditor(tk.Tk):
                 
                 for sample in samplesAll.samples:
                     e2s_sample_import.apply_forced_options(sample, self.import_opts)
-                    try:
-                        self.register_new_sample(sample)
-                    except ToManySamples:
-                        tk.messagebox.showwarning(
-                        "Import e2sSample.all",
-                        "Too many samples."
-                        )
-                        break
+                task.check()
+                task.call_sync(register, samplesAll.samples)
 
-            wd = WaitDialog(self)
-            wd.run(fct)
+            with self.sampleList.journal.record("import", e2s_samples=self.sampleList.e2s_samples):
+                wd = WaitDialog(self)
+                wd.run(fct, label='import e2sSample.all')
 
     def export_all_sample(self):
         if self.sampleList.samples:
             directory = tk.filedialog.askdirectory(parent=self,title="Export all samples to directory",mustexist=True)
-            def fct():
-                if directory:
-                    # check files do not exist
-                    for e2s_sample in self.sampleList.e2s_samples:
-                        oscNum = e2s_sample.get_esli().OSC_0index+1
-                        oscName = e2s_sample.get_esli().OSC_name.decode('ascii', 'ignore').split('\x00')[0]
-                        filename = "{:0>3}_{}.wav".format(oscNum,oscName)
-                        filename = filename.replace('/','-').replace('\\','-')
-                        filename = directory+"/"+filename
-                        # TODO: dialog to ask if replace/replace-all or select new rename
-                        if os.path.exists(filename):
-                            filename = tk.filedialog.asksaveasfilename(parent=self,title="File exists, export sample as [cancel to abort]",defaultextension='.wav',filetypes=(('Wav Files','*.wav'), ('All Files','*.*'))
-                                                                      ,initialdir=directory,initialfile="{:0>3}_{}.wav".format(oscNum,oscName))
-                            if not filename:
-                                break
-                        ok = False
-                        while not ok:
-                            try:
-                                with open(filename, 'wb') as f:
-                                    e2s_sample.write(f, export_smpl=self.export_opts.export_smpl, export_cue=self.export_opts.export_cue)
-                            except Exception as e:
-                                tk.messagebox.showwarning(
-                                "Export sample as",
-                                "Cannot save sample as:\n{}\nError message:\n{}".format(filename, e)
-                                )
-                                filename = tk.filedialog.asksaveasfilename(parent=self,title="Export sample as [cancel to abort]",defaultextension='.wav',filetypes=(('Wav Files','*.wav'), ('All Files','*.*'))
-                                                                          ,initialdir=directory,initialfile="{:0>3}_{}.wav".format(oscNum,oscName))
-                                if not filename:
-                                    break
-                            ok = True
-                        if not ok:
-                            break
-                                
+            if not directory:
+                return
+            # resolve all the file names before writing any file
+            opts = self.export_opts
+            plan = e2s_sample_export.ExportPlan(self.sampleList.e2s_samples, directory, render=opts.render, slices=opts.render_slices)
+            if plan.conflicts:
+                replace = tk.messagebox.askyesnocancel(
+                    "Export all samples",
+                    "{} file(s) already exist, e.g.:\n{}\n"
+                    "Replace them? (No to skip them)".format(len(plan.conflicts), plan.conflicts[0])
+                    )
+                if replace is None:
+                    return
+                if not replace:
+                    plan.skip_conflicts()
+            def fct(task):
+                report = e2s_sample_export.export(plan.jobs, export_smpl=opts.export_smpl, export_cue=opts.export_cue, render=opts.render, slices=opts.render_slices, task=task)
+                if report.errors:
+                    task.call_sync(
+                    tk.messagebox.showwarning,
+                    "Export all samples",
+                    "Cannot save {} sample(s), e.g.:\n{}\nError message:\n{}".format(len(report.errors), *report.errors[0])
+                    )
             wd = WaitDialog(self)
-            wd.run(fct)
+            wd.run(fct, label='export all')
+
+    def export_archive(self):
+        if self.sampleList.samples:
+            filename = tk.filedialog.asksaveasfilename(parent=self,title="Export all samples to archive",defaultextension='.zip',filetypes=(('Zip Files','*.zip'),('Tar Files','*.tar'),('Compressed Tar Files','*.tar.gz *.tgz')),initialfile='e2sSample.zip')
+            if not filename:
+                return
+            if not filename.lower().endswith(e2s_sample_export.ARCHIVE_EXTENSIONS):
+                tk.messagebox.showwarning(
+                "Export all to archive",
+                "Archive type not handled:\n{}\nUse a .zip, .tar, .tar.gz or .tgz extension.".format(filename)
+                )
+                return
+            e2s_samples = list(self.sampleList.e2s_samples)
+            opts = self.export_opts
+            def fct(task):
+                try:
+                    e2s_sample_export.export_archive(e2s_samples, filename, deflate=opts.archive_deflate, export_smpl=opts.export_smpl, export_cue=opts.export_cue, render=opts.render, slices=opts.render_slices, manifest=opts.archive_manifest, task=task)
+                except task_runner.Cancelled:
+                    raise
+                except Exception as e:
+                    task.call_sync(
+                    tk.messagebox.showwarning,
+                    "Export all to archive",
+                    "Cannot save to this file:\n{}\nError message:\n{}".format(filename, e)
+                    )
+            wd = WaitDialog(self)
+            wd.run(fct, label='export archive')
 
     def register_new_sample(self, e2s_sample):
         esli = e2s_sample.get_esli()
@@ -2377,10 +3037,17 @@ class SampleAllEditor(tk.Tk):
             self.bind_class('TCombobox', '<Button-5>', lambda e: None)
 
 
+startup_profile.module_loaded('Oe2sSLE_GUI')
+
 if __name__ == '__main__':
     # redirect outputs to a logger
     with logger() as log:
         # Create a window
-        app = SampleAllEditor()
+        with startup_profile.measure('SampleAllEditor init'):
+            app = SampleAllEditor()
+            app.update_idletasks()
+        startup_profile.report()
         app.mainloop()
+        app.sampleList.thumbnails.shutdown()
+        GUI.wait_dialog.runner.shutdown()
         audio.terminate()
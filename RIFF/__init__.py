@@ -47,12 +47,24 @@ class ChunkHeader:
 
 
 class ChunkData:
+    # incremented on each modification, so that values derived from the
+    # chunk can be cached
+    version = 0
+
     def __init__(self, file=None, chunkHeader=None, **kw):
         if file:
             self.read(file, chunkHeader)
         else:
             self.rawdata=kw.get('rawdata')
     
+    def __setattr__(self, name, value):
+        self.__dict__['version'] = self.version+1
+        super().__setattr__(name, value)
+
+    def changed(self):
+        """to be called after an in place modification of rawdata"""
+        self.__dict__['version'] = self.version+1
+
     def __len__(self):
         return len(self.rawdata)
 
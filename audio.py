@@ -19,34 +19,328 @@ along with Oe2sSLE.  If not, see <http://www.gnu.org/licenses/>
 
 import wav_tools
 import RIFF
+import startup_profile
 
-import pyaudio as pa
+import array
+import math
+import os
+import sys
+import threading
+import time
 import warnings
+import wave
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
-audio = pa.PyAudio()
+
+class Backend:
+    """
+    audio output backend interface
+
+    open() returns a stream object (start_stream, stop_stream, is_stopped
+    and close methods) that regularly calls render(frames), which
+    returns frames*channels 16 bits little endian samples.
+    """
+    def open(self, rate, channels, render):
+        raise NotImplementedError
+
+    def terminate(self):
+        pass
+
+class PyAudioBackend(Backend):
+    def __init__(self):
+        import pyaudio
+        self.pa = pyaudio
+        self.audio = pyaudio.PyAudio()
+
+    def open(self, rate, channels, render):
+        pa = self.pa
+        def callback(indata, frames, time, status):
+            return (render(frames), pa.paContinue)
+        return self.audio.open(format=pa.paInt16, channels=channels, rate=rate, output=True, stream_callback=callback)
+
+    def terminate(self):
+        self.audio.terminate()
+
+class SimulatedStream:
+    """
+    stream driven by a simulated clock
+
+    Blocks are rendered by pump(), either explicitly (e.g. from tests and
+    benchmarks) or, when realtime is set, by a thread following the wall
+    clock. Rendered data is handed to the sink callable.
+    """
+    def __init__(self, rate, channels, render, sink=None, frames_per_buffer=1024, realtime=True):
+        self.rate = rate
+        self.channels = channels
+        self.render = render
+        self.sink = sink
+        self.frames_per_buffer = frames_per_buffer
+        self.realtime = realtime
+        # simulated clock, in frames
+        self.frames = 0
+        # instrumentation of the render callback
+        self.callbacks = 0
+        self.callback_time = 0.
+        self._stopped = True
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def time(self):
+        return self.frames/self.rate
+
+    def pump(self, frames=None):
+        """render frames (one buffer by default) and advance the clock"""
+        if frames is None:
+            frames = self.frames_per_buffer
+        with self._lock:
+            while frames > 0:
+                n = min(frames, self.frames_per_buffer)
+                t0 = time.perf_counter()
+                data = self.render(n)
+                self.callback_time += time.perf_counter()-t0
+                self.callbacks += 1
+                if self.sink:
+                    self.sink(data)
+                self.frames += n
+                frames -= n
+
+    def _run(self):
+        period = self.frames_per_buffer/self.rate
+        next_time = time.perf_counter()
+        while not self._stopped:
+            self.pump()
+            next_time += period
+            delay = next_time-time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+    def is_stopped(self):
+        return self._stopped
+
+    def start_stream(self):
+        if self._stopped:
+            self._stopped = False
+            if self.realtime:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def stop_stream(self):
+        self._stopped = True
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop_stream()
+
+class NullBackend(Backend):
+    """discard the audio, but still call the render callbacks"""
+    def __init__(self, realtime=True):
+        self.realtime = realtime
+        self.streams = []
+
+    def open(self, rate, channels, render):
+        stream = SimulatedStream(rate, channels, render, realtime=self.realtime)
+        self.streams.append(stream)
+        stream.start_stream()
+        return stream
+
+class WaveFileBackend(Backend):
+    """
+    write the audio to WAV files
+
+    One file is written per stream, named from filename with the rate and
+    the number of channels: out.wav -> out-48000Hz-2ch.wav
+    """
+    def __init__(self, filename, realtime=True):
+        self.filename = filename
+        self.realtime = realtime
+        self.streams = []
+
+    def open(self, rate, channels, render):
+        root, ext = os.path.splitext(self.filename)
+        w = wave.open("{}-{}Hz-{}ch{}".format(root, rate, channels, ext or '.wav'), 'wb')
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        stream = SimulatedStream(rate, channels, render, sink=w.writeframes, realtime=self.realtime)
+        close = stream.close
+        def close_file():
+            close()
+            w.close()
+        stream.close = close_file
+        self.streams.append(stream)
+        stream.start_stream()
+        return stream
+
+def backend_from_env():
+    """
+    backend selected by the OE2SSLE_AUDIO_BACKEND environment variable:
+    'pyaudio' (default), 'null' or 'wav' (file given by OE2SSLE_AUDIO_FILE)
+    """
+    name = os.environ.get('OE2SSLE_AUDIO_BACKEND', 'pyaudio')
+    if name == 'null':
+        return NullBackend()
+    if name == 'wav':
+        return WaveFileBackend(os.environ.get('OE2SSLE_AUDIO_FILE', 'Oe2sSLE-output.wav'))
+    if name != 'pyaudio':
+        warnings.warn('Unknown audio backend: ' + name)
+    return PyAudioBackend()
+
+# the backend is only created on first playback, as PyAudio initialisation
+# (devices enumeration) can take a while
+backend = None
+
+def get_backend():
+    global backend
+    if backend is None:
+        with startup_profile.measure('audio backend init'):
+            backend = backend_from_env()
+    return backend
+
+def set_backend(new_backend):
+    """close all the output streams and use new_backend from now on"""
+    global backend
+    engine.terminate()
+    if backend is not None:
+        backend.terminate()
+    backend = new_backend
+
+class OutputStream:
+    """
+    long-lived output stream for a given (rate, channels) configuration
+
+    The stream is kept running and outputs silence when no source is
+    attached, so that starting a new source does not pay the device
+    opening latency: the source is only swapped inside the callback.
+    """
+    def __init__(self, rate, channels):
+        self.rate = rate
+        self.channels = channels
+        self.blockAlign = 2*channels
+        self.source = None
+        self._lock = threading.Lock()
+        self.stream = get_backend().open(rate, channels, self._render)
+
+    def _render(self, frames):
+        n_bytes = frames*self.blockAlign
+        with self._lock:
+            source = self.source
+            if source is None:
+                return bytes(n_bytes)
+            data, done = source.read(frames)
+            if done:
+                self.source = None
+        if len(data) < n_bytes:
+            data = bytes(data) + bytes(n_bytes-len(data))
+        return bytes(data)
+
+    def attach(self, source):
+        with self._lock:
+            self.source = source
+        if self.stream.is_stopped():
+            self.stream.start_stream()
+
+    def detach(self, source):
+        with self._lock:
+            if self.source is source:
+                self.source = None
+
+    def is_idle(self):
+        return self.source is None
+
+    def close(self):
+        with self._lock:
+            self.source = None
+        self.stream.stop_stream()
+        self.stream.close()
+
+class OutputEngine:
+    """
+    pool of output streams, one per (rate, channels) configuration
+    """
+    # maximum number of streams kept open, the least recently used idle
+    # stream is closed when a new configuration is requested
+    max_streams = 4
+
+    def __init__(self):
+        self.streams = []
+        # owner -> stream, out of the pool
+        self.own_streams = {}
+
+    def get_stream(self, rate, channels):
+        for stream in self.streams:
+            if stream.rate == rate and stream.channels == channels:
+                # move to the end: most recently used
+                self.streams.remove(stream)
+                self.streams.append(stream)
+                return stream
+        for stream in list(self.streams):
+            if len(self.streams) < self.max_streams:
+                break
+            if stream.is_idle():
+                self.streams.remove(stream)
+                stream.close()
+        stream = OutputStream(rate, channels)
+        self.streams.append(stream)
+        return stream
+
+    def get_own_stream(self, owner, rate, channels):
+        """
+        stream only used by owner, out of the pool: its source is never
+        replaced by the sources of the pooled streams and conversely
+        """
+        stream = self.own_streams.get(owner)
+        if stream is None or stream.rate != rate or stream.channels != channels:
+            if stream is not None:
+                stream.close()
+            stream = self.own_streams[owner] = OutputStream(rate, channels)
+        return stream
+
+    def terminate(self):
+        for stream in self.streams + list(self.own_streams.values()):
+            stream.close()
+        self.streams.clear()
+        self.own_streams.clear()
+
+engine = OutputEngine()
 
 class Player:
+    """
+    playback source: read() is called from the output stream callback
+    and returns a (data, done) tuple
+    """
     def __init__(self):
-        self.stream = None
+        self.output = None
 
     def __del__(self):
         self.pause()
 
+    def read(self, frames):
+        return (b'', True)
+
     def pause(self):
-        if self.stream:
-            self.stream.stop_stream()
-            self.stream.close()
-            self.stream = None
+        if self.output:
+            self.output.detach(self)
+            self.output = None
         return self
 
+    def get_stream(self):
+        return engine.get_stream(self.fmt.samplesPerSec, self.fmt.channels)
+
     def play(self):
-        if self.stream and self.stream.is_stopped():
-            self.stream.start_stream()
+        if self.output is None or self.output.source is not self:
+            self.output = self.get_stream()
+            self.output.attach(self)
         return self
 
 class Sound(Player):
     def __init__(self, data, fmt):
+        super().__init__()
 
         if fmt.formatTag != RIFF.WAVE_fmt_.WAVE_FORMAT_PCM:
             raise Exception()
@@ -57,18 +351,24 @@ class Sound(Player):
         self.fmt = fmt
         self._offset = 0
 
-        def callback(indata, frames, time, status):
-            n_bytes=frames*fmt.blockAlign
-            to_read=min(n_bytes, len(self.data) - self._offset)
-            outdata = self.data[self._offset:self._offset+to_read]
-            self._offset += to_read
-            return (outdata,pa.paContinue)
-
-        self.stream = audio.open(format=pa.paInt16, channels=fmt.channels, rate=fmt.samplesPerSec, output=True, stream_callback=callback)
+    def read(self, frames):
+        n_bytes=frames*self.fmt.blockAlign
+        to_read=min(n_bytes, len(self.data) - self._offset)
+        outdata = self.data[self._offset:self._offset+to_read]
+        self._offset += to_read
+        return (outdata, self._offset >= len(self.data))
 
 class LoopWaveSource(Player):
+    """
+    plays a sample from its start point to its end point, then from its
+    loop start point if it is before the end point
+
+    The data is played as is, at its own rate: the volume and tune of the
+    electribe are applied by the Mixer voices (see Voice.from_esli).
+    """
     def __init__(self, data, fmt, esli):
-        
+        super().__init__()
+
         if fmt.formatTag != RIFF.WAVE_fmt_.WAVE_FORMAT_PCM:
             raise Exception()
 
@@ -77,55 +377,360 @@ class LoopWaveSource(Player):
         self.data = data
         self.fmt = fmt
         self.esli = esli
-        
+
         self._total_offset = 0
         self._offset = esli.OSC_StartPoint_address
         self._duration = 0
 
-        """
-        TODO: use esli.playVolume and esli.playLogScale
-        """
-        def callback(indata, frames, time, status):
-            n_bytes=frames*fmt.blockAlign
-            n_read=0
-            data=bytearray(n_bytes)
-            end=self.esli.OSC_StartPoint_address + self.esli.OSC_EndPoint_offset#+self.fmt.blockAlign
-            while n_read < n_bytes:
-                to_read =min(n_bytes-n_read, end - self._offset)
-                data[n_read:n_read+to_read] = self.data[self._offset:self._offset+to_read]
-                n_read += to_read
-                self._offset += to_read
-                if self._offset == end:
-                    if self.esli.OSC_LoopStartPoint_offset < self.esli.OSC_EndPoint_offset:
-                        self._offset = self.esli.OSC_StartPoint_address + self.esli.OSC_LoopStartPoint_offset
-                    else:
-                        break
-
-            if not n_read:
-                return (bytes(data),pa.paComplete)
-         
-            self._total_offset += n_read
-            return (bytes(data),pa.paContinue)
-
-        self.stream = audio.open(format=pa.paInt16, channels=fmt.channels, rate=fmt.samplesPerSec, output=True, stream_callback=callback)
+    def read(self, frames):
+        n_bytes=frames*self.fmt.blockAlign
+        n_read=0
+        data=bytearray(n_bytes)
+        end=self.esli.OSC_StartPoint_address + self.esli.OSC_EndPoint_offset#+self.fmt.blockAlign
+        done=False
+        while n_read < n_bytes:
+            to_read =min(n_bytes-n_read, end - self._offset)
+            data[n_read:n_read+to_read] = self.data[self._offset:self._offset+to_read]
+            n_read += to_read
+            self._offset += to_read
+            if self._offset == end:
+                if self.esli.OSC_LoopStartPoint_offset < self.esli.OSC_EndPoint_offset:
+                    self._offset = self.esli.OSC_StartPoint_address + self.esli.OSC_LoopStartPoint_offset
+                else:
+                    done=True
+                    break
+
+        self._total_offset += n_read
+        return (bytes(data[:n_read]), done)
+
+def esli_gain(esli):
+    """linear gain applied by the electribe for esli.playVolume and esli.playLevel12dB"""
+    gain = esli.playVolume/65535
+    if esli.playLevel12dB:
+        gain *= 10**(12/20)
+    return gain
+
+# cents per unit of esli.sampleTune (-63..63, the "tune" of the sample
+# list). This is an assumption: the unit is not documented and cannot be
+# derived from the file format, the tune is taken as cents.
+SAMPLE_TUNE_CENTS = 1
+
+def esli_rate(esli):
+    """
+    playback rate (in Hz) from esli.playLogPeriod and esli.sampleTune
+
+    playLogPeriod is the inverse of the conversion done when importing:
+    63132-log2(freq)*3072
+    sampleTune is converted with SAMPLE_TUNE_CENTS.
+    """
+    rate = 2**((63132-esli.playLogPeriod)/3072)
+    return rate*2**(esli.sampleTune*SAMPLE_TUNE_CENTS/1200)
+
+class Voice:
+    """
+    a sample played by the Mixer
+
+    start, end and loop_start are frame numbers, end is excluded.
+    The voice loops from loop_start when loop_start is not None.
+    """
+    def __init__(self, data, fmt, start=0, end=None, loop_start=None, gain=1., rate=None):
+        if fmt.formatTag != RIFF.WAVE_fmt_.WAVE_FORMAT_PCM:
+            raise Exception('format tag')
+        if fmt.bitPerSample != 16:
+            raise Exception('bit per sample')
+        self.channels = fmt.channels
+        n_frames = len(data)//fmt.blockAlign
+        if np is not None:
+            self.samples = np.frombuffer(data, dtype='<i2', count=n_frames*self.channels).reshape(-1, self.channels)
+        else:
+            self.samples = array.array('h', data[:n_frames*fmt.blockAlign])
+            if sys.byteorder == 'big':
+                self.samples.byteswap()
+        self.start = max(0, min(start, n_frames))
+        self.end = n_frames if end is None else max(self.start, min(end, n_frames))
+        if loop_start is not None and not self.start <= loop_start < self.end:
+            loop_start = None
+        self.loop_start = loop_start
+        self.gain = gain
+        self.rate = fmt.samplesPerSec if rate is None else rate
+        self.pos = float(self.start)
+        self.done = self.start >= self.end
+
+    @classmethod
+    def from_esli(cls, data, fmt, esli):
+        """voice playing from Start to End, looping if not 1-shot, the way the electribe does"""
+        start = esli.OSC_StartPoint_address//fmt.blockAlign
+        end = (esli.OSC_StartPoint_address+esli.OSC_EndPoint_offset)//fmt.blockAlign
+        loop_start = None
+        if esli.OSC_LoopStartPoint_offset < esli.OSC_EndPoint_offset:
+            loop_start = start+esli.OSC_LoopStartPoint_offset//fmt.blockAlign
+        return cls(data, fmt, start, end, loop_start, esli_gain(esli), esli_rate(esli))
+
+    def _wrap(self, pos):
+        if pos >= self.end and self.loop_start is not None:
+            pos = self.loop_start + math.fmod(pos-self.loop_start, self.end-self.loop_start)
+        return pos
+    def mix_np(self, out, step):
+        frames = len(out)
+        pos = self.pos + step*np.arange(frames)
+        if self.loop_start is not None:
+            over = pos >= self.end
+            pos[over] = self.loop_start + np.fmod(pos[over]-self.loop_start, self.end-self.loop_start)
+        else:
+            frames = int(np.searchsorted(pos, self.end))
+            pos = pos[:frames]
+        i0 = pos.astype(np.intp)
+        # the last frame of a loop is interpolated with its first one
+        i1 = i0+1
+        i1[i1 >= self.end] = self.loop_start if self.loop_start is not None else self.end-1
+        frac = (pos-i0)[:, np.newaxis]
+        chans = self.samples[:, :2]
+        block = chans[i0]*(1.-frac) + chans[i1]*frac
+        out[:frames] += block*self.gain
+        self.pos = self._wrap(self.pos + step*len(out))
+        self.done = self.pos >= self.end
+
+    def mix_py(self, out, step):
+        n_chan = self.channels
+        samples = self.samples
+        gain = self.gain
+        pos = self.pos
+        for i in range(len(out)//2):
+            pos = self._wrap(pos)
+            if pos >= self.end:
+                break
+            i0 = int(pos)
+            # the last frame of a loop is interpolated with its first one
+            i1 = i0+1
+            if i1 >= self.end:
+                i1 = self.loop_start if self.loop_start is not None else self.end-1
+            frac = pos-i0
+            left = samples[i0*n_chan]*(1.-frac) + samples[i1*n_chan]*frac
+            if n_chan > 1:
+                right = samples[i0*n_chan+1]*(1.-frac) + samples[i1*n_chan+1]*frac
+            else:
+                right = left
+            out[2*i] += left*gain
+            out[2*i+1] += right*gain
+            pos += step
+        self.pos = self._wrap(pos)
+        self.done = self.pos >= self.end
+
+class Mixer(Player):
+    """
+    software mixer playing several voices on a single output stream
+
+    All the voices are resampled to the output rate and summed in the
+    stream callback.
+    """
+    # number of voices played simultaneously, the oldest voice is stolen
+    max_voices = 16
+
+    def __init__(self, rate=48000):
+        super().__init__()
+        self.fmt = RIFF.WAVE_fmt_(
+            formatTag=RIFF.WAVE_fmt_.WAVE_FORMAT_PCM,
+            channels=2,
+            samplesPerSec=rate,
+            avgBytesPerSec=rate*4,
+            blockAlign=4,
+            bitPerSample=16)
+        self.voices = []
+        self._lock = threading.Lock()
+
+    def get_stream(self):
+        # a pooled stream of the same format would play either a sound or
+        # the mixer: the mixer has its own one, to layer over the sounds
+        return engine.get_own_stream(self, self.fmt.samplesPerSec, self.fmt.channels)
+
+    def add(self, voice):
+        with self._lock:
+            if len(self.voices) >= self.max_voices:
+                self.voices.pop(0)
+            self.voices.append(voice)
+        return self.play()
+
+    def remove(self, voice):
+        with self._lock:
+            if voice in self.voices:
+                self.voices.remove(voice)
+
+    def stop_all(self):
+        with self._lock:
+            self.voices.clear()
+        return self.pause()
+
+    def read(self, frames):
+        rate = self.fmt.samplesPerSec
+        with self._lock:
+            voices = list(self.voices)
+        if np is not None:
+            out = np.zeros((frames, 2))
+            for voice in voices:
+                voice.mix_np(out, voice.rate/rate)
+            data = np.clip(out, -32768, 32767).astype('<i2').tobytes()
+        else:
+            out = [0.]*(frames*2)
+            for voice in voices:
+                voice.mix_py(out, voice.rate/rate)
+            data = array.array('h', (int(max(-32768, min(32767, x))) for x in out))
+            if sys.byteorder == 'big':
+                data.byteswap()
+            data = data.tobytes()
+        with self._lock:
+            self.voices = [voice for voice in self.voices if not voice.done]
+            done = not self.voices
+        return (data, done)
+
+class SliceSequencer(Player):
+    """
+    plays the step pattern of a sliced sample at a given tempo
+
+    The pattern (esli.sliceSteps, esli.slicingNumSteps, esli.slicingBeat)
+    is converted once into an event table, then blocks are rendered
+    straight from the source buffer: a step cuts the previous one, the
+    slice amplitude is applied as a gain and the attack length as a
+    linear fade in.
+    """
+    # number of steps per beat for each esli.slicingBeat value
+    steps_per_beat = {
+        0 : 4, # 16
+        1 : 8, # 32
+        2 : 3, # 8 Tri
+        3 : 6  # 16 Tri
+    }
+
+    def __init__(self, data, fmt, esli, tempo=120.):
+        super().__init__()
+
+        if fmt.formatTag != RIFF.WAVE_fmt_.WAVE_FORMAT_PCM:
+            raise Exception('format tag')
+        if fmt.bitPerSample != 16:
+            raise Exception('bit per sample')
+
+        self.data = data
+        self.fmt = fmt
+        self.esli = esli
+        self.tempo = tempo
+        n_frames = len(data)//fmt.blockAlign
+        if np is not None:
+            self.samples = np.frombuffer(data, dtype='<i2', count=n_frames*fmt.channels).reshape(-1, fmt.channels)
+        else:
+            self.samples = array.array('h', data[:n_frames*fmt.blockAlign])
+            if sys.byteorder == 'big':
+                self.samples.byteswap()
+        self._time = 0
+        self.update()
+
+    def update(self):
+        """(re)build the event table from the esli pattern and the tempo"""
+        esli = self.esli
+        n_frames = len(self.data)//self.fmt.blockAlign
+        step_len = self.fmt.samplesPerSec*60./self.tempo/self.steps_per_beat.get(esli.slicingBeat, 4)
+        num_steps = esli.slicingNumSteps
+        self.length = int(round(num_steps*step_len))
+        base = esli.OSC_StartPoint_address//self.fmt.blockAlign
+        triggers = []
+        for step in range(num_steps):
+            slice_num = esli.sliceSteps[step]
+            if slice_num < 0:
+                continue
+            sli = esli.slices[slice_num]
+            src_start = base+sli.start
+            length = min(sli.length, n_frames-src_start)
+            if src_start < 0 or length <= 0:
+                continue
+            triggers.append((int(round(step*step_len)), src_start, length, max(0, sli.attack_length), sli.amplitude/65536))
+        # events: (time, end time, source start, attack, gain)
+        self.events = []
+        for i, (time, src_start, length, attack, gain) in enumerate(triggers):
+            end = time+length
+            if i+1 < len(triggers):
+                end = min(end, triggers[i+1][0])
+            end = min(end, self.length)
+            self.events.append((time, end, src_start, attack, gain))
+
+    def _render_np(self, t0, frames):
+        out = np.zeros((frames, self.fmt.channels))
+        for time, end, src_start, attack, gain in self.events:
+            a = max(time, t0)
+            b = min(end, t0+frames)
+            if a >= b:
+                continue
+            k = np.arange(a-time, b-time)
+            env = gain*np.minimum(1., (k+1.)/attack) if attack else np.full(b-a, gain)
+            out[a-t0:b-t0] = self.samples[src_start+a-time:src_start+b-time]*env[:, np.newaxis]
+        return np.clip(out, -32768, 32767).astype('<i2').tobytes()
+
+    def _render_py(self, t0, frames):
+        n_chan = self.fmt.channels
+        out = array.array('h', bytes(frames*n_chan*2))
+        for time, end, src_start, attack, gain in self.events:
+            a = max(time, t0)
+            b = min(end, t0+frames)
+            for t in range(a, b):
+                k = t-time
+                g = gain*min(1., (k+1.)/attack) if attack else gain
+                src = (src_start+k)*n_chan
+                dst = (t-t0)*n_chan
+                for c in range(n_chan):
+                    out[dst+c] = int(max(-32768, min(32767, self.samples[src+c]*g)))
+        if sys.byteorder == 'big':
+            out.byteswap()
+        return out.tobytes()
+
+    def render_block(self, t0, frames):
+        """render frames [t0, t0+frames) of one pattern cycle"""
+        if np is not None:
+            return self._render_np(t0, frames)
+        return self._render_py(t0, frames)
+
+    def render(self, cycles=1):
+        """offline render of the pattern, repeated cycles times"""
+        block = self.render_block(0, self.length)
+        return block*cycles
+
+    def read(self, frames):
+        if not self.length:
+            return (b'', True)
+        data = bytearray()
+        while frames:
+            n = min(frames, self.length-self._time)
+            data += self.render_block(self._time, n)
+            self._time = (self._time+n) % self.length
+            frames -= n
+        return (bytes(data), False)
 
 class ApplicationPlayer:
     def __init__(self):
         self.player=None
+        self.mixer=Mixer()
+
+    def play_layer(self, voice):
+        """add a voice to the ones currently sounding instead of replacing them"""
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            self.mixer.add(voice)
 
     def play_start(self, sound):
         with warnings.catch_warnings():
             warnings.simplefilter("ignore")
             if self.player is not None:
                 self.player.pause()
+            # the layered voices are stopped too, they are not resumed by
+            # the next layer
+            self.mixer.stop_all()
             self.player = sound.play()
 
     def play_stop(self):
         if self.player is not None:
             self.player.pause()
             self.player = None
+        self.mixer.stop_all()
         
 def terminate():
-    audio.terminate()
+    engine.terminate()
+    if backend is not None:
+        backend.terminate()
 
 player=ApplicationPlayer()
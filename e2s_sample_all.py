@@ -18,6 +18,9 @@ You should have received a copy of the GNU General Public License
 along with Oe2sSLE.  If not, see <http://www.gnu.org/licenses/>
 """
 
+import os
+import shutil
+import random
 import struct
 import RIFF
 import warnings
@@ -144,6 +147,7 @@ class RIFF_korg_esli(RIFF.ChunkData):
             else:
                 size = struct.calcsize(fmt)
                 self.__dict__['esli'].rawdata[loc:loc+size] = struct.pack(fmt, value)
+                self.__dict__['esli'].changed()
 
     class SliceSteps:
         def __init__(self, esli_master):
@@ -157,6 +161,7 @@ class RIFF_korg_esli(RIFF.ChunkData):
         def __setitem__(self, index, value):
             assert index >= 0 and index < 64
             self.esli.rawdata[self.baseOffset+index:self.baseOffset+index+1] =  struct.pack('b', value)
+            self.esli.changed()
             
     
     def __init__(self, file=None, chunkHeader=None):
@@ -257,6 +262,7 @@ class RIFF_korg_esli(RIFF.ChunkData):
         else:
             size = struct.calcsize(fmt)
             self.__dict__['rawdata'][loc:loc+size] = struct.pack(fmt, value)
+        self.changed()
 
     def read(self, file, chunkHeader):
         if chunkHeader.id != b'esli':
@@ -266,6 +272,7 @@ class RIFF_korg_esli(RIFF.ChunkData):
         if chunkHeader.size > RIFF_korg_esli._dataSize:
             print ('Unusual esli chunck size')
         self.rawdata[:] = file.read(chunkHeader.size)
+        self.changed()
         if len(self.rawdata) != chunkHeader.size:
             raise EOFError('Unexpected End Of File')
 
@@ -341,6 +348,22 @@ class RIFF_korgWAVEChunkList(RIFF.WAVEChunkList):
             rc[key]=val
         super(RIFF_korgWAVEChunkList, self).__init__(rc)
 
+class SampleInfo:
+    """values derived from the chunks of a sample, for display and file names"""
+    def __init__(self, esli, fmt, data):
+        self.key = (esli, esli.version, fmt, fmt.version, data, data.version)
+        self.oscNum = esli.OSC_0index+1
+        self.name = esli.OSC_name.decode('ascii', 'ignore').split('\x00')[0]
+        self.category = esli_OSC_cat_to_str.get(esli.OSC_category, '')
+        self.size = len(data)
+        self.duration = len(data)/fmt.avgBytesPerSec if fmt.avgBytesPerSec else 0
+        self.stereo = fmt.channels > 1
+        self.rate = fmt.samplesPerSec
+
+    def filename(self):
+        """default file name of the exported sample"""
+        return "{:0>3}_{}.wav".format(self.oscNum, self.name)
+
 #TODO: should  be changed as a RIFF.Chunk
 # => 'RIFF' chunk must be handled in RIFF module
 class e2s_sample:
@@ -367,6 +390,14 @@ class e2s_sample:
         if _do_clean:
             sample = self.get_clean_copy()
 
+        sample.add_export_chunks(export_smpl, export_cue)
+        sample.update_header()
+        sample.header.write(file)
+        sample.RIFF.write(file)
+
+    def add_export_chunks(self, export_smpl=False, export_cue=False):
+        """add the smpl (loop) and cue (slices) chunks of an exported wav"""
+        sample = self
         esli = sample.get_esli()
         fmt = sample.get_fmt()
         uid = 0
@@ -417,10 +448,6 @@ class e2s_sample:
                 cue_chunk = RIFF.Chunk(header=RIFF.ChunkHeader(id=b'cue '),data=cue)
                 sample.RIFF.chunkList.chunks.append(cue_chunk)
 
-        sample.update_header()
-        sample.header.write(file)
-        sample.RIFF.write(file)
-
     def get_esli(self):
         try:
             return self._esli
@@ -430,6 +457,19 @@ class e2s_sample:
 
     def get_data(self):
         return self.RIFF.chunkList.get_chunk(b'data').data
+
+    def get_info(self):
+        """
+        SampleInfo of the sample, recomputed only when the esli, fmt or data
+        chunks have been modified or replaced
+        """
+        esli = self.get_esli()
+        fmt = self.get_fmt()
+        data = self.get_data()
+        info = self.__dict__.get('_info')
+        if info is None or info.key != (esli, esli.version, fmt, fmt.version, data, data.version):
+            info = self._info = SampleInfo(esli, fmt, data)
+        return info
     
     def get_fmt(self):
         return self.RIFF.chunkList.get_chunk(b'fmt ').data
@@ -455,6 +495,62 @@ class e2s_sample:
         copy.header.size = len(copy.RIFF)
         return copy
         
+def edit_esli(samples, **fields):
+    """
+    set the same esli fields of several samples at once
+
+    The fields are packed once and copied in each esli chunk. Setting
+    OSC_OneShot also resets the loop start of the samples, as the one shot
+    samples do not loop. Returns the samples that were actually modified.
+    """
+    changed = []
+    packed = None
+    for e2s_sample in samples:
+        esli = e2s_sample.get_esli()
+        if packed is None:
+            packed = []
+            for name, value in fields.items():
+                loc, fmt = esli.fields[name]
+                packed.append((loc, struct.pack(fmt, value)))
+        rawdata = esli.rawdata
+        before = bytes(rawdata)
+        for loc, value in packed:
+            rawdata[loc:loc+len(value)] = value
+        if fields.get('OSC_OneShot'):
+            esli.OSC_LoopStartPoint_offset = esli.OSC_EndPoint_offset
+        if rawdata != before:
+            esli.changed()
+            changed.append(e2s_sample)
+    return changed
+
+def move_samples(samples, first, count, to, keep_index=False):
+    """
+    move samples[first:first+count] so that it starts at position to
+
+    samples is a list of e2s_sample ordered by OSC_0index. Unless
+    keep_index is set, the OSC indexes stay attached to the positions: the
+    moved samples and the samples they pass over are renumbered in a single
+    pass. Returns the (start, stop) range of the positions that changed.
+    """
+    if count <= 0 or first < 0 or first+count > len(samples):
+        raise IndexError("samples to move out of range")
+    if not 0 <= to <= len(samples)-count:
+        raise IndexError("destination out of range")
+    start = min(first, to)
+    stop = max(first, to)+count
+    if to == first:
+        return start, stop
+    indexes = [e2s_sample.get_esli().OSC_0index for e2s_sample in samples[start:stop]]
+    moved = samples[first:first+count]
+    del samples[first:first+count]
+    samples[to:to] = moved
+    if not keep_index:
+        for e2s_sample, index in zip(samples[start:stop], indexes):
+            esli = e2s_sample.get_esli()
+            if esli.OSC_0index != index:
+                esli.OSC_0index = esli.OSC_0index1 = index
+    return start, stop
+
 # TODO: check if e2s supports RIFX files (big endian)
 
 class e2s_sample_all:
@@ -472,9 +568,13 @@ class e2s_sample_all:
     def __init__(self, **kw):
         self.samples = []
         if 'filename' in kw:
-            self.load(kw['filename'])
+            self.load(kw['filename'], kw.get('task'))
     
-    def load(self, filename):
+    def load(self, filename, task=None):
+        """
+        task, if any, is a task_runner.Task: its progress is reported and
+        the loading stops if it is cancelled
+        """
         self._loadErrors = 0
         with open(filename,'rb') as f:
             # header
@@ -482,10 +582,15 @@ class e2s_sample_all:
                 raise ValueError("unhandled file format")
             # RIFF addresses up to 0x1000 in the file
             riffAddrs = struct.unpack("<"+"I"*1020,f.read(4080))
+            if task is not None:
+                task.progress(0, sum(1 for riffAddr in riffAddrs if riffAddr))
             for riffAddr in riffAddrs:
                 # skip null pointers
                 # TODO: check if addr can be Odd (for electribe)
                 if riffAddr:
+                    if task is not None:
+                        task.check()
+                        task.step()
                     try:
                         f.seek(riffAddr)
                         sample = e2s_sample(f)
@@ -495,7 +600,15 @@ class e2s_sample_all:
                         warnings.warn('Recovering from an error while reading a sample')
                         traceback.print_exc()
 
-    def save(self, filename):
+    def save(self, filename, task=None):
+        """
+        The library is written to a temporary file in the same directory,
+        which replaces filename once complete: an existing file is kept if
+        the save fails or is cancelled.
+
+        task, if any, is a task_runner.Task: its progress is reported and
+        the save can be cancelled
+        """
         # first assign correct OSC_importNum (maybe a bug of the electribe?)
         # samples are ordered by esli.OSC_0index
         for sample in self.samples:
@@ -519,15 +632,43 @@ class e2s_sample_all:
             riffAddrs[addr] = (riffNextAddr,sample)
             riffNextAddr+=len(sample)
 
-        with open(filename,'wb') as f:
-            # header
-            f.write(b"e2s sample all\x1A\x00")
-            for riffAddr in riffAddrs:
-                f.write(struct.pack("<I", riffAddr[0]))
-            for riffAddr in riffAddrs:
-                if riffAddr[0]:
-                    diff = riffAddr[0]-f.tell()
-                    if diff:
-                        warnings.warn('empty filling')
-                        f.write(b'\x00'*diff)
-                    riffAddr[1].write(f,_do_clean=False)
+        if task is not None:
+            task.check()
+            task.progress(0, riffNextAddr)
+        # created like any new file (permissions from the umask), but only
+        # if it does not exist
+        while True:
+            tmpname = '{}.{:08x}.tmp'.format(filename, random.getrandbits(32))
+            try:
+                f = open(tmpname, 'xb')
+                break
+            except FileExistsError:
+                pass
+        try:
+            with f:
+                self._write(f, riffAddrs, task)
+            # a replaced file keeps its permissions
+            if os.path.exists(filename):
+                shutil.copymode(filename, tmpname)
+            os.replace(tmpname, filename)
+            if task is not None:
+                task.progress(riffNextAddr)
+        except BaseException:
+            os.remove(tmpname)
+            raise
+
+    def _write(self, f, riffAddrs, task):
+        # header
+        f.write(b"e2s sample all\x1A\x00")
+        for riffAddr in riffAddrs:
+            f.write(struct.pack("<I", riffAddr[0]))
+        for riffAddr in riffAddrs:
+            if riffAddr[0]:
+                if task is not None:
+                    task.check()
+                    task.progress(riffAddr[0])
+                diff = riffAddr[0]-f.tell()
+                if diff:
+                    warnings.warn('empty filling')
+                    f.write(b'\x00'*diff)
+                riffAddr[1].write(f,_do_clean=False)
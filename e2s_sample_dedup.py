@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright (C) 2018 Jonathan Taquet
+
+This file is part of Oe2sSLE (Open e2sSample.all Library Editor).
+
+Oe2sSLE is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Oe2sSLE is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Oe2sSLE.  If not, see <http://www.gnu.org/licenses/>
+"""
+
+import collections
+import concurrent.futures
+import threading
+import weakref
+import zlib
+
+import wav_thumbnail
+
+# zlib releases the GIL on large buffers, the hashes are computed in parallel
+WORKERS = 4
+# near duplicates: maximal relative difference of lengths
+LENGTH_TOLERANCE = 0.02
+# near duplicates: maximal mean difference of the fingerprints values (8 bits)
+FINGERPRINT_TOLERANCE = 1.0
+
+
+class _Entry:
+    def __init__(self, rawdata, version):
+        self.rawdata = rawdata
+        self.version = version
+        self.hash = None
+        self.fingerprint = None
+
+
+class DedupCache:
+    """
+    content hash and peak fingerprint of the data chunks
+
+    They are kept per chunk until its data is modified or replaced (see
+    RIFF.ChunkData.version), so that a new analysis only computes the
+    samples that changed. The fingerprints are the thumbnails summaries, if
+    a wav_thumbnail.ThumbnailCache is given they are taken from its disk
+    cache.
+    """
+    def __init__(self, thumbnails=None):
+        self.thumbnails = thumbnails
+        self._lock = threading.Lock()
+        # data chunk -> _Entry
+        self._entries = weakref.WeakKeyDictionary()
+
+    def _entry(self, data):
+        with self._lock:
+            entry = self._entries.get(data)
+            if entry is None or entry.rawdata is not data.rawdata or entry.version != data.version:
+                entry = self._entries[data] = _Entry(data.rawdata, data.version)
+            return entry
+
+    def hash(self, e2s_sample):
+        """crc32 of the data of a sample"""
+        entry = self._entry(e2s_sample.get_data())
+        if entry.hash is None:
+            entry.hash = zlib.crc32(entry.rawdata)
+        return entry.hash
+
+    def fingerprint(self, e2s_sample):
+        """peak summary of the data of a sample (see wav_thumbnail.summary)"""
+        entry = self._entry(e2s_sample.get_data())
+        if entry.fingerprint is None:
+            num_chans = e2s_sample.get_fmt().channels
+            if self.thumbnails is not None:
+                entry.fingerprint = self.thumbnails.compute(entry.rawdata, num_chans)
+            else:
+                entry.fingerprint = wav_thumbnail.summary(entry.rawdata, num_chans)
+        return entry.fingerprint
+
+
+def _audio_key(e2s_sample):
+    fmt = e2s_sample.get_fmt()
+    return (fmt.channels, fmt.samplesPerSec, len(e2s_sample.get_data()))
+
+
+def _values(fingerprint):
+    # signed bytes, offset to compare them as unsigned
+    return [(x+128)&0xFF for x in fingerprint]
+
+
+def _distance(a, b):
+    """mean difference of two fingerprints _values"""
+    return sum(abs(x-y) for x, y in zip(a, b))/len(a)
+
+
+def find_duplicates(e2s_samples, cache, near=False, task=None, workers=WORKERS):
+    """
+    groups of samples with the same audio, in library order
+
+    Samples are duplicates if they have the same format and data (compared
+    by a crc32 then byte to byte). With near, samples with the same
+    channels and rate, about the same length and close peak fingerprints
+    are also grouped, e.g. the same sound saved twice with different
+    fades. Only groups of at least two samples are returned.
+
+    The hashes and fingerprints are computed with cache, a DedupCache.
+    task, if any, is a task_runner.Task for progress and cancellation.
+    """
+    e2s_samples = list(e2s_samples)
+    if task is not None:
+        task.progress(0, len(e2s_samples)*(2 if near else 1))
+    def compute(fct):
+        with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+            futures = [executor.submit(fct, e2s_sample) for e2s_sample in e2s_samples]
+            try:
+                res = []
+                for future in futures:
+                    if task is not None:
+                        task.check()
+                        task.step()
+                    res.append(future.result())
+                return res
+            finally:
+                for future in futures:
+                    future.cancel()
+    hashes = compute(cache.hash)
+
+    # exact duplicates
+    buckets = collections.defaultdict(list)
+    for e2s_sample, h in zip(e2s_samples, hashes):
+        buckets[_audio_key(e2s_sample)+(h,)].append(e2s_sample)
+    groups = []
+    for bucket in buckets.values():
+        while len(bucket) > 1:
+            first = bucket[0]
+            rawdata = first.get_data().rawdata
+            same = [e2s_sample for e2s_sample in bucket if e2s_sample.get_data().rawdata == rawdata]
+            if len(same) > 1:
+                groups.append(same)
+            bucket = [e2s_sample for e2s_sample in bucket if e2s_sample.get_data().rawdata != rawdata]
+
+    if near:
+        fingerprints = [_values(fingerprint) for fingerprint in compute(cache.fingerprint)]
+        # the distance is at least the difference of the means
+        means = [sum(values)/len(values) for values in fingerprints]
+        # exact groups are clustered as a whole, by their first sample
+        index = {id(e2s_sample): i for i, e2s_sample in enumerate(e2s_samples)}
+        in_group = {id(e2s_sample) for group in groups for e2s_sample in group}
+        units = groups + [[e2s_sample] for e2s_sample in e2s_samples if id(e2s_sample) not in in_group]
+        units.sort(key=lambda unit: _audio_key(unit[0]))
+        keys = [_audio_key(unit[0]) for unit in units]
+        # each cluster is the units close to its first one (no chaining),
+        # only units of close lengths are compared
+        clustered = [False]*len(units)
+        groups = []
+        for k, unit in enumerate(units):
+            if clustered[k]:
+                continue
+            cluster = list(unit)
+            i = index[id(unit[0])]
+            for l in range(k+1, len(units)):
+                if keys[l][:2] != keys[k][:2] or keys[l][2] > keys[k][2]*(1+LENGTH_TOLERANCE):
+                    break
+                if clustered[l]:
+                    continue
+                j = index[id(units[l][0])]
+                if (abs(means[i]-means[j]) <= FINGERPRINT_TOLERANCE
+                    and _distance(fingerprints[i], fingerprints[j]) <= FINGERPRINT_TOLERANCE):
+                    clustered[l] = True
+                    cluster += units[l]
+            if len(cluster) > 1:
+                groups.append(cluster)
+
+    order = {id(e2s_sample): pos for pos, e2s_sample in enumerate(e2s_samples)}
+    for group in groups:
+        group.sort(key=lambda e2s_sample: order[id(e2s_sample)])
+    groups.sort(key=lambda group: order[id(group[0])])
+    return groups
+
+
+def duplicates(groups):
+    """the samples to remove to merge the groups, all but the first of each"""
+    return [e2s_sample for group in groups for e2s_sample in group[1:]]
+
+
+def report(groups):
+    """text description of the groups and of the memory they waste"""
+    lines = []
+    wasted = 0
+    for group in groups:
+        infos = [e2s_sample.get_info() for e2s_sample in group]
+        lines.append(", ".join("{:0>3} {}".format(info.oscNum, info.name) for info in infos))
+        wasted += sum(info.size for info in infos[1:])
+    lines.append("{} group(s), {} duplicate(s), {:.2f} MB".format(
+        len(groups), len(duplicates(groups)), wasted/1e6))
+    return "\n".join(lines)
@@ -0,0 +1,433 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright (C) 2018 Jonathan Taquet
+
+This file is part of Oe2sSLE (Open e2sSample.all Library Editor).
+
+Oe2sSLE is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Oe2sSLE is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Oe2sSLE.  If not, see <http://www.gnu.org/licenses/>
+"""
+
+import concurrent.futures
+import io
+import json
+import os
+import struct
+import sys
+import tarfile
+import time
+import zipfile
+
+import RIFF
+import e2s_sample_all as e2s
+from e2s_sample_trim import trim
+
+# size of the writes, the data chunks are written by slices of this size
+BUFFER_SIZE = 1024*1024
+# the export is I/O bound, more threads than cores are useful
+WORKERS = 4
+# file name extensions of the archives handled by export_archive
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz')
+# name of the metadata file in the archives
+MANIFEST_NAME = 'manifest.json'
+# ZipFile.open(..., 'w') appeared in python 3.6, before the zip entries are
+# written from a copy of each file
+ZIP_STREAMING = sys.version_info >= (3, 6)
+
+
+def wav_parts(e2s_sample, export_smpl=False, export_cue=False):
+    """
+    the wav file of a sample, as written by e2s_sample.write, as a list of
+    bytes-like parts
+
+    The data chunk is a memoryview on the data of the sample: it is not
+    copied.
+    """
+    sample = e2s_sample.get_clean_copy()
+    sample.add_export_chunks(export_smpl, export_cue)
+    sample.update_header()
+    parts = []
+    head = io.BytesIO()
+    sample.header.write(head)
+    head.write(struct.pack('4s', sample.RIFF.type))
+    for chunk in sample.RIFF.chunkList.chunks:
+        if chunk.header.id == b'data':
+            chunk.update_header()
+            chunk.header.write(head)
+            parts.append(head.getvalue())
+            parts.append(memoryview(chunk.data.rawdata))
+            head = io.BytesIO()
+            if len(chunk.data)&1:
+                head.write(b'\x00')
+        else:
+            chunk.write(head)
+    parts.append(head.getvalue())
+    return parts
+
+
+def render_copy(e2s_sample):
+    """
+    copy of a sample reduced to its played region, from its start point to
+    its end point
+
+    The data of the copy is a memoryview on the data of the sample: it is
+    not copied. The loop and slices of the copy are kept relative to its
+    start point, so it plays as the sample.
+    """
+    fmt = e2s_sample.get_fmt()
+    esli = e2s_sample.get_esli()
+    sample = e2s.e2s_sample()
+    sample.header = RIFF.ChunkHeader(id=b'RIFF')
+    sample.RIFF.chunkList.chunks.append(e2s_sample.get_clean_copy().get_chunk(b'fmt '))
+    data = RIFF.WAVE_data(rawdata=memoryview(e2s_sample.get_data().rawdata))
+    sample.RIFF.chunkList.chunks.append(RIFF.Chunk(header=RIFF.ChunkHeader(id=b'data'), data=data))
+    korg = e2s.RIFF_korg()
+    korg_esli = e2s.RIFF_korg_esli()
+    korg_esli.rawdata[:] = esli.rawdata
+    korg.chunkList.chunks.append(RIFF.Chunk(header=RIFF.ChunkHeader(id=b'esli'), data=korg_esli))
+    sample.RIFF.chunkList.chunks.append(RIFF.Chunk(header=RIFF.ChunkHeader(id=b'korg'), data=korg))
+    start = esli.OSC_StartPoint_address // fmt.blockAlign
+    trim(sample, start, start + esli.OSC_EndPoint_offset // fmt.blockAlign)
+    return sample
+
+
+def active_slices(e2s_sample):
+    """numbers of the slices of a sample with some data"""
+    num_samples = len(e2s_sample.get_data()) // e2s_sample.get_fmt().blockAlign
+    start = e2s_sample.get_esli().OSC_StartPoint_address // e2s_sample.get_fmt().blockAlign
+    return [num for num, slice in enumerate(e2s_sample.get_esli().slices)
+            if slice.length and 0 <= start+slice.start < num_samples]
+
+
+def slice_parts(e2s_sample, num):
+    """parts of a plain wav file (fmt and data only) of a slice of a sample"""
+    fmt = e2s_sample.get_clean_copy().get_chunk(b'fmt ')
+    esli = e2s_sample.get_esli()
+    slice = esli.slices[num]
+    block = fmt.data.blockAlign
+    start = esli.OSC_StartPoint_address + slice.start*block
+    rawdata = memoryview(e2s_sample.get_data().rawdata)[start:start+slice.length*block]
+    data = RIFF.Chunk(header=RIFF.ChunkHeader(id=b'data', size=len(rawdata)), data=RIFF.WAVE_data(rawdata=rawdata))
+    head = io.BytesIO()
+    RIFF.ChunkHeader(id=b'RIFF', size=RIFF.Form.type_len+len(fmt)+len(data)).write(head)
+    head.write(struct.pack('4s', b'WAVE'))
+    fmt.write(head)
+    data.header.write(head)
+    return [head.getvalue(), rawdata, b'\x00' if len(rawdata)&1 else b'']
+
+
+def slice_filename(filename, num):
+    base, ext = os.path.splitext(filename)
+    return "{}_s{:0>2}{}".format(base, num+1, ext)
+
+
+def _exported(e2s_sample, render, slices):
+    """the sample written for e2s_sample and the numbers of its exported slices"""
+    if not render:
+        return e2s_sample, []
+    sample = render_copy(e2s_sample)
+    return sample, active_slices(sample) if slices else []
+
+
+def sample_files(e2s_sample, filename, export_smpl=False, export_cue=False, render=False, slices=False):
+    """
+    [(file name, wav parts)] of the files exported for a sample
+
+    If render is set, the wav file only has the played region of the sample
+    (see render_copy), and if slices is also set each active slice of this
+    region is also exported to its own file, named by slice_filename.
+    """
+    sample, nums = _exported(e2s_sample, render, slices)
+    return _files(sample, nums, filename, export_smpl, export_cue)
+
+
+def _files(sample, nums, filename, export_smpl, export_cue):
+    """sample_files of the written sample and slice numbers of _exported"""
+    files = [(filename, wav_parts(sample, export_smpl, export_cue))]
+    for num in nums:
+        files.append((slice_filename(filename, num), slice_parts(sample, num)))
+    return files
+
+
+def sample_filenames(e2s_sample, filename, render=False, slices=False):
+    """names of the files of sample_files, without building them"""
+    sample, nums = _exported(e2s_sample, render, slices)
+    return [filename] + [slice_filename(filename, num) for num in nums]
+
+
+def safe_filename(filename):
+    return filename.replace('/','-').replace('\\','-')
+
+
+class ExportPlan:
+    """
+    file paths of the samples to export to a directory, resolved up front
+
+    jobs are the (e2s_sample, path) to write, conflicts the paths of jobs
+    that would replace an existing file (or a file of a previous job). All
+    the files of the samples are checked, with the render and slices
+    options of sample_files.
+    """
+    def __init__(self, e2s_samples, directory, render=False, slices=False):
+        self.jobs = []
+        self.conflicts = []
+        # path of a conflict -> path of its job
+        self._conflict_jobs = {}
+        paths = set()
+        for e2s_sample in e2s_samples:
+            path = os.path.join(directory, safe_filename(e2s_sample.get_info().filename()))
+            for file in sample_filenames(e2s_sample, path, render, slices):
+                if file in paths or os.path.exists(file):
+                    self.conflicts.append(file)
+                    self._conflict_jobs[file] = path
+                paths.add(file)
+            self.jobs.append((e2s_sample, path))
+
+    def skip_conflicts(self):
+        """remove the jobs with a conflict"""
+        conflicts = set(self._conflict_jobs.values())
+        self.jobs = [(e2s_sample, path) for e2s_sample, path in self.jobs if path not in conflicts]
+        self.conflicts = []
+        self._conflict_jobs = {}
+
+
+class ExportReport:
+    def __init__(self):
+        self.files = 0
+        self.bytes = 0
+        self.seconds = 0
+        # (path, exception)
+        self.errors = []
+
+    def rate(self):
+        """written MB/s"""
+        return self.bytes/self.seconds/1e6 if self.seconds else 0
+
+    def __str__(self):
+        return "{} files, {:.1f} MB in {:.2f} s ({:.1f} MB/s)".format(
+            self.files, self.bytes/1e6, self.seconds, self.rate())
+
+
+def write_wav(path, parts, task=None):
+    """write the parts of a wav file, returns the number of bytes written"""
+    size = 0
+    try:
+        with open(path, 'wb', buffering=0) as f:
+            for part in parts:
+                for pos in range(0, len(part), BUFFER_SIZE):
+                    if task is not None:
+                        task.check()
+                    size += f.write(part[pos:pos+BUFFER_SIZE])
+    except BaseException:
+        # no partially written file
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        raise
+    return size
+
+
+def export(jobs, export_smpl=False, export_cue=False, render=False, slices=False, task=None, workers=WORKERS):
+    """
+    write the (e2s_sample, path) jobs in parallel
+
+    The files of each sample are given by sample_files.
+    The wav parts are built in the calling thread, only the writes are done
+    by the workers. task, if any, is a task_runner.Task: the progress is
+    reported in bytes and a cancellation stops the export, the files written
+    so far are kept. The files that cannot be written are reported in the
+    ExportReport, they do not stop the export.
+    """
+    report = ExportReport()
+    start = time.perf_counter()
+    files = [file for e2s_sample, path in jobs
+             for file in sample_files(e2s_sample, path, export_smpl, export_cue, render, slices)]
+    if task is not None:
+        task.progress(0, sum(len(part) for path, parts in files for part in parts))
+    with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+        futures = {executor.submit(write_wav, path, parts, task): path for path, parts in files}
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    size = future.result()
+                except Exception as e:
+                    if task is not None and task.cancelled():
+                        continue
+                    report.errors.append((futures[future], e))
+                    continue
+                report.files += 1
+                report.bytes += size
+                if task is not None:
+                    task.step(size)
+        finally:
+            for future in futures:
+                future.cancel()
+            report.seconds = time.perf_counter()-start
+            print('[export] ' + str(report))
+    if task is not None:
+        task.check()
+    return report
+
+
+def manifest_entry(e2s_sample, filename):
+    """esli metadata of an exported sample, as json values"""
+    esli = e2s_sample.get_esli()
+    fmt = e2s_sample.get_fmt()
+    return {
+        'file': filename,
+        'oscNum': esli.OSC_0index+1,
+        'name': esli.OSC_name.decode('ascii', 'ignore').split('\x00')[0],
+        'category': e2s.esli_OSC_cat_to_str.get(esli.OSC_category, ''),
+        'oneShot': bool(esli.OSC_OneShot),
+        'plus12dB': bool(esli.playLevel12dB),
+        'tune': esli.sampleTune,
+        'samplingFreq': esli.samplingFreq,
+        'channels': fmt.channels,
+        'start': esli.OSC_StartPoint_address,
+        'loopStart': esli.OSC_LoopStartPoint_offset,
+        'end': esli.OSC_EndPoint_offset,
+        'dataSize': len(e2s_sample.get_data()),
+        # (start, length, attack length, amplitude) of the used slices
+        'slices': [
+            (slice.start, slice.length, slice.attack_length, slice.amplitude)
+            for slice in esli.slices if slice.length
+            ],
+        }
+
+
+class _PartsReader:
+    """read-only file over wav parts, reporting the bytes read to a task"""
+    def __init__(self, parts, task=None):
+        self.parts = list(parts)
+        self.task = task
+        self.part = 0
+        self.pos = 0
+
+    def read(self, size=-1):
+        if self.task is not None:
+            self.task.check()
+        res = []
+        while self.part < len(self.parts) and size:
+            part = self.parts[self.part]
+            n = len(part)-self.pos if size < 0 else min(size, len(part)-self.pos)
+            res.append(part[self.pos:self.pos+n])
+            self.pos += n
+            if size > 0:
+                size -= n
+            if self.pos == len(part):
+                self.part += 1
+                self.pos = 0
+        data = b''.join(res)
+        if self.task is not None:
+            self.task.step(len(data))
+        return data
+
+
+def export_archive(e2s_samples, filename, deflate=False, export_smpl=False, export_cue=False, render=False, slices=False, manifest=True, task=None):
+    """
+    write the samples as wav files in a zip or tar archive
+
+    The type of archive is given by the extension of filename (see
+    ARCHIVE_EXTENSIONS): zip archives are deflated if deflate is set, .tar
+    archives are never compressed and .tar.gz or .tgz ones always are. The
+    wav files of each sample (see sample_files) are streamed into the
+    archive from their parts, without temporary files and without copying
+    the sample data (before python 3.6 a zip entry is written from a copy of
+    its file, see ZIP_STREAMING). The progress is reported in bytes of the
+    written files. The esli metadata
+    of the samples is added as MANIFEST_NAME if manifest is set.
+
+    task, if any, is a task_runner.Task, a cancelled export removes the
+    archive. Returns an ExportReport.
+    """
+    lower = filename.lower()
+    if not lower.endswith(ARCHIVE_EXTENSIONS):
+        raise ValueError("unhandled archive type: {}".format(filename))
+    report = ExportReport()
+    start = time.perf_counter()
+    # (written sample, name, files) of each sample, the parts only
+    # reference the data of the samples
+    exported = []
+    names = set()
+    for e2s_sample in e2s_samples:
+        name = safe_filename(e2s_sample.get_info().filename())
+        base, ext = os.path.splitext(name)
+        num = 1
+        while name in names:
+            name = "{}_{}{}".format(base, num, ext)
+            num += 1
+        names.add(name)
+        sample, nums = _exported(e2s_sample, render, slices)
+        files = _files(sample, nums, name, export_smpl, export_cue)
+        names.update(file for file, parts in files)
+        exported.append((sample, name, files))
+    if task is not None:
+        task.progress(0, sum(len(part) for sample, name, files in exported
+                             for file, parts in files for part in parts))
+    entries = []
+    mtime = time.time()
+    try:
+        if lower.endswith('.zip'):
+            archive = zipfile.ZipFile(filename, 'w', zipfile.ZIP_DEFLATED if deflate else zipfile.ZIP_STORED)
+        else:
+            archive = tarfile.open(filename, 'w:gz' if lower.endswith(('.tar.gz', '.tgz')) else 'w')
+        with archive:
+            for sample, name, files in exported:
+                for file, parts in files:
+                    size = sum(len(part) for part in parts)
+                    if isinstance(archive, zipfile.ZipFile):
+                        info = zipfile.ZipInfo(file, time.localtime(mtime)[:6])
+                        info.compress_type = archive.compression
+                        reader = _PartsReader(parts, task)
+                        if ZIP_STREAMING:
+                            info.file_size = size
+                            with archive.open(info, 'w') as f:
+                                while True:
+                                    data = reader.read(BUFFER_SIZE)
+                                    if not data:
+                                        break
+                                    f.write(data)
+                        else:
+                            archive.writestr(info, reader.read())
+                    else:
+                        info = tarfile.TarInfo(file)
+                        info.size = size
+                        info.mtime = mtime
+                        archive.addfile(info, _PartsReader(parts, task))
+                    report.files += 1
+                    report.bytes += size
+                if manifest:
+                    entry = manifest_entry(sample, name)
+                    entry['sliceFiles'] = [file for file, parts in files[1:]]
+                    entries.append(entry)
+            if manifest:
+                data = json.dumps({'samples': entries}, indent=1).encode('utf-8')
+                if isinstance(archive, zipfile.ZipFile):
+                    archive.writestr(zipfile.ZipInfo(MANIFEST_NAME, time.localtime(mtime)[:6]), data, archive.compression)
+                else:
+                    info = tarfile.TarInfo(MANIFEST_NAME)
+                    info.size = len(data)
+                    info.mtime = mtime
+                    archive.addfile(info, io.BytesIO(data))
+    except BaseException:
+        # no partially written archive
+        try:
+            os.remove(filename)
+        except OSError:
+            pass
+        raise
+    finally:
+        report.seconds = time.perf_counter()-start
+        print('[export] ' + filename + ': ' + str(report))
+    return report
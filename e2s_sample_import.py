@@ -217,6 +217,7 @@ def _convert_to_mono(e2s_sample, mix):
         converted = True
         _esli = e2s.RIFF_korg_esli()
         _esli.rawdata[:] = e2s_sample.get_esli().rawdata[:]
+        _esli.changed()
         prev_fmt = e2s_sample.get_fmt()
         _fmt = copy.deepcopy(prev_fmt)
         _fmt.channels=1
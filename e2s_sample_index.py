@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright (C) 2018 Jonathan Taquet
+
+This file is part of Oe2sSLE (Open e2sSample.all Library Editor).
+
+Oe2sSLE is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Oe2sSLE is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Oe2sSLE.  If not, see <http://www.gnu.org/licenses/>
+"""
+
+import bisect
+import collections
+import re
+
+
+def trigrams(name):
+    return {name[i:i+3] for i in range(len(name)-2)}
+
+
+_query_re = re.compile(r'^(is:(?P<is>stereo|mono)|rate:(?P<rate>\d+)|time(?P<op>[<>])(?P<time>[0-9.]+))$')
+
+def parse_query(text):
+    """
+    search() keyword arguments of a filter text
+
+    Words are searched in the sample names, except:
+    is:stereo, is:mono, rate:<Hz>, time<<seconds>, time><seconds>
+    """
+    query = {'text': []}
+    for word in text.split():
+        m = _query_re.match(word.lower())
+        if m is None:
+            query['text'].append(word)
+        elif m.group('is'):
+            query['stereo'] = m.group('is') == 'stereo'
+        elif m.group('rate'):
+            query['rate'] = int(m.group('rate'))
+        else:
+            try:
+                value = float(m.group('time'))
+            except ValueError:
+                query['text'].append(word)
+                continue
+            if m.group('op') == '<':
+                query['max_duration'] = value
+            else:
+                query['min_duration'] = value
+    query['text'] = ' '.join(query['text'])
+    return query
+
+
+class SampleIndex:
+    """
+    search and sort index over the samples of a library
+
+    Samples are indexed by identity on their name (trigrams), category,
+    stereo flag, sampling rate and duration. sync() is cheap: it only
+    reindexes the samples whose SampleInfo changed (see e2s_sample.get_info)
+    or that were added or removed since its previous call, so it can be
+    called before each search.
+
+    The sorted orders are cached until the next change of the index.
+    """
+    # sort key -> index in the entries values, 'num' is the library order
+    SORT_KEYS = {'num': None, 'name': 0, 'category': 1, 'rate': 3, 'duration': 4, 'size': 5}
+
+    def __init__(self):
+        # id(e2s_sample) -> [e2s_sample, info key, (name, category, stereo, rate, duration, size)]
+        self.entries = {}
+        # id(e2s_sample) -> position in the library
+        self.positions = {}
+        self.trigrams = collections.defaultdict(set)
+        self.categories = collections.defaultdict(set)
+        self.rates = collections.defaultdict(set)
+        self.stereo = set()
+        # sorted (duration, id)
+        self.durations = []
+        # incremented each time the indexed values or the positions change
+        self.generation = 0
+        # (key, reverse) -> (generation, sorted positions)
+        self.permutations = {}
+
+    def sync(self, e2s_samples):
+        positions = {id(e2s_sample): pos for pos, e2s_sample in enumerate(e2s_samples)}
+        if positions != self.positions:
+            self.positions = positions
+            self.generation += 1
+        for key in [key for key in self.entries if key not in positions]:
+            self._unindex(key)
+            del self.entries[key]
+            self.generation += 1
+        for e2s_sample in e2s_samples:
+            key = id(e2s_sample)
+            info = e2s_sample.get_info()
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] == info.key:
+                continue
+            values = (info.name.lower(), info.category.lower(), info.stereo, info.rate, info.duration, info.size)
+            if entry is None:
+                entry = self.entries[key] = [e2s_sample, info.key, None]
+            else:
+                entry[1] = info.key
+                if entry[2] == values:
+                    continue
+                self._unindex(key)
+            entry[2] = values
+            self._index(key)
+            self.generation += 1
+
+    def _index(self, key):
+        name, category, stereo, rate, duration, size = self.entries[key][2]
+        for trigram in trigrams(name):
+            self.trigrams[trigram].add(key)
+        self.categories[category].add(key)
+        self.rates[rate].add(key)
+        if stereo:
+            self.stereo.add(key)
+        bisect.insort(self.durations, (duration, key))
+
+    def _unindex(self, key):
+        name, category, stereo, rate, duration, size = self.entries[key][2]
+        for trigram in trigrams(name):
+            self.trigrams[trigram].discard(key)
+            if not self.trigrams[trigram]:
+                del self.trigrams[trigram]
+        self.categories[category].discard(key)
+        self.rates[rate].discard(key)
+        self.stereo.discard(key)
+        i = bisect.bisect_left(self.durations, (duration, key))
+        del self.durations[i]
+
+    def search(self, text='', category=None, stereo=None, rate=None, min_duration=None, max_duration=None):
+        """sorted positions of the samples matching all the criteria"""
+        words = text.lower().split()
+        sets = []
+        for word in words:
+            for trigram in trigrams(word):
+                sets.append(self.trigrams.get(trigram, set()))
+        if category is not None:
+            sets.append(self.categories.get(category.lower(), set()))
+        if rate is not None:
+            sets.append(self.rates.get(rate, set()))
+        if stereo is not None:
+            sets.append(self.stereo if stereo else set(self.entries).difference(self.stereo))
+        if min_duration is not None or max_duration is not None:
+            lo = 0 if min_duration is None else bisect.bisect_left(self.durations, (min_duration,))
+            hi = len(self.durations) if max_duration is None else bisect.bisect_right(self.durations, (max_duration, float('inf')))
+            sets.append({key for duration, key in self.durations[lo:hi]})
+        if sets:
+            sets.sort(key=len)
+            keys = sets[0].intersection(*sets[1:])
+        else:
+            keys = self.entries.keys()
+        # trigrams only select candidates, words shorter than 3 have none
+        entries = self.entries
+        keys = [key for key in keys if all(word in entries[key][2][0] for word in words)]
+        return sorted(self.positions[key] for key in keys)
+
+    def permutation(self, key, reverse=False):
+        """
+        all the positions sorted by a SORT_KEYS key
+
+        The sort is stable: samples with equal keys stay in library order.
+        """
+        cached = self.permutations.get((key, reverse))
+        if cached is not None and cached[0] == self.generation:
+            return cached[1]
+        field = self.SORT_KEYS[key]
+        n = len(self.positions)
+        if field is None:
+            perm = list(range(n-1, -1, -1) if reverse else range(n))
+        else:
+            keys = [None]*n
+            for k, pos in self.positions.items():
+                keys[pos] = self.entries[k][2][field]
+            perm = sorted(range(n), key=keys.__getitem__, reverse=reverse)
+        self.permutations[(key, reverse)] = (self.generation, perm)
+        return perm
+
+    def sort(self, positions, key, reverse=False):
+        """positions (e.g. returned by search) sorted by a SORT_KEYS key"""
+        perm = self.permutation(key, reverse)
+        if len(positions) == len(perm):
+            return list(perm)
+        wanted = set(positions)
+        return [pos for pos in perm if pos in wanted]
@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright (C) 2018 Jonathan Taquet
+
+This file is part of Oe2sSLE (Open e2sSample.all Library Editor).
+
+Oe2sSLE is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Oe2sSLE is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Oe2sSLE.  If not, see <http://www.gnu.org/licenses/>
+"""
+
+import collections
+import contextlib
+import sys
+
+# default memory cap of a journal
+DEFAULT_MAX_BYTES = 64*1024*1024
+
+
+def diff(old, new):
+    """[(offset, old bytes, new bytes)] runs where old and new differ"""
+    runs = []
+    n = min(len(old), len(new))
+    run = None
+    # compare 16 bytes blocks first, esli changes are usually a few fields
+    for block in range(0, n, 16):
+        if old[block:block+16] == new[block:block+16]:
+            run = None
+            continue
+        for i in range(block, min(block+16, n)):
+            if old[i] != new[i]:
+                if run is None or run[1] != i:
+                    run = [i, i+1]
+                    runs.append(run)
+                else:
+                    run[1] = i+1
+            else:
+                run = None
+    res = [(start, bytes(old[start:stop]), bytes(new[start:stop])) for start, stop in runs]
+    if len(old) != len(new):
+        res.append((n, bytes(old[n:]), bytes(new[n:])))
+    return res
+
+
+def patch(rawdata, runs, undo):
+    # runs are applied backwards so that a size change is at the end
+    for offset, old, new in reversed(runs):
+        if undo:
+            rawdata[offset:offset+len(new)] = old
+        else:
+            rawdata[offset:offset+len(old)] = new
+
+
+def _state(chunk):
+    state = dict(chunk.__dict__)
+    state.pop('version', None)
+    return state
+
+
+def _restore(chunk, state):
+    version = chunk.version
+    chunk.__dict__.clear()
+    chunk.__dict__.update(state)
+    chunk.__dict__['version'] = version+1
+
+
+class _SampleChange:
+    """
+    change of the chunks of a sample
+
+    The esli chunk is recorded as byte runs, the fmt chunk by its (small)
+    attributes and the data chunk by reference to its rawdata: the data is
+    never modified in place, it is replaced, so the buffers are shared with
+    the library and between the steps.
+    """
+    def __init__(self, e2s_sample):
+        self.e2s_sample = e2s_sample
+        self.esli = e2s_sample.get_esli()
+        self.fmt = e2s_sample.get_fmt()
+        self.data = e2s_sample.get_data()
+        self.esli_before = bytes(self.esli.rawdata)
+        self.fmt_before = _state(self.fmt)
+        self.data_before = self.data.rawdata
+
+    def finish(self):
+        """compute the change, False if nothing changed"""
+        self.runs = diff(self.esli_before, self.esli.rawdata)
+        del self.esli_before
+        fmt_after = _state(self.fmt)
+        self.fmt_states = (self.fmt_before, fmt_after) if fmt_after != self.fmt_before else None
+        del self.fmt_before
+        data_after = self.data.rawdata
+        self.data_states = (self.data_before, data_after) if data_after is not self.data_before else None
+        del self.data_before
+        return bool(self.runs or self.fmt_states or self.data_states)
+
+    def merge(self, older):
+        """merge with the change of the same sample in the previous step"""
+        rawdata = bytearray(self.esli.rawdata)
+        patch(rawdata, self.runs, undo=True)
+        patch(rawdata, older.runs, undo=True)
+        self.runs = diff(rawdata, self.esli.rawdata)
+        if older.fmt_states:
+            self.fmt_states = (older.fmt_states[0], _state(self.fmt))
+        if older.data_states:
+            self.data_states = (older.data_states[0], self.data.rawdata)
+        if self.fmt_states and self.fmt_states[0] == self.fmt_states[1]:
+            self.fmt_states = None
+        if self.data_states and self.data_states[0] is self.data_states[1]:
+            self.data_states = None
+
+    def empty(self):
+        return not (self.runs or self.fmt_states or self.data_states)
+
+    def size(self):
+        size = sum(len(old)+len(new) for offset, old, new in self.runs)
+        if self.data_states:
+            # the data replaced is no longer referenced by the library
+            size += len(self.data_states[0])
+        return size
+
+    def apply(self, undo):
+        i = 0 if undo else 1
+        patch(self.esli.rawdata, self.runs, undo)
+        self.esli.changed()
+        if self.fmt_states:
+            _restore(self.fmt, self.fmt_states[i])
+        if self.data_states:
+            self.data.rawdata = self.data_states[i]
+
+
+class _ListChange:
+    """change of the samples of a library, as the replaced slice"""
+    def __init__(self, e2s_samples):
+        self.e2s_samples = e2s_samples
+        self.before = list(e2s_samples)
+
+    def finish(self):
+        before = self.before
+        after = self.e2s_samples
+        del self.before
+        n = min(len(before), len(after))
+        lo = 0
+        while lo < n and before[lo] is after[lo]:
+            lo += 1
+        hi = 0
+        while hi < n-lo and before[-1-hi] is after[-1-hi]:
+            hi += 1
+        self.start = lo
+        self.old = before[lo:len(before)-hi]
+        self.new = after[lo:len(after)-hi]
+        return bool(self.old or self.new)
+
+    def size(self):
+        removed = {id(e2s_sample) for e2s_sample in self.old}.difference(id(e2s_sample) for e2s_sample in self.new)
+        size = sys.getsizeof(self.old) + sys.getsizeof(self.new)
+        for e2s_sample in self.old:
+            if id(e2s_sample) in removed:
+                size += len(e2s_sample.get_data())
+        return size
+
+    def apply(self, undo):
+        old, new = (self.new, self.old) if undo else (self.old, self.new)
+        self.e2s_samples[self.start:self.start+len(old)] = new
+
+
+class Step:
+    def __init__(self, label, merge=None):
+        self.label = label
+        self.merge = merge
+        self.changes = []
+        # id(e2s_sample) -> _SampleChange
+        self.samples = {}
+        self.list = None
+        self.size = 0
+
+
+class Journal:
+    """
+    undo/redo journal of the edits of a library
+
+    An edit is recorded as a step: begin() it, track() each sample and
+    track_list() the sample list before modifying them, then commit() the
+    step. Steps can be nested, only the outermost one is recorded. Only the
+    changes are kept (see _SampleChange), so that undoing a metadata edit is
+    proportional to the modified bytes. When the journal holds more than
+    max_bytes, or max_steps steps, the oldest steps are forgotten.
+
+    Consecutive steps with the same merge key (e.g. typing a name) are
+    merged into one, unless they modify the sample list.
+    """
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, max_steps=256):
+        self.max_bytes = max_bytes
+        self.max_steps = max_steps
+        self.undo_steps = collections.deque()
+        self.redo_steps = []
+        self.size = 0
+        self.depth = 0
+        self.step = None
+        self.can_merge = False
+        # called after each change of the journal
+        self.on_change = None
+
+    def begin(self, label, merge=None):
+        if not self.depth:
+            self.step = Step(label, merge)
+        self.depth += 1
+
+    def track(self, *samples):
+        """record the state of samples, before they are modified"""
+        if self.step is None:
+            return
+        for e2s_sample in samples:
+            if id(e2s_sample) not in self.step.samples:
+                change = _SampleChange(e2s_sample)
+                self.step.samples[id(e2s_sample)] = change
+                self.step.changes.append(change)
+
+    def track_list(self, e2s_samples):
+        """record the sample list, before samples are added, removed or moved"""
+        if self.step is not None and self.step.list is None:
+            self.step.list = _ListChange(e2s_samples)
+            self.step.changes.append(self.step.list)
+
+    def commit(self):
+        self.depth -= 1
+        if self.depth:
+            return
+        step = self.step
+        self.step = None
+        step.changes = [change for change in step.changes if change.finish()]
+        if step.list not in step.changes:
+            step.list = None
+        if not step.changes:
+            return
+        for dropped in self.redo_steps:
+            self.size -= dropped.size
+        self.redo_steps.clear()
+        top = self.undo_steps[-1] if self.undo_steps else None
+        if (self.can_merge and step.merge is not None and top is not None and top.merge == step.merge
+            and step.list is None and top.list is None):
+            self.undo_steps.pop()
+            self.size -= top.size
+            newer = {id(change.e2s_sample): change for change in step.changes}
+            changes = []
+            for change in top.changes:
+                if id(change.e2s_sample) in newer:
+                    newer[id(change.e2s_sample)].merge(change)
+                else:
+                    changes.append(change)
+            step.changes = [change for change in changes+step.changes if not change.empty()]
+            if not step.changes:
+                self.can_merge = False
+                self._changed()
+                return
+        step.size = sum(change.size() for change in step.changes)
+        self.undo_steps.append(step)
+        self.size += step.size
+        self.can_merge = True
+        self._evict()
+        self._changed()
+
+    @contextlib.contextmanager
+    def record(self, label, samples=(), e2s_samples=None, merge=None):
+        """context of a step, tracking samples and the e2s_samples list"""
+        self.begin(label, merge)
+        try:
+            if e2s_samples is not None:
+                self.track_list(e2s_samples)
+            self.track(*samples)
+            yield self
+        finally:
+            self.commit()
+
+    def _evict(self):
+        while len(self.undo_steps) > 1 and (self.size > self.max_bytes or len(self.undo_steps) > self.max_steps):
+            self.size -= self.undo_steps.popleft().size
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change()
+
+    def can_undo(self):
+        return bool(self.undo_steps) and self.step is None
+
+    def can_redo(self):
+        return bool(self.redo_steps) and self.step is None
+
+    def undo_label(self):
+        return self.undo_steps[-1].label if self.undo_steps else None
+
+    def redo_label(self):
+        return self.redo_steps[-1].label if self.redo_steps else None
+
+    def undo(self):
+        """undo the last step, returns its label or None"""
+        if not self.can_undo():
+            return None
+        step = self.undo_steps.pop()
+        for change in reversed(step.changes):
+            change.apply(undo=True)
+        self.redo_steps.append(step)
+        self.can_merge = False
+        self._changed()
+        return step.label
+
+    def redo(self):
+        """redo the last undone step, returns its label or None"""
+        if not self.can_redo():
+            return None
+        step = self.redo_steps.pop()
+        for change in step.changes:
+            change.apply(undo=False)
+        self.undo_steps.append(step)
+        self.can_merge = False
+        self._evict()
+        self._changed()
+        return step.label
+
+    def clear(self):
+        self.undo_steps.clear()
+        self.redo_steps.clear()
+        self.size = 0
+        self.can_merge = False
+        self._changed()
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright (C) 2018 Jonathan Taquet
+
+This file is part of Oe2sSLE (Open e2sSample.all Library Editor).
+
+Oe2sSLE is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Oe2sSLE is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Oe2sSLE.  If not, see <http://www.gnu.org/licenses/>
+"""
+
+
+class Selection:
+    """
+    set of selected samples
+
+    Samples are kept by identity, as their positions change when samples
+    are moved, added or removed; samples() gives them back in the order of
+    a library. anchor is the origin of the range selections, the last
+    sample selected on its own.
+    """
+    def __init__(self):
+        # id(e2s_sample) -> e2s_sample
+        self.items = {}
+        self.anchor = None
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, e2s_sample):
+        return id(e2s_sample) in self.items
+
+    def clear(self):
+        self.items.clear()
+        self.anchor = None
+
+    def set(self, samples):
+        self.items = {id(e2s_sample): e2s_sample for e2s_sample in samples}
+        self.anchor = samples[0] if len(samples) == 1 else None
+
+    def add(self, samples):
+        self.items.update((id(e2s_sample), e2s_sample) for e2s_sample in samples)
+
+    def discard(self, samples):
+        for e2s_sample in samples:
+            self.items.pop(id(e2s_sample), None)
+        if self.anchor is not None and id(self.anchor) not in self.items:
+            self.anchor = None
+
+    def intersect(self, samples):
+        keys = {id(e2s_sample) for e2s_sample in samples}
+        self.discard([e2s_sample for key, e2s_sample in list(self.items.items()) if key not in keys])
+
+    def toggle(self, e2s_sample):
+        if e2s_sample in self:
+            self.discard([e2s_sample])
+        else:
+            self.add([e2s_sample])
+            self.anchor = e2s_sample
+
+    def select_range(self, samples, first, last, extend=False):
+        """select samples[first..last], bounds included in any order"""
+        if first > last:
+            first, last = last, first
+        if extend:
+            self.add(samples[first:last+1])
+        else:
+            anchor = self.anchor
+            self.set(samples[first:last+1])
+            self.anchor = anchor
+
+    def samples(self, e2s_samples):
+        """the selected samples of e2s_samples, in its order"""
+        items = self.items
+        return [e2s_sample for e2s_sample in e2s_samples if id(e2s_sample) in items]
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright (C) 2018 Jonathan Taquet
+
+This file is part of Oe2sSLE (Open e2sSample.all Library Editor).
+
+Oe2sSLE is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Oe2sSLE is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Oe2sSLE.  If not, see <http://www.gnu.org/licenses/>
+"""
+
+# startup timings of the application modules
+#
+# Enabled by setting the OE2SSLE_PROFILE_STARTUP environment variable,
+# the timings are printed on the console (standard error).
+
+import builtins
+import contextlib
+import os
+import sys
+import time
+
+enabled = bool(os.environ.get('OE2SSLE_PROFILE_STARTUP'))
+
+# modules (and packages) of the application whose import is timed
+modules = ('GUI', 'audio', 'RIFF', 'e2s_sample_all', 'e2s_sample_dedup',
+           'e2s_sample_export', 'e2s_sample_import', 'e2s_sample_index',
+           'e2s_sample_journal', 'e2s_sample_selection', 'e2s_sample_trim',
+           'task_runner', 'wav_peaks', 'wav_raster', 'wav_spectrogram',
+           'wav_thumbnail', 'wav_tools', 'VerticalScrolledFrame', 'utils',
+           'version')
+
+_start = time.perf_counter()
+_depth = 0
+_reported = False
+_import = builtins.__import__
+# (start time, depth, label, duration)
+timings = []
+
+
+def _add(start, depth, label, duration):
+    timings.append((start, depth, label, duration))
+    if _reported:
+        _print(timings[-1])
+
+
+def _print(timing):
+    start, depth, label, duration = timing
+    print('[startup] {:8.1f} ms {}{}'.format(duration*1000, '  '*depth, label), file=sys.__stderr__)
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    global _depth
+    if level or name in sys.modules or name.split('.')[0] not in modules:
+        return _import(name, globals, locals, fromlist, level)
+    start = time.perf_counter()
+    depth = _depth
+    _depth += 1
+    try:
+        return _import(name, globals, locals, fromlist, level)
+    finally:
+        _depth -= 1
+        _add(start, depth, 'import ' + name, time.perf_counter()-start)
+
+
+def install():
+    """time the imports of the application modules from now on"""
+    if enabled:
+        builtins.__import__ = _timed_import
+
+
+@contextlib.contextmanager
+def measure(label):
+    global _depth
+    if not enabled:
+        yield
+        return
+    start = time.perf_counter()
+    depth = _depth
+    _depth += 1
+    try:
+        yield
+    finally:
+        _depth -= 1
+        _add(start, depth, label, time.perf_counter()-start)
+
+
+def module_loaded(name):
+    """record the time elapsed since the profiling started as name import time"""
+    if enabled:
+        _add(_start, 0, 'import ' + name, time.perf_counter()-_start)
+
+
+def report():
+    """print the timings so far, later timings are printed as they come"""
+    global _reported
+    if enabled and not _reported:
+        _reported = True
+        for timing in sorted(timings):
+            _print(timing)
+        print('[startup] {:8.1f} ms total'.format((time.perf_counter()-_start)*1000), file=sys.__stderr__)
+        builtins.__import__ = _import
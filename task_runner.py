@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright (C) 2018 Jonathan Taquet
+
+This file is part of Oe2sSLE (Open e2sSample.all Library Editor).
+
+Oe2sSLE is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Oe2sSLE is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Oe2sSLE.  If not, see <http://www.gnu.org/licenses/>
+"""
+
+import concurrent.futures
+import queue
+import threading
+import time
+import traceback
+
+
+class Cancelled(Exception):
+    """raised by Task.check() in a cancelled task"""
+    pass
+
+
+class Task:
+    """
+    handle of a task given to its function
+
+    The function checks check() regularly (it raises Cancelled once
+    cancel() was called), reports its progress with progress() or step(),
+    and must use call() or call_sync() for anything touching Tk (widgets,
+    variables, message boxes): they are run by TaskRunner.process() on the
+    Tk thread.
+
+    maximum is None while the progress is unknown.
+    """
+    def __init__(self, runner, label, maximum=None):
+        self.runner = runner
+        self.label = label
+        self.value = 0
+        self.maximum = maximum
+        self.future = None
+        self.duration = None
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def check(self):
+        if self._cancel.is_set():
+            raise Cancelled()
+
+    def progress(self, value, maximum=None):
+        if maximum is not None:
+            self.maximum = maximum
+        self.value = value
+
+    def step(self, amount=1):
+        self.value += amount
+
+    def done(self):
+        return self.future.done()
+
+    def call(self, fct, *args, **kwargs):
+        """run fct on the Tk thread, without waiting for it"""
+        self.runner.call(fct, *args, **kwargs)
+
+    def call_sync(self, fct, *args, **kwargs):
+        """run fct on the Tk thread and return its result"""
+        return self.runner.call_sync(fct, *args, **kwargs)
+
+
+class _Call:
+    def __init__(self, fct, args, kwargs, sync):
+        self.fct = fct
+        self.args = args
+        self.kwargs = kwargs
+        self.event = threading.Event() if sync else None
+        self.result = None
+        self.exception = None
+
+    def run(self):
+        try:
+            self.result = self.fct(*self.args, **self.kwargs)
+        except BaseException as e:
+            if self.event is None:
+                traceback.print_exc()
+            self.exception = e
+        if self.event is not None:
+            self.event.set()
+
+
+class TaskRunner:
+    """
+    run long tasks in a bounded pool of threads
+
+    Tasks are function(task, *args, **kwargs), task being their Task handle.
+    The Tk thread (the one creating the runner) must call process()
+    regularly, e.g. with after(), while tasks are running: it runs the calls
+    marshaled by the tasks. The duration of each task is logged.
+
+    With synchronous=True the tasks are run at once in the calling thread
+    (useful to debug them).
+    """
+    def __init__(self, workers=2, synchronous=False):
+        self.synchronous = synchronous
+        self._executor = concurrent.futures.ThreadPoolExecutor(workers)
+        self._calls = queue.Queue()
+        self._tk_thread = threading.current_thread()
+
+    def submit(self, fct, *args, label=None, maximum=None, **kwargs):
+        task = Task(self, label or getattr(fct, '__name__', 'task'), maximum)
+        if self.synchronous:
+            task.future = concurrent.futures.Future()
+            try:
+                task.future.set_result(self._run(task, fct, args, kwargs))
+            except BaseException as e:
+                task.future.set_exception(e)
+        else:
+            task.future = self._executor.submit(self._run, task, fct, args, kwargs)
+        return task
+
+    def _run(self, task, fct, args, kwargs):
+        start = time.perf_counter()
+        status = 'done'
+        try:
+            return fct(task, *args, **kwargs)
+        except Cancelled:
+            status = 'cancelled'
+            raise
+        except BaseException:
+            status = 'failed'
+            raise
+        finally:
+            task.duration = time.perf_counter()-start
+            print('[task] {} {} in {:.1f} ms'.format(task.label, status, task.duration*1000))
+
+    def call(self, fct, *args, **kwargs):
+        if threading.current_thread() is self._tk_thread:
+            fct(*args, **kwargs)
+        else:
+            self._calls.put(_Call(fct, args, kwargs, sync=False))
+
+    def call_sync(self, fct, *args, **kwargs):
+        if threading.current_thread() is self._tk_thread:
+            return fct(*args, **kwargs)
+        call = _Call(fct, args, kwargs, sync=True)
+        self._calls.put(call)
+        call.event.wait()
+        if call.exception is not None:
+            raise call.exception
+        return call.result
+
+    def process(self):
+        """run the marshaled calls, from the Tk thread"""
+        while True:
+            try:
+                call = self._calls.get_nowait()
+            except queue.Empty:
+                return
+            call.run()
+
+    def shutdown(self):
+        """no more tasks, the running ones are not waited for"""
+        self._executor.shutdown(wait=False)
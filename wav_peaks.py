@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright (C) 2018 Jonathan Taquet
+
+This file is part of Oe2sSLE (Open e2sSample.all Library Editor).
+
+Oe2sSLE is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Oe2sSLE is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Oe2sSLE.  If not, see <http://www.gnu.org/licenses/>
+"""
+
+import array
+import math
+import sys
+import threading
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def column_bounds(fr, to, width, length, first=0, last=None):
+    """
+    first and last+1 sample of the displayed columns [first, last)
+
+    Only the columns starting before length are returned.
+    """
+    if last is None:
+        last = width
+    if np is not None:
+        x = np.arange(first, last, dtype=np.float64)
+        starts = np.maximum(0, np.trunc(fr+np.floor((to-fr)*x/width))).astype(np.int64)
+        n = int(np.searchsorted(starts, length))
+        starts = starts[:n]
+        stops = np.trunc(fr+np.floor((to-fr)*(x[:n]+1.)/width)).astype(np.int64)
+        stops = np.minimum(length, np.maximum(starts+1, stops))
+        return starts, stops
+    starts = []
+    stops = []
+    for x in range(first, last):
+        start = max(0, int(fr+math.floor((to-fr)*x/width)))
+        if start >= length:
+            break
+        stop = min(length, max(start+1, int(fr+math.floor((to-fr)*(x+1.)/width))))
+        starts.append(start)
+        stops.append(stop)
+    return starts, stops
+
+
+# bigger wavs are first displayed from a PeakPreview
+PREVIEW_LENGTH = 1 << 18
+
+
+class Cancelled(Exception):
+    pass
+
+
+class PeakPyramid:
+    """
+    min/max peaks of a 16 bits PCM wav at power-of-two resolutions
+
+    Level 0 holds the samples of each channel, level k holds the min and
+    max of blocks of 2**k samples. Peaks of any displayed column are then
+    taken from the level whose block size fits the column width, so that
+    a display refresh costs O(width) whatever the zoom is.
+    """
+    def __init__(self, rawdata, num_chans, cancel=None):
+        """cancel is an optional threading.Event aborting the build"""
+        self.num_chans = num_chans
+        self.length = len(rawdata)//2//num_chans
+        if np is not None:
+            samples = np.frombuffer(rawdata, dtype='<i2', count=self.length*num_chans).reshape(-1, num_chans)
+            self.samples = [samples[:, chan] for chan in range(num_chans)]
+        else:
+            samples = array.array('h', rawdata[:self.length*num_chans*2])
+            if sys.byteorder == 'big':
+                samples.byteswap()
+            self.samples = [samples[chan::num_chans] for chan in range(num_chans)]
+        # levels[k][chan] = (mins, maxs) of blocks of 2**k samples, k >= 1
+        # without numpy, the first levels are not worth the memory and build
+        # time: the samples are scanned instead
+        self.levels = [None]*self._first_level
+        self._cancel = cancel
+        self._build()
+        self._cancel = None
+
+    @property
+    def _first_level(self):
+        return 1 if np is not None else 4
+
+    @classmethod
+    def from_wav(cls, wav):
+        """pyramid from per channel lists of sample values"""
+        num_chans = len(wav)
+        data = array.array('h', [x for m_x in zip(*wav) for x in m_x])
+        if sys.byteorder == 'big':
+            data.byteswap()
+        return cls(data.tobytes(), num_chans)
+
+    def _reduce(self, mins, maxs, factor):
+        if np is not None:
+            if factor == 2:
+                n = len(mins)//2*2
+                res = (np.minimum(mins[0:n:2], mins[1:n:2]),
+                       np.maximum(maxs[0:n:2], maxs[1:n:2]))
+                if n < len(mins):
+                    res = (np.append(res[0], mins[-1]), np.append(res[1], maxs[-1]))
+                return res
+            idx = np.arange(0, len(mins), factor)
+            return (np.minimum.reduceat(mins, idx),
+                    np.maximum.reduceat(maxs, idx))
+        pad = -len(mins) % factor
+        if pad:
+            mins = mins + mins[-1:]*pad
+            maxs = maxs + maxs[-1:]*pad
+        return (array.array('h', map(min, *[mins[k::factor] for k in range(factor)])),
+                array.array('h', map(max, *[maxs[k::factor] for k in range(factor)])))
+
+    def _build(self):
+        """compute the levels from the samples"""
+        prev = 0
+        level = self._first_level
+        # while the previous level has more than one block
+        while (self.length-1) >> prev:
+            factor = 1 << (level-prev)
+            blocks = []
+            for chan in range(self.num_chans):
+                if self._cancel is not None and self._cancel.is_set():
+                    raise Cancelled()
+                if prev == 0:
+                    mins = maxs = self.samples[chan]
+                else:
+                    mins, maxs = self.levels[prev][chan]
+                blocks.append(self._reduce(mins, maxs, factor))
+            self.levels.append(blocks)
+            prev = level
+            level += 1
+
+    def level_for(self, span):
+        """level whose block size is the biggest one not greater than span"""
+        level = max(0, int(math.floor(math.log2(max(1., span)))))
+        level = min(level, len(self.levels)-1)
+        return level if self.levels[level] is not None else 0
+
+    def column_peaks(self, chan, fr, to, width, first=0, last=None):
+        """
+        min and max sample value of the columns [first, last) when
+        displaying [fr, to) on width columns
+
+        The returned sequences (numpy arrays when numpy is available) only
+        cover the columns starting before the end of the samples. At coarse
+        levels, the block shared by two columns is given to the second one:
+        a column peak can be shifted by less than a column.
+        """
+        if last is None:
+            last = width
+        # the start of the next column bounds the last one as in a full view
+        starts, stops = column_bounds(fr, to, width, self.length, first, min(width, last+1))
+        if len(starts) > last-first:
+            next_start = starts[-1]
+            starts = starts[:-1]
+        else:
+            next_start = None
+        if not len(starts):
+            return [], []
+        level = self.level_for((to-fr)/width)
+        if level == 0:
+            mins = maxs = self.samples[chan]
+        else:
+            mins, maxs = self.levels[level][chan]
+        if next_start is not None:
+            end = max((starts[-1] >> level)+1, next_start >> level)
+        else:
+            end = ((stops[-1]-1) >> level)+1
+        if np is not None:
+            b0 = starts >> level
+            col_mins = np.minimum.reduceat(mins[:end], b0)
+            col_maxs = np.maximum.reduceat(maxs[:end], b0)
+            return col_mins, col_maxs
+        b0 = [start >> level for start in starts]
+        b1 = b0[1:] + [end]
+        col_mins = []
+        col_maxs = []
+        for a, b in zip(b0, b1):
+            b = max(a+1, b)
+            col_mins.append(min(mins[a:b]))
+            col_maxs.append(max(maxs[a:b]))
+        return col_mins, col_maxs
+
+
+class PeakPreview:
+    """
+    rough peaks of a wav, from one frame every stride frames
+
+    Displayed while the PeakPyramid of a big wav is built, short peaks can
+    be missed.
+    """
+    def __init__(self, rawdata, num_chans, stride):
+        self.num_chans = num_chans
+        self.length = len(rawdata)//2//num_chans
+        self.stride = stride
+        if np is not None:
+            frames = np.frombuffer(rawdata, dtype='<i2', count=self.length*num_chans).reshape(-1, num_chans)
+            data = frames[::stride].tobytes()
+        else:
+            # bytes are copied as is, no need to care about byte order
+            frames = array.array('h', rawdata[:self.length*num_chans*2])
+            n = (self.length+stride-1)//stride
+            decimated = array.array('h', bytes(n*num_chans*2))
+            for chan in range(num_chans):
+                decimated[chan::num_chans] = frames[chan::num_chans*stride]
+            data = decimated.tobytes()
+        self.pyramid = PeakPyramid(data, num_chans)
+
+    def column_peaks(self, chan, fr, to, width, first=0, last=None):
+        return self.pyramid.column_peaks(chan, fr/self.stride, to/self.stride, width, first, last)
+
+
+class PeakBuilder:
+    """
+    build the PeakPyramid of a wav in a background thread
+
+    result is the pyramid once done() is true, None if cancelled.
+    """
+    def __init__(self, rawdata, num_chans):
+        self.result = None
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(rawdata, num_chans), daemon=True)
+        self._thread.start()
+
+    def _run(self, rawdata, num_chans):
+        try:
+            self.result = PeakPyramid(rawdata, num_chans, self._cancel)
+        except Cancelled:
+            pass
+
+    def cancel(self):
+        self._cancel.set()
+
+    def done(self):
+        return not self._thread.is_alive()
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright (C) 2018 Jonathan Taquet
+
+This file is part of Oe2sSLE (Open e2sSample.all Library Editor).
+
+Oe2sSLE is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Oe2sSLE is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Oe2sSLE.  If not, see <http://www.gnu.org/licenses/>
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class WaveRaster:
+    """
+    rasterise min/max column peaks into a PPM (P6) image
+
+    Each column is drawn as a vertical span joined to the previous column.
+    With NumPy the whole image is built with array operations, without it
+    the image is built column by column (contiguous slices) and then
+    transposed with one strided copy per row.
+    """
+    def __init__(self, bg_color=(0,0,127), wav_color=(0,0,255), zero_color=(127,127,127), amp_max=32767, amp_tot=65536):
+        self.bg_color = bg_color
+        self.wav_color = wav_color
+        self.zero_color = zero_color
+        self.amp_max = amp_max
+        self.amp_tot = amp_tot
+
+    @staticmethod
+    def header(w, h):
+        # from python 3.5:
+        #header = b"P6 %d %d 255 " % (w, h)
+        return bytes("P6 %d %d 255 " % (w, h), "utf8")
+
+    def zero_line(self, chan, num_chans, h):
+        return int((self.amp_max/self.amp_tot+chan)*(h/num_chans))
+
+    def spans(self, col_mins, col_maxs, chan, num_chans, h, prev=(0, 0)):
+        """
+        first and last+1 rows drawn for each column
+
+        prev is the (min, max) of the column preceding the first one.
+        """
+        amp_max = self.amp_max
+        amp_tot = self.amp_tot
+        if np is not None:
+            col_mins = np.asarray(col_mins, dtype=np.int64)
+            col_maxs = np.asarray(col_maxs, dtype=np.int64)
+            prev_mins = np.concatenate(([prev[0]], col_mins[:-1]))
+            prev_maxs = np.concatenate(([prev[1]], col_maxs[:-1]))
+            smin = np.minimum(prev_maxs, col_mins)
+            smax = np.maximum(prev_mins, col_maxs)
+            p_start = (((amp_max-smax)/amp_tot+chan)*(h/num_chans)).astype(np.int64)
+            p_stop = (((amp_max-smin)/amp_tot+chan)*(h/num_chans)).astype(np.int64)+1
+            return np.minimum(p_start, h), np.minimum(p_stop, h)
+        p_start = []
+        p_stop = []
+        _smin, _smax = prev
+        for __smin, __smax in zip(col_mins, col_maxs):
+            smin = min(_smax, __smin)
+            smax = max(_smin, __smax)
+            _smin = __smin
+            _smax = __smax
+            p_start.append(min(h, int(((amp_max-smax)/amp_tot+chan)*(h/num_chans))))
+            p_stop.append(min(h, int(((amp_max-smin)/amp_tot+chan)*(h/num_chans))+1))
+        return p_start, p_stop
+
+    def render(self, peaks, fr, to, w, h, first=0, last=None):
+        """
+        PPM image of the samples [fr, to) of a PeakPyramid
+
+        When first and last are given, only the columns [first, last) of
+        the w columns wide view are rendered, as a last-first wide image.
+        """
+        if last is None:
+            last = w
+        num_chans = peaks.num_chans
+        columns = []
+        prevs = []
+        for chan in range(num_chans):
+            if first > 0:
+                # the previous column is needed to join the first one
+                col_mins, col_maxs = peaks.column_peaks(chan, fr, to, w, first-1, last)
+                if len(col_mins):
+                    prevs.append((int(col_mins[0]), int(col_maxs[0])))
+                    col_mins = col_mins[1:]
+                    col_maxs = col_maxs[1:]
+                else:
+                    prevs.append((0, 0))
+            else:
+                col_mins, col_maxs = peaks.column_peaks(chan, fr, to, w, first, last)
+                prevs.append((0, 0))
+            columns.append((col_mins, col_maxs))
+        return self.render_columns(columns, last-first, h, prevs)
+
+    def render_columns(self, columns, w, h, prevs=None):
+        """PPM image from the (col_mins, col_maxs) of each channel"""
+        num_chans = len(columns)
+        if prevs is None:
+            prevs = [(0, 0)]*num_chans
+        spans = [self.spans(col_mins, col_maxs, chan, num_chans, h, prev)
+                 for chan, ((col_mins, col_maxs), prev) in enumerate(zip(columns, prevs))]
+        lines = [self.zero_line(chan, num_chans, h) for chan in range(num_chans)]
+        if np is not None:
+            pixels = self._pixels_np(spans, lines, w, h)
+        else:
+            pixels = self._pixels_py(spans, lines, w, h)
+        return self.header(w, h) + pixels
+
+    def scroll(self, ppm, w, h, shift, strip, strip_w=None):
+        """
+        PPM image scrolled by shift columns
+
+        The image content moves to the left when shift is positive. strip is
+        the PPM image of the strip_w (default abs(shift)) newly drawn
+        columns, at the right of the image when shift is positive, at its
+        left otherwise.
+        """
+        header = self.header(w, h)
+        n = abs(shift)
+        if strip_w is None:
+            strip_w = n
+        pixels = memoryview(ppm)[len(header):]
+        new_pixels = memoryview(strip)[len(self.header(strip_w, h)):]
+        if np is not None:
+            old = np.frombuffer(pixels, dtype=np.uint8).reshape(h, w, 3)
+            new = np.frombuffer(new_pixels, dtype=np.uint8).reshape(h, strip_w, 3)
+            if shift > 0:
+                img = np.concatenate((old[:, n:n+w-strip_w], new), axis=1)
+            else:
+                img = np.concatenate((new, old[:, strip_w-n:w-n]), axis=1)
+            return header + img.tobytes()
+        wstep = w*3
+        nstep = n*3
+        sstep = strip_w*3
+        res = bytearray(header) + bytearray(w*h*3)
+        row = len(header)
+        for y in range(h):
+            old = pixels[y*wstep:(y+1)*wstep]
+            new = new_pixels[y*sstep:(y+1)*sstep]
+            if shift > 0:
+                res[row:row+wstep-sstep] = old[nstep:nstep+wstep-sstep]
+                res[row+wstep-sstep:row+wstep] = new
+            else:
+                res[row:row+sstep] = new
+                res[row+sstep:row+wstep] = old[sstep-nstep:wstep-nstep]
+            row += wstep
+        return res
+
+    def paste(self, ppm, w, h, x, strip, strip_w):
+        """PPM image with its columns [x, x+strip_w) replaced by the strip PPM image"""
+        res = bytearray(ppm)
+        pixels = memoryview(strip)[len(self.header(strip_w, h)):]
+        wstep = w*3
+        sstep = strip_w*3
+        row = len(self.header(w, h))+x*3
+        for y in range(h):
+            res[row:row+sstep] = pixels[y*sstep:(y+1)*sstep]
+            row += wstep
+        return res
+
+    def render_scrolled(self, ppm, peaks, fr, to, w, h, shift):
+        """
+        PPM image of the samples [fr, to) of a PeakPyramid from the image
+        ppm of the same view shift columns before (see scroll)
+
+        Only the new columns are rendered, and the columns next to them
+        which differ from a full render: the first column is not joined to a
+        previous one, the last column is bounded by the end of the view
+        instead of its next column (see PeakPyramid.column_peaks). The
+        result is the same as render(peaks, fr, to, w, h) when the columns
+        bounds are moved by whole samples, i.e. when fr and to are whole
+        samples.
+        """
+        if shift > 0:
+            # with the old last column
+            strip_w = min(w, shift+1)
+            strip = self.render(peaks, fr, to, w, h, w-strip_w, w)
+            ppm = self.scroll(ppm, w, h, shift, strip, strip_w)
+            return self.paste(ppm, w, h, 0, self.render(peaks, fr, to, w, h, 0, 1), 1)
+        # with the old first column
+        strip_w = min(w, 1-shift)
+        strip = self.render(peaks, fr, to, w, h, 0, strip_w)
+        ppm = self.scroll(ppm, w, h, shift, strip, strip_w)
+        return self.paste(ppm, w, h, w-1, self.render(peaks, fr, to, w, h, w-1, w), 1)
+
+    def _pixels_np(self, spans, lines, w, h):
+        # 0: background, 1: zero line, 2: wav, then mapped to the colors
+        label = np.zeros((h, w), dtype=np.uint8)
+        for line in lines:
+            if line < h:
+                label[line, :] = 1
+        rows = np.arange(h, dtype=np.int64)[:, np.newaxis]
+        for p_start, p_stop in spans:
+            n = len(p_start)
+            mask = (rows >= p_start) & (rows < p_stop)
+            np.putmask(label[:, :n], mask, 2)
+        palette = np.array((self.bg_color, self.zero_color, self.wav_color), dtype=np.uint8)
+        return palette[label].tobytes()
+
+    def _pixels_py(self, spans, lines, w, h):
+        # column major image: each column is a contiguous strip of h pixels
+        hstep = h*3
+        cols = bytearray(bytes(self.bg_color)*(w*h))
+        for line in lines:
+            if line < h:
+                for k in range(3):
+                    cols[line*3+k::hstep] = bytes((self.zero_color[k],))*w
+        color = bytes(self.wav_color)
+        for p_start, p_stop in spans:
+            for x, (y0, y1) in enumerate(zip(p_start, p_stop)):
+                if y1 > y0:
+                    cols[x*hstep+y0*3:x*hstep+y1*3] = color*(y1-y0)
+        # transpose to the row major PPM layout
+        wstep = w*3
+        pixels = bytearray(w*h*3)
+        for y in range(h):
+            for k in range(3):
+                pixels[y*wstep+k:(y+1)*wstep:3] = cols[y*3+k::hstep]
+        return pixels
+
+
+def benchmark(widths=(800, 1920, 3840), height=240, seconds=600, repeat=10):
+    """print the frames per second for a 10 minutes stereo sample, zoom 'all'"""
+    import array
+    import math
+    import time
+    from wav_peaks import PeakPyramid
+
+    rate = 48000
+    n = rate*seconds
+    period = array.array('h', (int(20000*math.sin(i*2*math.pi/480)) for i in range(480)))
+    data = (period*(2*n//480)).tobytes()
+    t0 = time.perf_counter()
+    peaks = PeakPyramid(data, 2)
+    print('peaks build: {:.3f} s'.format(time.perf_counter()-t0))
+    raster = WaveRaster()
+    for w in widths:
+        t0 = time.perf_counter()
+        for i in range(repeat):
+            raster.render(peaks, 0, n, w, height)
+        dt = (time.perf_counter()-t0)/repeat
+        print('{:5d}x{}: {:7.1f} fps ({})'.format(w, height, 1/dt, 'numpy' if np is not None else 'no numpy'))
+        # zoom 1:1, scrolling by 16 pixels
+        ppm = raster.render(peaks, 0, w, w, height)
+        t0 = time.perf_counter()
+        for i in range(1, repeat+1):
+            ppm = raster.render_scrolled(ppm, peaks, i*16, w+i*16, w, height, 16)
+        dt = (time.perf_counter()-t0)/repeat
+        print('{:5d}x{}: {:7.1f} fps scrolling'.format(w, height, 1/dt))
+        # the scrolled images must be the same as full renders
+        fr = n//2+5
+        for span, shift in ((2*w, 16), (w//4, -8), (w//4, 4), (5*w//4, -16), (5*w//4, 16),
+                            (32*w, 16), (32*w, -16), (64*w, 16), (64*w, -1)):
+            to = fr+span
+            step = span*shift//w
+            ppm = raster.render(peaks, fr, to, w, height)
+            scrolled = raster.render_scrolled(ppm, peaks, fr+step, to+step, w, height, shift)
+            assert bytes(scrolled) == bytes(raster.render(peaks, fr+step, to+step, w, height)), \
+                'scrolled image differs from a full render ({}, {}, {})'.format(fr, to, shift)
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright (C) 2018 Jonathan Taquet
+
+This file is part of Oe2sSLE (Open e2sSample.all Library Editor).
+
+Oe2sSLE is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Oe2sSLE is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Oe2sSLE.  If not, see <http://www.gnu.org/licenses/>
+"""
+
+import collections
+import math
+import threading
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# spectrogram requires numpy
+available = np is not None
+
+
+def _palette():
+    # black -> blue -> red -> yellow -> white
+    steps = ((0, (0,0,0)), (64, (0,0,160)), (144, (200,0,60)), (208, (255,200,0)), (255, (255,255,255)))
+    palette = np.zeros((256, 3), dtype=np.uint8)
+    for (i0, c0), (i1, c1) in zip(steps, steps[1:]):
+        t = np.linspace(0., 1., i1-i0+1)[:, np.newaxis]
+        palette[i0:i1+1] = np.round(np.array(c0)*(1-t) + np.array(c1)*t)
+    return palette
+
+
+class Spectrogram:
+    """
+    short time Fourier transform of a 16 bits PCM wav, computed by tiles
+
+    A tile holds TILE_COLS spectrum columns spaced by hop = 2**level
+    samples, level being chosen from the displayed zoom. Tiles are computed
+    by a background thread and kept in a LRU cache, so scrolling at a given
+    zoom reuses them; the cache is only bound to the data it was built from.
+    """
+    FFT_SIZE = 1024
+    TILE_COLS = 256
+    MAX_TILES = 256
+    # displayed dynamic range, in dB below full scale
+    DB_RANGE = 96.
+
+    def __init__(self, rawdata, num_chans):
+        self.rawdata = rawdata
+        self.num_chans = num_chans
+        self.length = len(rawdata)//2//num_chans
+        samples = np.frombuffer(rawdata, dtype='<i2', count=self.length*num_chans).reshape(-1, num_chans)
+        self._samples = samples
+        self._mono = None
+        self.window = np.hanning(self.FFT_SIZE).astype(np.float32)
+        self.palette = _palette()
+        self.tiles = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._wanted = []
+        # key of the tile being computed by the worker
+        self._computing = None
+        self._ready = threading.Condition(self._lock)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._wanted = []
+            self._ready.notify()
+
+    def level_for(self, span):
+        return max(0, int(math.floor(math.log2(max(1., span)))))
+
+    def compute_tile(self, level, tile):
+        """(TILE_COLS, FFT_SIZE//2+1) uint8 intensities of a tile"""
+        if self._mono is None:
+            # mixed down once, in the worker thread
+            self._mono = self._samples.mean(axis=1, dtype=np.float32)/32768.
+        n = self.FFT_SIZE
+        hop = 1 << level
+        centers = (tile*self.TILE_COLS + np.arange(self.TILE_COLS))*hop
+        idx = centers[:, np.newaxis] + np.arange(-n//2, n//2)
+        valid = (idx >= 0) & (idx < self.length)
+        frames = np.where(valid, self._mono[np.clip(idx, 0, max(0, self.length-1))], 0.)
+        spectrum = np.abs(np.fft.rfft(frames*self.window, axis=1))
+        db = 20*np.log10(np.maximum(spectrum*(4./n), 1e-10))
+        return np.clip((db+self.DB_RANGE)*(255./self.DB_RANGE), 0, 255).astype(np.uint8)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._wanted and not self._closed:
+                    self._ready.wait()
+                if self._closed:
+                    return
+                key = self._wanted.pop(0)
+                if key in self.tiles:
+                    continue
+                self._computing = key
+            try:
+                tile = self.compute_tile(*key)
+            except BaseException:
+                with self._lock:
+                    self._computing = None
+                raise
+            with self._lock:
+                self._computing = None
+                self.tiles[key] = tile
+                while len(self.tiles) > self.MAX_TILES:
+                    self.tiles.popitem(last=False)
+
+    def pending(self):
+        """whether requested tiles are still to be computed"""
+        with self._lock:
+            return len(self._wanted) > 0 or self._computing is not None
+
+    def render(self, fr, to, w, h):
+        """
+        PPM image of the view [fr, to) and whether tiles are missing
+
+        Missing tiles are drawn black and requested to the worker, replacing
+        the requests of previous views.
+        """
+        level = self.level_for((to-fr)/w)
+        hop = 1 << level
+        pos = fr + (np.arange(w)+0.5)*((to-fr)/w)
+        cols = np.floor(pos/hop).astype(np.int64)
+        inside = (pos >= 0) & (pos < self.length)
+        tile_idx = cols // self.TILE_COLS
+        col_idx = cols % self.TILE_COLS
+        nbins = self.FFT_SIZE//2+1
+        # low frequencies at the bottom
+        bins = (h-1-np.arange(h))*(nbins-1)//max(1, h-1)
+        intensity = np.zeros((w, h), dtype=np.uint8)
+        missing = []
+        with self._lock:
+            for tile in np.unique(tile_idx[inside]).tolist():
+                key = (level, tile)
+                data = self.tiles.get(key)
+                if data is None:
+                    missing.append(key)
+                    continue
+                self.tiles.move_to_end(key)
+                sel = inside & (tile_idx == tile)
+                intensity[sel] = data[col_idx[sel]][:, bins]
+            if missing:
+                self._wanted = missing
+                self._ready.notify()
+        img = self.palette[intensity.T]
+        header = bytes("P6 %d %d 255 " % (w, h), "utf8")
+        return header + img.tobytes(), len(missing) > 0
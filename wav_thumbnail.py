@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright (C) 2018 Jonathan Taquet
+
+This file is part of Oe2sSLE (Open e2sSample.all Library Editor).
+
+Oe2sSLE is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Oe2sSLE is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Oe2sSLE.  If not, see <http://www.gnu.org/licenses/>
+"""
+
+import array
+import concurrent.futures
+import hashlib
+import os
+import sys
+import threading
+import time
+import weakref
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# number of columns of a thumbnail
+THUMB_WIDTH = 64
+# disk cache limits, the least recently used summaries are removed beyond
+MAX_ENTRIES = 20000
+MAX_AGE = 180*24*3600
+
+
+def data_key(rawdata, num_chans, width=THUMB_WIDTH):
+    """hash identifying the summary of a 16 bits PCM wav data"""
+    h = hashlib.sha1(bytes("{} {} ".format(num_chans, width), "ascii"))
+    h.update(rawdata)
+    return h.hexdigest()
+
+
+def summary(rawdata, num_chans, width=THUMB_WIDTH):
+    """
+    peak summary of a 16 bits PCM wav data
+
+    The max then min of all channels for each of the width columns, as
+    signed bytes (the 8 most significant bits of the samples).
+    """
+    length = len(rawdata)//2//num_chans
+    bounds = [length*x//width*num_chans for x in range(width+1)]
+    res = bytearray(width*2)
+    if np is not None:
+        samples = np.frombuffer(rawdata, dtype='<i2', count=length*num_chans)
+        for x in range(width):
+            a, b = bounds[x], bounds[x+1]
+            if b > a:
+                res[x*2] = (int(samples[a:b].max()) >> 8) & 0xFF
+                res[x*2+1] = (int(samples[a:b].min()) >> 8) & 0xFF
+        return bytes(res)
+    samples = array.array('h', rawdata[:length*num_chans*2])
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    for x in range(width):
+        a, b = bounds[x], bounds[x+1]
+        if b > a:
+            res[x*2] = (max(samples[a:b]) >> 8) & 0xFF
+            res[x*2+1] = (min(samples[a:b]) >> 8) & 0xFF
+    return bytes(res)
+
+
+def peaks(summary):
+    """(maxs, mins) 16 bits values of a summary"""
+    values = array.array('b', summary)
+    return [v << 8 for v in values[0::2]], [v << 8 for v in values[1::2]]
+
+
+class ThumbnailCache:
+    """
+    peak summaries of sample data chunks
+
+    Summaries are computed by a pool of threads and stored on disk, in
+    directory, under the hash of the data, so that a library reopened later
+    does not need any computation. get() never blocks: it returns None until
+    the summary is ready, then done() gives the chunks whose summary has been
+    computed since its last call. Only done() and get() must be called from
+    the Tk thread.
+
+    The disk cache is pruned when the cache is created (see prune).
+    """
+    def __init__(self, directory, workers=2):
+        self.directory = directory
+        self._executor = concurrent.futures.ThreadPoolExecutor(workers)
+        self._lock = threading.Lock()
+        # chunk -> (rawdata, summary)
+        self._summaries = weakref.WeakKeyDictionary()
+        # chunk -> future
+        self._pending = weakref.WeakKeyDictionary()
+        self._executor.submit(self.prune)
+
+    def get(self, data, num_chans):
+        """summary of a RIFF.ChunkData, None if not (yet) available"""
+        known = self._summaries.get(data)
+        if known is not None and known[0] is data.rawdata:
+            return known[1]
+        future = self._pending.get(data)
+        if future is None or future.rawdata is not data.rawdata:
+            if future is not None:
+                future.cancel()
+            future = self._executor.submit(self.compute, data.rawdata, num_chans)
+            future.rawdata = data.rawdata
+            self._pending[data] = future
+        return None
+
+    def done(self):
+        """chunks whose summary became available"""
+        chunks = []
+        for data, future in list(self._pending.items()):
+            if future.done():
+                del self._pending[data]
+                if not future.cancelled() and future.exception() is None:
+                    self._summaries[data] = (future.rawdata, future.result())
+                    chunks.append(data)
+        return chunks
+
+    def pending(self):
+        return len(self._pending) > 0
+
+    def shutdown(self):
+        """cancel the computations not started yet"""
+        for future in list(self._pending.values()):
+            future.cancel()
+        self._pending.clear()
+        self._executor.shutdown(wait=False)
+
+    def compute(self, rawdata, num_chans):
+        """summary of a data, from the disk cache if possible (blocking, any thread)"""
+        key = data_key(rawdata, num_chans)
+        path = os.path.join(self.directory, key)
+        try:
+            with open(path, 'rb') as f:
+                res = f.read()
+            if len(res) == THUMB_WIDTH*2:
+                # last use, for prune
+                os.utime(path)
+                return res
+        except OSError:
+            pass
+        res = summary(rawdata, num_chans)
+        try:
+            with self._lock:
+                if not os.path.exists(self.directory):
+                    os.makedirs(self.directory)
+            tmp = path + '.{}.tmp'.format(threading.get_ident())
+            with open(tmp, 'wb') as f:
+                f.write(res)
+            os.replace(tmp, path)
+        except OSError:
+            # the cache is an optimisation only
+            pass
+        return res
+
+    def prune(self, max_entries=MAX_ENTRIES, max_age=MAX_AGE):
+        """
+        remove the summaries of the disk cache not used for max_age seconds,
+        then the least recently used ones beyond max_entries (blocking, any
+        thread)
+        """
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        entries = []
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                entries.append((os.stat(path).st_mtime, path))
+            except OSError:
+                pass
+        entries.sort(reverse=True)
+        limit = time.time()-max_age
+        removed = 0
+        for num, (mtime, path) in enumerate(entries):
+            if num >= max_entries or mtime < limit:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    pass
+        if removed:
+            print('[thumbnails] {} old summaries removed'.format(removed))